@@ -1,12 +1,19 @@
 import os
 import logging
+import sqlite3
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
 from flask_login import LoginManager
+from utils.payload_cache import PayloadCache
+from utils.shared_store import SharedArrayStore
+from utils.rule_index import RuleIndexCache
+from utils.metrics import MetricsRegistry, SIZE_BUCKETS, MEMORY_BUCKETS
 
-logging.basicConfig(level=logging.DEBUG)
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper())
 
 class Base(DeclarativeBase):
     pass
@@ -34,20 +41,129 @@ else:
     instance_dir = os.path.join(base_dir, 'instance')
     os.makedirs(instance_dir, exist_ok=True)
     
-    sqlite_path = os.path.join(instance_dir, 'app.db')
+    sqlite_path = os.environ.get("SQLITE_PATH") or os.path.join(instance_dir, 'app.db')
     app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{sqlite_path}"
     logging.info(f"Using SQLite database at {sqlite_path}")
+    
+    # Queue all writers behind one lock so concurrent uploads wait instead of failing with
+    # "database is locked" (see persistence.write_lane)
+    app.config["SQLITE_WRITE_LANE"] = os.environ.get("SQLITE_WRITE_LANE", "1") == "1"
+    app.config["SQLITE_WRITE_LOCK"] = f"{sqlite_path}.write-lock"
 
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
     "pool_recycle": 300,
     "pool_pre_ping": True,
 }
-app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024  # 16MB max file size
+if db_url and db_url.startswith("postgres"):
+    # Per-process pool shared by request handlers and job threads; sized so a running
+    # ingest (one connection per job thread) never leaves requests waiting for a connection
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"].update({
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", 10)),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 10)),
+        "pool_timeout": int(os.environ.get("DB_POOL_TIMEOUT", 10)),
+    })
+
+# SQLite pragmas applied to every new connection. WAL lets readers run while a job writes;
+# synchronous=NORMAL is durable in WAL mode except for the last commits on power loss.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 30000)),
+    "cache_size": -int(os.environ.get("SQLITE_CACHE_KB", 64 * 1024)),  # Negative values are KiB
+    "mmap_size": int(os.environ.get("SQLITE_MMAP_BYTES", 256 * 1024 * 1024)),
+    "temp_store": "MEMORY",
+}
+
+@event.listens_for(Engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024  # 16MB max request size (and direct form upload)
+# Chunked uploads (/api/uploads) send files of up to UPLOAD_MAX_BYTES in chunks of UPLOAD_CHUNK_BYTES,
+# which must stay below MAX_CONTENT_LENGTH. Partial files are kept in UPLOAD_TEMP_DIR.
+app.config["UPLOAD_MAX_BYTES"] = int(os.environ.get("UPLOAD_MAX_BYTES", 2 * 1024 * 1024 * 1024))
+app.config["UPLOAD_CHUNK_BYTES"] = int(os.environ.get("UPLOAD_CHUNK_BYTES", 8 * 1024 * 1024))
+app.config["UPLOAD_TEMP_DIR"] = os.environ.get("UPLOAD_TEMP_DIR", os.path.join(app.instance_path, "uploads"))
+# Uploads that receive no chunk for UPLOAD_SESSION_TTL_SECONDS expire and their partial files are deleted;
+# a user can have at most UPLOAD_MAX_ACTIVE uploads in progress at a time
+app.config["UPLOAD_SESSION_TTL_SECONDS"] = int(os.environ.get("UPLOAD_SESSION_TTL_SECONDS", 24 * 60 * 60))
+app.config["UPLOAD_MAX_ACTIVE"] = int(os.environ.get("UPLOAD_MAX_ACTIVE", 3))
+app.config["FORECAST_STORAGE"] = os.environ.get("FORECAST_STORAGE", "series")  # "series" (packed arrays) or "rows"
+# Background job threads per web process. The deployment runs gunicorn alone, so by default each
+# web process runs one; set JOB_WORKERS=0 where `python worker.py` runs next to the web server,
+# so mining and forecasting never compete with requests.
+app.config["JOB_WORKERS"] = int(os.environ.get("JOB_WORKERS", 1))
+# A running job's worker refreshes its heartbeat every JOB_HEARTBEAT_SECONDS. Workers requeue jobs
+# whose heartbeat is older than JOB_LEASE_SECONDS (their worker died), and fail them after
+# JOB_MAX_ATTEMPTS claims so a file that kills its worker is not retried forever.
+app.config["JOB_HEARTBEAT_SECONDS"] = int(os.environ.get("JOB_HEARTBEAT_SECONDS", 30))
+app.config["JOB_LEASE_SECONDS"] = int(os.environ.get("JOB_LEASE_SECONDS", 300))
+app.config["JOB_MAX_ATTEMPTS"] = int(os.environ.get("JOB_MAX_ATTEMPTS", 2))
+# Processes mining and forecasting the partitions of a partitioned upload in parallel
+app.config["PARTITION_WORKERS"] = int(os.environ.get("PARTITION_WORKERS", os.cpu_count() or 1))
+# Set when gunicorn preloads the app in the master before forking workers (see gunicorn.conf.py)
+app.config["PRELOAD_APP"] = os.environ.get("PRELOAD_APP", "0") == "1"
 
 # Initialize the app with the extension
 db.init_app(app)
 
+# Server-side cache of visualization payloads; the disk tier is shared by all workers on the host.
+# Set VIZ_CACHE_DIR to an empty string to keep only the in-process tier.
+viz_cache_dir = os.environ.get("VIZ_CACHE_DIR", os.path.join(app.instance_path, "cache"))
+viz_cache = PayloadCache(
+    max_bytes=int(os.environ.get("VIZ_CACHE_MAX_BYTES", 32 * 1024 * 1024)),
+    disk_dir=viz_cache_dir or None,
+    disk_max_bytes=int(os.environ.get("VIZ_CACHE_DISK_MAX_BYTES", 256 * 1024 * 1024)),
+)
+# Rendered chart images (PNG), served with ETags from the image endpoint
+image_cache = PayloadCache(
+    max_bytes=int(os.environ.get("IMAGE_CACHE_MAX_BYTES", 32 * 1024 * 1024)),
+    disk_dir=os.path.join(viz_cache_dir, "images") if viz_cache_dir else None,
+    disk_max_bytes=int(os.environ.get("IMAGE_CACHE_DISK_MAX_BYTES", 512 * 1024 * 1024)),
+    binary=True,
+)
+# Read-only dataset arrays memory-mapped by every process on the host; use a tmpfs
+# (e.g. SHARED_DATA_DIR=/dev/shm/demand-forecast) to keep them in shared memory
+shared_store = SharedArrayStore(os.environ.get("SHARED_DATA_DIR", os.path.join(app.instance_path, "shared")))
+# In-memory rule indexes of the datasets queried by the recommendation API, rebuilt when a dataset
+# is reprocessed. Set RECOMMENDATION_TOKEN to let services call the API with
+# "Authorization: Bearer <token>" instead of a login session.
+rule_indexes = RuleIndexCache(int(os.environ.get("RULE_INDEX_MAX_DATASETS", 32)))
+app.config["RECOMMENDATION_TOKEN"] = os.environ.get("RECOMMENDATION_TOKEN")
+# Prometheus metrics served on /metrics; every process writes snapshots to METRICS_DIR, which the
+# endpoint merges. Scrapes must send "Authorization: Bearer <METRICS_TOKEN>"; without a token
+# the endpoint is disabled (404).
+metrics = MetricsRegistry(os.environ.get("METRICS_DIR", os.path.join(app.instance_path, "metrics")) or None)
+metrics.histogram("pipeline_stage_duration_seconds", "Duration of processing pipeline stages")
+metrics.histogram("pipeline_stage_size", "Input and output sizes of pipeline stages (rows, baskets, products, rules...)",
+                  SIZE_BUCKETS)
+metrics.histogram("pipeline_stage_peak_memory_bytes", "Peak memory allocated by pipeline stages", MEMORY_BUCKETS)
+metrics.histogram("http_request_duration_seconds", "Request latency by route")
+app.config["METRICS_TOKEN"] = os.environ.get("METRICS_TOKEN")
+# Opt-in request profiling: a request is profiled when it sends "X-Profile: <PROFILE_TOKEN>" (or
+# ?profile=<PROFILE_TOKEN>), or at random with probability PROFILE_SAMPLE_RATE. The hooks are
+# only installed when one of the two is set.
+app.config["PROFILE_TOKEN"] = os.environ.get("PROFILE_TOKEN")
+app.config["PROFILE_SAMPLE_RATE"] = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+app.config["PROFILE_DIR"] = os.environ.get("PROFILE_DIR", os.path.join(app.instance_path, "profiles"))
+# Memory allowed to a processing job (0 disables the budget): the data it keeps for its whole
+# run plus the working memory of the current stage. Stages that would exceed it fall back to a
+# cheaper path or fail the job with an explanation.
+app.config["JOB_MEMORY_BUDGET_MB"] = int(os.environ.get("JOB_MEMORY_BUDGET_MB", 2048))
+# Record the peak allocation of every job stage. tracemalloc is process-wide and slows down
+# everything in the process, so it is off by default and turned on by worker.py for its
+# dedicated processes.
+app.config["JOB_TRACE_MEMORY"] = os.environ.get("JOB_TRACE_MEMORY", "0") == "1"
+# "image" renders the heatmap server-side; "canvas" lets the browser draw it from the matrix JSON
+app.config["HEATMAP_MODE"] = os.environ.get("HEATMAP_MODE", "image")
+# Smaller JSON/HTML responses are sent uncompressed
+app.config["COMPRESS_MIN_BYTES"] = int(os.environ.get("COMPRESS_MIN_BYTES", 1024))
+
 # Configure Flask-Login
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -59,8 +175,28 @@ def load_user(user_id):
     from models import User
     return User.query.get(int(user_id))
 
-with app.app_context():
-    # Make sure to import the models here
-    import models  # noqa: F401
+def create_app():
+    """
+    Return the application with all routes registered.
+    
+    Entry point for servers (`gunicorn 'app:create_app()'`); with PRELOAD_APP=1
+    gunicorn calls it once in the master so workers share its memory.
+    """
+    import routes  # noqa: F401
+    return app
+
+def init_db():
+    """
+    Create missing tables and indexes.
     
-    db.create_all()
+    Run once per deployment (gunicorn.conf.py does it in the master process) rather
+    than on import, so worker boots and scripts do not pay for schema checks.
+    """
+    with app.app_context():
+        # Make sure to import the models here
+        import models  # noqa: F401
+        from persistence import ensure_columns, ensure_indexes
+        
+        db.create_all()
+        ensure_columns()
+        ensure_indexes()
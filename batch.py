@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Batch processing for the Demand Forecasting System
+
+Runs the upload pipeline (validate, summarise, mine, forecast, persist) on many
+files at once, without the web server, in a pool of processes. Every file
+becomes a dataset and a processing job like a browser upload, so the results
+appear in the web app.
+
+Progress is written to a JSON run report after every file. Running again with
+the same report and --resume skips the files that completed and have not
+changed since, and retries the rest.
+
+Usage:
+    python batch.py exports/ --workers 8 --report batch-report.json
+    python batch.py 'exports/store-*.csv' --report batch-report.json --resume
+"""
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import logging
+import argparse
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+ALLOWED_EXTENSIONS = ('.csv', '.xlsx', '.xls')
+UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
+# A file whose worker process dies (e.g. killed for memory) is retried once in a fresh process
+MAX_ATTEMPTS = 2
+
+def find_files(paths):
+    """
+    Expand files, directories and glob patterns into the data files to process.
+
+    Args:
+        paths (list): File paths, directories (searched recursively) or glob patterns
+
+    Returns:
+        list: Sorted absolute paths of CSV and Excel files
+    """
+    files = set()
+    for path in paths:
+        matches = glob.glob(path, recursive=True) if glob.has_magic(path) else [path]
+        for match in matches:
+            if os.path.isdir(match):
+                for root, _, names in os.walk(match):
+                    files.update(os.path.join(root, name) for name in names)
+            elif os.path.isfile(match):
+                files.add(match)
+    return sorted(os.path.abspath(f) for f in files if f.lower().endswith(ALLOWED_EXTENSIONS))
+
+def _fingerprint(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+def _init_worker(memory_limit_mb):
+    if memory_limit_mb:
+        import resource
+        # A runaway file then fails with MemoryError in its own process instead of
+        # drawing the kernel's OOM killer onto the whole machine
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def prepare_file(path, options):
+    """
+    Copy a file to the upload folder and create its dataset and running job.
+
+    Args:
+        path (str): Data file; the original is not modified
+        options (dict): Processing options (min_support, min_confidence, use_associations, partition_by)
+
+    Returns:
+        int: Id of the job, to be run by process_file
+    """
+    from werkzeug.utils import secure_filename
+    from app import app
+    from jobs import enqueue_upload
+
+    filename = f"batch-{os.getpid()}-{int(time.time() * 1000)}-{secure_filename(os.path.basename(path))}"
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    filepath = os.path.join(UPLOAD_FOLDER, filename)
+    shutil.copyfile(path, filepath)
+    with app.app_context():
+        return enqueue_upload(filename, filepath, options, claimed=True).id
+
+def process_file(job_id):
+    """
+    Run a job created by prepare_file in the current process.
+
+    Returns:
+        dict: Report entry with the job outcome, messages and stage log
+    """
+    from app import app
+    from models import ProcessingJob
+    from jobs import run_job
+
+    started = time.perf_counter()
+    with app.app_context():
+        run_job(job_id)
+        job = ProcessingJob.query.get(job_id)
+        return {
+            'status': job.status,
+            'job_id': job.id,
+            'dataset_id': job.dataset_id,
+            'error': job.error,
+            'messages': json.loads(job.messages or '[]'),
+            'stages': json.loads(job.stage_log or '[]'),
+            'seconds': round(time.perf_counter() - started, 3)
+        }
+
+def _reset_job(job_id, error=None):
+    """
+    Recover the job of a worker process that died.
+
+    With an error the job is marked as failed; otherwise it is set running again
+    for a retry, which reprocesses the same dataset instead of leaving it behind.
+    """
+    from app import app, db
+    from models import ProcessingJob
+    from persistence import write_lane
+
+    now = datetime.utcnow()
+    with app.app_context(), write_lane():
+        job = ProcessingJob.query.get(job_id)
+        job.stage = None
+        job.stage_log = None
+        if error:
+            job.status = 'failed'
+            job.error = error
+            job.finished_at = now
+        else:
+            job.status = 'running'
+            job.started_at = job.heartbeat_at = now
+            job.attempts = (job.attempts or 0) + 1
+        db.session.commit()
+
+def _write_report(report, path):
+    report['summary'] = {
+        status: sum(1 for entry in report['files'].values() if entry['status'] == status)
+        for status in ('completed', 'failed', 'skipped')
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp_path, path)
+
+def run_batch(files, options, report_path, workers=None, resume=False, memory_limit_mb=None):
+    """
+    Process files in a process pool, recording every outcome in the run report.
+
+    Args:
+        files (list): Data files from find_files
+        options (dict): Processing options applied to every file
+        report_path (str): JSON run report, rewritten after every file
+        workers (int): Number of processes (defaults to the CPU count)
+        resume (bool): Skip files the existing report lists as completed and unchanged
+        memory_limit_mb (int): Hard address-space limit per worker process
+
+    Returns:
+        dict: The run report
+    """
+    previous = {}
+    if resume and os.path.exists(report_path):
+        with open(report_path, 'r') as f:
+            previous = json.load(f).get('files', {})
+
+    report = {'started_at': datetime.now().isoformat(timespec='seconds'), 'finished_at': None,
+              'options': options, 'workers': workers, 'files': {}}
+    pending = []
+    for path in files:
+        entry = previous.get(path)
+        fingerprint = _fingerprint(path)
+        if entry and entry.get('status') in ('completed', 'skipped') and entry.get('fingerprint') == fingerprint:
+            report['files'][path] = dict(entry, status='skipped')
+        else:
+            report['files'][path] = {'status': 'pending', 'fingerprint': fingerprint}
+            pending.append(path)
+
+    logging.info(f"Processing {len(pending)} files ({len(files) - len(pending)} already completed)")
+    _write_report(report, report_path)
+
+    # Every file runs in a single-process pool of its own (a fresh interpreter, so no database
+    # connections are shared), so a worker that dies takes down only the file that killed it
+    context = multiprocessing.get_context('spawn')
+    workers = workers or multiprocessing.cpu_count()
+    attempts = {}
+    queue = list(pending)
+    running = {}  # Future -> (path, job id, executor)
+
+    def submit(path, job_id):
+        attempts[path] = attempts.get(path, 0) + 1
+        executor = ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=_init_worker,
+                                       initargs=(memory_limit_mb,))
+        running[executor.submit(process_file, job_id)] = (path, job_id, executor)
+
+    while queue or running:
+        while queue and len(running) < workers:
+            path = queue.pop(0)
+            try:
+                submit(path, prepare_file(path, options))
+            except Exception as e:
+                report['files'][path].update(status='failed', error=str(e), attempts=1)
+                logging.error(f"{path}: failed ({e})")
+                _write_report(report, report_path)
+
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            path, job_id, executor = running.pop(future)
+            executor.shutdown(wait=False)
+            entry = report['files'][path]
+            try:
+                entry.update(future.result())
+            except BrokenProcessPool:
+                if attempts[path] < MAX_ATTEMPTS:
+                    _reset_job(job_id)
+                    submit(path, job_id)
+                    continue
+                error = 'The worker process died (out of memory?)'
+                _reset_job(job_id, error)
+                entry.update(status='failed', job_id=job_id, error=error)
+            except Exception as e:
+                _reset_job(job_id, f'Error processing file: {str(e)}')
+                entry.update(status='failed', job_id=job_id, error=str(e))
+            entry['attempts'] = attempts[path]
+
+            level = logging.INFO if entry['status'] == 'completed' else logging.ERROR
+            logging.log(level, f"{path}: {entry['status']}" + (f" ({entry['error']})" if entry.get('error') else ''))
+            _write_report(report, report_path)
+
+    report['finished_at'] = datetime.now().isoformat(timespec='seconds')
+    _write_report(report, report_path)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description='Process many sales data files in parallel.')
+    parser.add_argument('paths', nargs='+', help='Files, directories or glob patterns of CSV/Excel files')
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(),
+                        help='Number of worker processes')
+    parser.add_argument('--report', default='batch-report.json', help='JSON run report path')
+    parser.add_argument('--resume', action='store_true',
+                        help='Skip files the existing report lists as completed and unchanged')
+    parser.add_argument('--min-support', type=float, default=0.05, help='Apriori support threshold')
+    parser.add_argument('--min-confidence', type=float, default=0.2, help='Apriori confidence threshold')
+    parser.add_argument('--use-associations', action='store_true', help='Use association features in forecasting')
+    parser.add_argument('--partition-by', help='Process each value of this column (e.g. Store) separately')
+    parser.add_argument('--memory-budget-mb', type=int,
+                        help='Memory budget of each job (default: JOB_MEMORY_BUDGET_MB)')
+    parser.add_argument('--memory-limit-mb', type=int,
+                        help='Hard address-space limit per worker process')
+    args = parser.parse_args()
+
+    files = find_files(args.paths)
+    if not files:
+        print("No CSV or Excel files found.")
+        sys.exit(1)
+
+    print(f"\n===== Demand Forecasting Batch ({len(files)} files, {args.workers} processes) =====\n")
+
+    # Read by the app configuration of the spawned workers
+    if args.memory_budget_mb is not None:
+        os.environ['JOB_MEMORY_BUDGET_MB'] = str(args.memory_budget_mb)
+    # Every worker runs the partitions of its file in a pool of its own; share the CPUs between them
+    partition_workers = max(1, multiprocessing.cpu_count() // max(1, args.workers))
+    os.environ['PARTITION_WORKERS'] = str(min(int(os.environ.get('PARTITION_WORKERS', partition_workers)),
+                                              partition_workers))
+
+    from app import init_db
+    init_db()
+
+    options = {
+        'min_support': args.min_support,
+        'min_confidence': args.min_confidence,
+        'use_associations': args.use_associations,
+        'partition_by': args.partition_by
+    }
+    report = run_batch(files, options, os.path.abspath(args.report), args.workers, args.resume,
+                       args.memory_limit_mb)
+
+    summary = report['summary']
+    print(f"\nCompleted: {summary['completed']}  Failed: {summary['failed']}  Skipped: {summary['skipped']}")
+    print(f"Report written to {args.report}")
+    sys.exit(1 if summary['failed'] else 0)
+
+if __name__ == "__main__":
+    main()
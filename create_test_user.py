@@ -1,7 +1,8 @@
-from app import app, db
+from app import app, db, init_db
 from models import User
 
 def create_test_user():
+    init_db()
     with app.app_context():
         # Check if test user already exists
         test_user = User.query.filter_by(email='test@example.com').first()
@@ -0,0 +1,48 @@
+"""
+Gunicorn configuration for the Demand Forecasting System
+
+Gunicorn loads this file automatically when started from the project directory
+(`gunicorn --bind 0.0.0.0:5000 main:app`).
+
+With PRELOAD_APP=1 the application and its libraries are imported once in the
+master and shared copy-on-write by the forked workers; dataset arrays are shared
+through the memory-mapped SharedArrayStore in either mode.
+"""
+import os
+import logging
+
+preload_app = os.environ.get("PRELOAD_APP", "0") == "1"
+
+# A progress page keeps an event stream open for up to SSE_MAX_STREAM_SECONDS. With the default
+# single sync worker that would block every other request, so each worker serves requests in threads.
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+threads = int(os.environ.get("GUNICORN_THREADS", 16))
+
+def on_starting(server):
+    """Create the database schema once, in the master, before any worker boots."""
+    from app import app, db, init_db
+    init_db()
+    logging.info("Database tables initialized")
+
+    # Close the master's pooled connections so no forked worker inherits their sockets
+    with app.app_context():
+        db.engine.dispose()
+
+def child_exit(server, worker):
+    """Drop the metrics snapshot of a worker that exited, so /metrics stops counting it."""
+    from app import metrics
+    metrics.remove_snapshot(worker.pid)
+
+def post_fork(server, worker):
+    """Give every worker its own database connections, and a preloaded worker its job threads."""
+    from app import app, db
+
+    # Connections opened by the master must not be shared with the children
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+    # Without preloading, importing the routes in the worker starts the threads
+    if preload_app:
+        from jobs import start_worker_threads
+        start_worker_threads(app.config['JOB_WORKERS'])
@@ -0,0 +1,430 @@
+"""
+Background processing of uploaded datasets.
+
+Jobs are rows in the ProcessingJob table, so any process connected to the
+database can pick them up without an external broker. `python worker.py` runs
+a dedicated worker pool; web processes run JOB_WORKERS worker threads (one by
+default; set it to 0 when a worker pool runs, to keep them free for
+interactive traffic).
+
+A running job holds a lease: its worker refreshes heartbeat_at while it runs.
+Jobs whose worker died (timeout, OOM kill, deploy) stop heartbeating, and the
+workers requeue them, or fail them once they have used up their attempts.
+"""
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from app import app, db, viz_cache, shared_store, metrics
+from models import Dataset, DatasetPartition, ProcessingJob
+from persistence import (save_association_rules, save_forecasts, save_forecast_series, save_daily_sales,
+                         write_lane)
+from utils.data_processor import process_data, validate_data, get_dataset_summary
+from utils.association_miner import run_apriori, build_association_matrix
+from utils.partitioning import split_partitions, process_partitions, rollup_rules, rollup_forecasts
+from utils.memory_budget import MemoryBudget, MemoryBudgetExceeded, estimate_parse_bytes, estimate_training_bytes
+from utils.demand_forecaster import forecast_demand
+from utils.progress import StageTracker, track_stage
+from utils.metrics import record_stage
+from utils.sales_series import build_daily_sales, daily_sales_to_arrays, sales_overview
+
+JOB_STAGES = ['validate', 'parse', 'encode', 'mine', 'rules', 'train', 'forecast', 'persist']
+
+def sales_data_cache_key(dataset_id, version):
+    """Cache key of the sales overview payload of a dataset version (see dataset_version)."""
+    return viz_cache.make_key('sales', dataset_id, version=version)
+
+def dataset_version(dataset_id):
+    """
+    Processing version of a dataset: the id of its latest completed job (0 if none).
+
+    Cached results and ETags include it, so they change whenever the dataset is reprocessed.
+    """
+    job = ProcessingJob.query.filter_by(dataset_id=dataset_id, status='completed').order_by(
+        ProcessingJob.id.desc()).first()
+    if job is None:
+        # Partitions are created by the job of their combined dataset
+        partition = DatasetPartition.query.filter_by(partition_dataset_id=dataset_id).first()
+        if partition:
+            return dataset_version(partition.dataset_id)
+    return job.id if job else 0
+
+class JobError(Exception):
+    """Raised when a job cannot be completed because of its input."""
+
+    def __init__(self, message, details=None):
+        """
+        Args:
+            message (str): Error shown to the user
+            details (list): Further error messages shown below it (e.g. the bad rows of a file)
+        """
+        super().__init__(message)
+        self.details = details or []
+
+def enqueue_upload(filename, filepath, options, claimed=False):
+    """
+    Create a dataset for an uploaded file and queue it for processing.
+
+    Args:
+        filename (str): Name stored on the dataset: the basename of filepath in the upload folder
+        filepath (str): Path of the saved upload, unique to this upload
+        options (dict): Processing options (min_support, min_confidence, use_associations)
+        claimed (bool): Create the job already running, for callers that run it
+            themselves with run_job (e.g. batch.py) instead of through the queue
+
+    Returns:
+        ProcessingJob: The queued job
+    """
+    with write_lane():
+        dataset = Dataset()
+        dataset.filename = filename
+        dataset.processed = False
+        db.session.add(dataset)
+        db.session.flush()
+
+        job = ProcessingJob()
+        job.dataset_id = dataset.id
+        job.filepath = filepath
+        job.options = json.dumps(options)
+        job.status = 'running' if claimed else 'queued'
+        job.started_at = job.heartbeat_at = datetime.utcnow() if claimed else None
+        job.attempts = 1 if claimed else 0
+        db.session.add(job)
+        db.session.commit()
+
+    logging.info(f"{'Created' if claimed else 'Queued'} processing job {job.id} for dataset {dataset.id}")
+    return job
+
+def claim_next_job():
+    """
+    Atomically move the oldest queued job to the running state.
+
+    Returns:
+        int: The claimed job id, or None if the queue is empty
+    """
+    while True:
+        job = ProcessingJob.query.filter_by(status='queued').order_by(ProcessingJob.created_at).first()
+        if job is None:
+            return None
+
+        # Only one worker can win the queued -> running transition
+        now = datetime.utcnow()
+        with write_lane():
+            claimed = ProcessingJob.query.filter_by(id=job.id, status='queued').update(
+                {'status': 'running', 'started_at': now, 'heartbeat_at': now,
+                 'attempts': (job.attempts or 0) + 1}, synchronize_session=False)
+            db.session.commit()
+        if claimed:
+            return job.id
+
+def reap_stale_jobs():
+    """
+    Requeue running jobs whose worker stopped heartbeating, or fail them after JOB_MAX_ATTEMPTS.
+
+    Returns:
+        int: Number of stale jobs found
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=app.config['JOB_LEASE_SECONDS'])
+    stale = ProcessingJob.query.filter(
+        ProcessingJob.status == 'running',
+        db.func.coalesce(ProcessingJob.heartbeat_at, ProcessingJob.started_at) < cutoff
+    ).all()
+
+    for job in stale:
+        retry = (job.attempts or 0) < app.config['JOB_MAX_ATTEMPTS'] and os.path.exists(job.filepath)
+        values = {'stage': None, 'stage_log': None, 'heartbeat_at': None}
+        if retry:
+            values.update(status='queued', started_at=None)
+        else:
+            values.update(status='failed', finished_at=datetime.utcnow(),
+                          error='Processing stopped unexpectedly (the worker was restarted or ran out of memory). '
+                                'Please upload the file again, or split it into smaller files.')
+        # The lease check is repeated in the update, so a job that just heartbeated is left alone
+        with write_lane():
+            updated = ProcessingJob.query.filter(
+                ProcessingJob.id == job.id, ProcessingJob.status == 'running',
+                db.func.coalesce(ProcessingJob.heartbeat_at, ProcessingJob.started_at) < cutoff
+            ).update(values, synchronize_session=False)
+            db.session.commit()
+        if updated:
+            logging.warning(f"Job {job.id} lost its worker; {'requeued' if retry else 'marked as failed'}")
+    return len(stale)
+
+def _heartbeat(job_id, stop_event):
+    """Refresh the lease of a running job until stop_event is set."""
+    while not stop_event.wait(app.config['JOB_HEARTBEAT_SECONDS']):
+        with app.app_context():
+            try:
+                with write_lane():
+                    ProcessingJob.query.filter_by(id=job_id, status='running').update(
+                        {'heartbeat_at': datetime.utcnow()}, synchronize_session=False)
+                    db.session.commit()
+            except Exception as e:
+                logging.warning(f"Could not refresh the heartbeat of job {job_id}: {str(e)}")
+                db.session.rollback()
+
+def _job_tracker(job):
+    """Create a tracker that publishes stage records on the job row and in the metrics."""
+    def publish(tracker):
+        record = tracker.stages[-1]
+        record_stage(metrics, record)
+        job.stage = record['stage']
+        job.stage_log = json.dumps(tracker.stages)
+        # A failed stage leaves the session to be rolled back by run_job
+        if record['status'] != 'failed':
+            with write_lane():
+                db.session.commit()
+        if record['status'] == 'done':
+            logging.info(f"Job {job.id}: {record['stage']} finished in {record['seconds']:.2f}s")
+
+    return StageTracker(publish, trace_memory=app.config['JOB_TRACE_MEMORY'])
+
+def process_upload(job, dataset, options, tracker=None):
+    """
+    Run the full pipeline for an uploaded dataset and persist the results.
+
+    Args:
+        job (ProcessingJob): The running job
+        dataset (Dataset): The dataset being processed
+        options (dict): Processing options from the upload form
+        tracker (StageTracker): Optional tracker notified as stages progress
+
+    Returns:
+        list: (category, message) notices for the user
+    """
+    messages = []
+    filepath = job.filepath
+    budget = MemoryBudget(app.config['JOB_MEMORY_BUDGET_MB'] * 1024 * 1024)
+
+    parse_bytes = estimate_parse_bytes(os.path.getsize(filepath))
+    with track_stage(tracker, 'validate', estimated_bytes=parse_bytes) as stage:
+        budget.require('parse', parse_bytes, 'Split the file into smaller uploads.')
+        is_valid, message, errors = validate_data(filepath)
+        if not is_valid:
+            os.remove(filepath)  # Delete invalid file
+            raise JobError(f'Invalid file: {message}',
+                           [f"Row {e['row']}: {e['column']} '{e['value']}' {e['error']}" for e in errors])
+
+        dataset_summary = get_dataset_summary(filepath)
+        dataset.row_count = dataset_summary['row_count']
+        dataset.product_count = dataset_summary['product_count']
+        dataset.transaction_count = dataset_summary['transaction_count']
+        dataset.date_range_start = dataset_summary['date_range_start']
+        dataset.date_range_end = dataset_summary['date_range_end']
+        stage['rows'] = dataset_summary['row_count']
+
+    partition_by = options.get('partition_by')
+    with track_stage(tracker, 'parse') as stage:
+        df = process_data(filepath, extra_columns=[partition_by] if partition_by else None)
+        # The line items stay in memory for the rest of the job
+        budget.hold('data', parse_bytes)
+        stage['rows'] = len(df)
+        stage['products'] = dataset_summary['product_count']
+
+        # Downstream consumers read the (product, day) rollup instead of the line items
+        daily_sales = build_daily_sales(df)
+        stage['daily_rows'] = len(daily_sales['products'])
+
+        # Warm the visualization cache for the analysis page; this job is the version it serves once completed
+        viz_cache.set(sales_data_cache_key(dataset.id, job.id), json.dumps(sales_overview(daily_sales)))
+
+    if partition_by and partition_by not in df.columns:
+        messages.append(('warning', f"The file has no '{partition_by}' column, so it was processed as a whole."))
+        partition_by = None
+
+    partitions = None
+    if partition_by:
+        partitions, partition_messages = _process_partitions(df, partition_by, options, budget, tracker)
+        messages += partition_messages
+        association_rules = rollup_rules({value: p['rules'] for value, p in partitions.items() if 'rules' in p})
+        forecast_results = rollup_forecasts({value: p['forecasts'] for value, p in partitions.items()
+                                             if 'forecasts' in p})
+    else:
+        association_rules = run_apriori(df, options['min_support'], options['min_confidence'], tracker, budget)
+
+        association_matrix = None
+        if options.get('use_associations') and not association_rules.empty:
+            products = sorted(df['Product_Name'].unique())
+            association_matrix = build_association_matrix(association_rules, products)
+
+        budget.require('train', estimate_training_bytes(len(daily_sales['products'])),
+                       'Split the file into smaller uploads.')
+        forecast_results = forecast_demand(daily_sales['products'], association_matrix=association_matrix,
+                                           tracker=tracker)
+
+    with track_stage(tracker, 'persist', rules=len(association_rules)) as stage, write_lane():
+        if partitions:
+            stage['partitions'] = _persist_partitions(job, dataset, partition_by, partitions)
+        messages += _persist_results(job, dataset, daily_sales, association_rules, forecast_results)
+        stage['forecasts'] = sum(len(points) for points in forecast_results.values())
+
+    # Share the rollup with the web workers; they fall back to the database if this fails
+    try:
+        shared_store.publish(dataset.id, job.id, daily_sales_to_arrays(daily_sales))
+    except Exception as e:
+        logging.warning(f"Could not publish shared arrays for dataset {dataset.id}: {str(e)}")
+
+    messages += [('info', decision) for decision in budget.decisions]
+    return messages
+
+def _process_partitions(df, key, options, budget, tracker):
+    """Mine and forecast every partition in parallel; returns the results and notices for the user."""
+    messages = []
+    partitions = split_partitions(df, key)
+
+    def collect(value, result):
+        # The partition stages ran in another process; add them to this job's stage log
+        for record in result['stages']:
+            record['partition'] = value
+            if tracker is not None:
+                tracker.add(record)
+        messages.extend(('info', f'{key} {value}: {decision}') for decision in result['decisions'])
+        if 'error' in result:
+            messages.append(('warning', f'{key} {value} was not processed: {result["error"]}'))
+
+    results = process_partitions(partitions, options, app.config['PARTITION_WORKERS'], budget.available_bytes,
+                                 app.config['JOB_TRACE_MEMORY'], collect)
+    for value, part in partitions.items():
+        results[value]['summary'] = {
+            'row_count': len(part),
+            'product_count': part['Product_Name'].nunique(),
+            'transaction_count': part['Transaction_ID'].nunique(),
+            'date_range_start': part['Date'].min(),
+            'date_range_end': part['Date'].max()
+        }
+    messages.append(('info', f'Processed {len(partitions)} partitions by {key}; the dataset shows their combined results.'))
+    return results, messages
+
+def _persist_partitions(job, dataset, key, partitions):
+    """Store every processed partition as a dataset of its own, linked to the combined dataset."""
+    stored = 0
+    for value, result in partitions.items():
+        if 'error' in result:
+            continue
+        partition_dataset = Dataset()
+        partition_dataset.filename = f'{dataset.filename} ({key}: {value})'
+        for field, field_value in result['summary'].items():
+            setattr(partition_dataset, field, field_value)
+        partition_dataset.processed = True
+        db.session.add(partition_dataset)
+        db.session.flush()
+
+        partition = DatasetPartition()
+        partition.dataset_id = dataset.id
+        partition.partition_dataset_id = partition_dataset.id
+        partition.partition_key = key
+        partition.partition_value = value
+        db.session.add(partition)
+
+        _save_results(job, partition_dataset.id, result['daily_sales'], result['rules'], result['forecasts'])
+        stored += 1
+    return stored
+
+def _save_results(job, dataset_id, daily_sales, association_rules, forecast_results):
+    save_daily_sales(dataset_id, daily_sales)
+    rule_count = save_association_rules(dataset_id, association_rules)
+    if app.config['FORECAST_STORAGE'] == 'rows':
+        forecast_count = save_forecasts(dataset_id, forecast_results)
+    else:
+        forecast_count = save_forecast_series(dataset_id, job.id, forecast_results)
+    return rule_count, forecast_count
+
+def _persist_results(job, dataset, daily_sales, association_rules, forecast_results):
+    messages = []
+    rule_count, forecast_count = _save_results(job, dataset.id, daily_sales, association_rules, forecast_results)
+    if rule_count == 0:
+        messages.append(('warning', 'No association rules found with current thresholds. Try lowering the support threshold.'))
+
+    if forecast_count == 0:
+        messages.append(('warning', 'Unable to generate demand forecasts. The data may be insufficient.'))
+    else:
+        messages.append(('success', f'Generated {forecast_count} forecast data points across all products.'))
+
+    db.session.commit()
+    return messages
+
+def run_job(job_id):
+    """
+    Execute a claimed job and record its outcome.
+
+    Args:
+        job_id (int): Id of a job in the running state
+    """
+    job = ProcessingJob.query.get(job_id)
+    dataset = Dataset.query.get(job.dataset_id)
+    tracker = _job_tracker(job)
+    stop_heartbeat = threading.Event()
+    threading.Thread(target=_heartbeat, args=(job_id, stop_heartbeat), name=f'job-{job_id}-heartbeat',
+                     daemon=True).start()
+
+    try:
+        messages = process_upload(job, dataset, json.loads(job.options or '{}'), tracker)
+
+        # Mark dataset as processed
+        dataset.processed = True
+        job.status = 'completed'
+        job.messages = json.dumps(messages + [('success', 'File successfully uploaded and processed!')])
+    except Exception as e:
+        logging.error(f"Error processing job {job_id}: {str(e)}")
+        user_error = isinstance(e, (JobError, MemoryBudgetExceeded))
+        if not user_error:
+            logging.exception("Full exception details:")
+        db.session.rollback()
+        job.stage_log = json.dumps(tracker.stages)
+        job.status = 'failed'
+        job.error = str(e) if user_error else f'Error processing file: {str(e)}'
+        if isinstance(e, JobError) and e.details:
+            job.messages = json.dumps([('error', detail) for detail in e.details])
+    finally:
+        stop_heartbeat.set()
+
+    job.finished_at = datetime.utcnow()
+    with write_lane():
+        db.session.commit()
+    metrics.flush()
+
+def work(poll_interval=2.0, stop_event=None):
+    """
+    Process queued jobs until stop_event is set.
+
+    Args:
+        poll_interval (float): Seconds to wait when the queue is empty
+        stop_event (threading.Event): Optional event that ends the loop
+    """
+    last_reap = None
+    while stop_event is None or not stop_event.is_set():
+        with app.app_context():
+            try:
+                # On start, then about once per lease period
+                if last_reap is None or time.monotonic() - last_reap > app.config['JOB_LEASE_SECONDS']:
+                    last_reap = time.monotonic()
+                    reap_stale_jobs()
+                job_id = claim_next_job()
+                if job_id is not None:
+                    run_job(job_id)
+                    continue
+            except Exception as e:
+                logging.error(f"Job worker error: {str(e)}")
+                db.session.rollback()
+        time.sleep(poll_interval)
+
+def start_worker_threads(count):
+    """
+    Start background worker threads in the current process.
+
+    Args:
+        count (int): Number of threads; 0 leaves processing to worker.py
+
+    Returns:
+        list: The started threads
+    """
+    threads = []
+    for index in range(count):
+        thread = threading.Thread(target=work, name=f'job-worker-{index}', daemon=True)
+        thread.start()
+        threads.append(thread)
+    if threads:
+        logging.info(f"Started {len(threads)} background job worker threads")
+    return threads
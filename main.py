@@ -1,7 +1,8 @@
-from app import app
-import routes  # noqa: F401
+from app import create_app
 import logging
 
+app = create_app()
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -9,10 +10,9 @@ if __name__ == "__main__":
     try:
         logging.info("Starting Demand Forecasting Application...")
         # Make sure the database tables are created
-        from app import db
-        with app.app_context():
-            db.create_all()
-            logging.info("Database tables initialized")
+        from app import init_db
+        init_db()
+        logging.info("Database tables initialized")
         
         # Run the Flask app
         logging.info("Starting server on 0.0.0.0:5000")
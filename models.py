@@ -32,7 +32,23 @@ class Dataset(db.Model):
     def __repr__(self):
         return f'<Dataset {self.filename}>'
 
+class DatasetPartition(db.Model):
+    """A partition (store, region, category...) of a dataset, stored as a dataset of its own."""
+    id = db.Column(db.Integer, primary_key=True)
+    dataset_id = db.Column(db.Integer, db.ForeignKey('dataset.id'), nullable=False, index=True)  # Combined dataset
+    partition_dataset_id = db.Column(db.Integer, db.ForeignKey('dataset.id'), nullable=False, unique=True)
+    partition_key = db.Column(db.String(100), nullable=False)  # Column the file was split by
+    partition_value = db.Column(db.String(255), nullable=False)
+    
+    def __repr__(self):
+        return f'<DatasetPartition {self.partition_key}={self.partition_value}>'
+
 class Association(db.Model):
+    __table_args__ = (
+        # Rules are read per dataset, strongest first
+        db.Index('ix_association_dataset_lift', 'dataset_id', 'lift'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     dataset_id = db.Column(db.Integer, db.ForeignKey('dataset.id'), nullable=False)
     antecedents = db.Column(db.String(255), nullable=False)
@@ -45,6 +61,11 @@ class Association(db.Model):
         return f'<Association {self.antecedents} -> {self.consequents}>'
 
 class Forecast(db.Model):
+    __table_args__ = (
+        # Forecasts are read per dataset, optionally per product, in date order
+        db.Index('ix_forecast_dataset_product_date', 'dataset_id', 'product_name', 'forecast_date'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     dataset_id = db.Column(db.Integer, db.ForeignKey('dataset.id'), nullable=False)
     product_name = db.Column(db.String(255), nullable=False)
@@ -54,3 +75,91 @@ class Forecast(db.Model):
     
     def __repr__(self):
         return f'<Forecast {self.product_name} - {self.forecast_date}>'
+
+class ForecastSeries(db.Model):
+    """Compact forecast storage: one row per product and forecast run holding all daily points."""
+    __table_args__ = (
+        db.Index('ix_forecast_series_dataset_run', 'dataset_id', 'run_id', 'product_name'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    dataset_id = db.Column(db.Integer, db.ForeignKey('dataset.id'), nullable=False)
+    run_id = db.Column(db.Integer, nullable=False)  # ProcessingJob that produced the forecast
+    product_name = db.Column(db.String(255), nullable=False)
+    start_date = db.Column(db.DateTime, nullable=False)  # Date of the first point; points are daily
+    quantities = db.Column(db.LargeBinary, nullable=False)  # Little-endian float64 array
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ForecastSeries {self.product_name} - {self.start_date} ({self.run_id})>'
+
+class DailySales(db.Model):
+    """Daily rollup of a dataset's line items: quantity and transactions per product and day."""
+    __table_args__ = (
+        db.Index('ix_daily_sales_dataset_product_date', 'dataset_id', 'product_name', 'sale_date'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    dataset_id = db.Column(db.Integer, db.ForeignKey('dataset.id'), nullable=False)
+    product_name = db.Column(db.String(255), nullable=False)
+    category = db.Column(db.String(255), nullable=False, default='')  # Empty if the file has no Category column
+    sale_date = db.Column(db.DateTime, nullable=False)
+    quantity = db.Column(db.Float, nullable=False)
+    transaction_count = db.Column(db.Integer, nullable=False)  # Transactions containing the product
+    
+    def __repr__(self):
+        return f'<DailySales {self.product_name} - {self.sale_date}>'
+
+class DailySalesTotal(db.Model):
+    """Daily totals of a dataset across all products."""
+    __table_args__ = (
+        db.Index('ix_daily_sales_total_dataset_date', 'dataset_id', 'sale_date'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    dataset_id = db.Column(db.Integer, db.ForeignKey('dataset.id'), nullable=False)
+    sale_date = db.Column(db.DateTime, nullable=False)
+    quantity = db.Column(db.Float, nullable=False)
+    transaction_count = db.Column(db.Integer, nullable=False)  # Distinct transactions
+    
+    def __repr__(self):
+        return f'<DailySalesTotal {self.sale_date}>'
+
+class UploadSession(db.Model):
+    """A resumable chunked upload; chunks are appended to filepath until received_bytes reaches total_size."""
+    id = db.Column(db.Integer, primary_key=True)
+    upload_id = db.Column(db.String(32), unique=True, nullable=False)  # Random id used in the upload URLs
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    filepath = db.Column(db.String(512), nullable=False)  # Temporary file the chunks are appended to
+    options = db.Column(db.Text)  # JSON encoded processing options
+    total_size = db.Column(db.BigInteger, nullable=False)
+    chunk_size = db.Column(db.Integer, nullable=False)
+    received_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    sha256 = db.Column(db.String(64))  # Expected SHA-256 of the whole file, if the client sent one
+    status = db.Column(db.String(20), nullable=False, default='receiving')  # receiving, completed, failed or expired
+    job_id = db.Column(db.Integer, db.ForeignKey('processing_job.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<UploadSession {self.upload_id} {self.received_bytes}/{self.total_size}>'
+
+class ProcessingJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    dataset_id = db.Column(db.Integer, db.ForeignKey('dataset.id'), nullable=False, index=True)
+    filepath = db.Column(db.String(512), nullable=False)
+    options = db.Column(db.Text)  # JSON encoded processing options
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)
+    stage = db.Column(db.String(50))
+    stage_log = db.Column(db.Text)  # JSON encoded per-stage records (status, timings, row counts)
+    messages = db.Column(db.Text)  # JSON encoded list of (category, message) notices
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)  # Refreshed by the worker while it runs the job (its lease)
+    attempts = db.Column(db.Integer, default=0)  # Times the job was claimed
+    finished_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<ProcessingJob {self.id} {self.status}>'
@@ -0,0 +1,421 @@
+"""
+Bulk persistence of pipeline results.
+
+Forecasts and association rules are written as batched multi-row inserts
+(executemany) instead of one ORM object per row. On PostgreSQL with psycopg2
+the rows are streamed with COPY. All writes join the current session
+transaction, so callers commit or roll back as before.
+"""
+import io
+import csv
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, func, or_, inspect, text
+from app import app, db
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; the lane then only serializes threads
+    fcntl = None
+from models import Association, Forecast, ForecastSeries, DailySales, DailySalesTotal
+
+BATCH_SIZE = 5000
+# ForecastSeries rows fetched per round trip when streaming; each holds a whole series
+SERIES_FETCH_SIZE = 100
+
+_write_lane_lock = threading.RLock()
+_write_lane_state = threading.local()
+
+@contextmanager
+def write_lane():
+    """
+    Serialize write transactions on SQLite.
+    
+    Writers from every thread and process on the host (through a lock file) run
+    one at a time, so they queue here instead of failing with "database is
+    locked"; readers are not affected in WAL mode. The block should end with a
+    commit or rollback. Does nothing on PostgreSQL.
+    """
+    if not app.config.get('SQLITE_WRITE_LANE'):
+        yield
+        return
+    
+    with _write_lane_lock:
+        depth = getattr(_write_lane_state, 'depth', 0)
+        _write_lane_state.depth = depth + 1
+        try:
+            if depth or fcntl is None:
+                yield
+                return
+            with open(app.config['SQLITE_WRITE_LOCK'], 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+        finally:
+            _write_lane_state.depth = depth
+
+def _use_copy():
+    dialect = db.session.get_bind().dialect
+    return dialect.name == 'postgresql' and dialect.driver == 'psycopg2'
+
+def _copy_rows(table, columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row[column] for column in columns])
+    buffer.seek(0)
+
+    # Use the session's connection so COPY runs in the same transaction
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+def bulk_insert(model, rows, batch_size=BATCH_SIZE):
+    """
+    Insert rows for a model in batches.
+
+    Args:
+        model: SQLAlchemy model class
+        rows (list): Column name -> value dicts, all with the same keys
+        batch_size (int): Rows per executemany batch
+
+    Returns:
+        int: Number of rows written
+    """
+    if not rows:
+        return 0
+
+    table = model.__table__
+    if _use_copy():
+        _copy_rows(table, list(rows[0].keys()), rows)
+    else:
+        for start in range(0, len(rows), batch_size):
+            db.session.execute(table.insert(), rows[start:start + batch_size])
+
+    logging.info(f"Bulk inserted {len(rows)} rows into {table.name}")
+    return len(rows)
+
+def save_association_rules(dataset_id, association_rules):
+    """
+    Persist mined association rules for a dataset.
+
+    Args:
+        dataset_id (int): Dataset the rules belong to
+        association_rules (DataFrame): Output of run_apriori
+
+    Returns:
+        int: Number of rules written
+    """
+    if association_rules.empty:
+        return 0
+
+    rules = association_rules[['antecedents', 'consequents', 'support', 'confidence', 'lift']]
+    rows = [
+        {
+            'dataset_id': dataset_id,
+            'antecedents': str(list(antecedents)),
+            'consequents': str(list(consequents)),
+            'support': float(support),
+            'confidence': float(confidence),
+            'lift': float(lift)
+        }
+        for antecedents, consequents, support, confidence, lift in rules.itertuples(index=False, name=None)
+    ]
+    return bulk_insert(Association, rows)
+
+def save_forecasts(dataset_id, forecast_results):
+    """
+    Persist forecast points for a dataset.
+
+    Args:
+        dataset_id (int): Dataset the forecasts belong to
+        forecast_results (dict): Output of forecast_demand
+
+    Returns:
+        int: Number of forecast points written
+    """
+    created_at = datetime.utcnow()
+    rows = [
+        {
+            'dataset_id': dataset_id,
+            'product_name': product,
+            'forecast_date': datetime.strptime(item['date'], '%Y-%m-%d'),
+            'predicted_quantity': float(item['quantity']),
+            'created_at': created_at
+        }
+        for product, product_forecasts in forecast_results.items()
+        for item in product_forecasts
+    ]
+    return bulk_insert(Forecast, rows)
+
+def pack_quantities(quantities):
+    """Pack forecast quantities into the ForecastSeries binary format."""
+    return np.asarray(quantities, dtype='<f8').tobytes()
+
+def unpack_quantities(blob):
+    """Unpack a ForecastSeries quantities blob into a list of floats."""
+    return np.frombuffer(blob, dtype='<f8').tolist()
+
+def save_forecast_series(dataset_id, run_id, forecast_results):
+    """
+    Persist forecasts as one packed array per product.
+
+    Args:
+        dataset_id (int): Dataset the forecasts belong to
+        run_id (int): Forecast run (processing job) id
+        forecast_results (dict): Output of forecast_demand
+
+    Returns:
+        int: Number of forecast points written
+    """
+    created_at = datetime.utcnow()
+    rows = []
+    point_count = 0
+    for product, product_forecasts in forecast_results.items():
+        if not product_forecasts:
+            continue
+        # A series stores only its start date, so its points must be consecutive days
+        start_date = datetime.strptime(product_forecasts[0]['date'], '%Y-%m-%d')
+        end_date = datetime.strptime(product_forecasts[-1]['date'], '%Y-%m-%d')
+        if (end_date - start_date).days != len(product_forecasts) - 1:
+            raise ValueError(f"Forecast series of {product} does not cover consecutive days")
+        rows.append({
+            'dataset_id': dataset_id,
+            'run_id': run_id,
+            'product_name': product,
+            'start_date': start_date,
+            'quantities': pack_quantities([item['quantity'] for item in product_forecasts]),
+            'created_at': created_at
+        })
+        point_count += len(product_forecasts)
+
+    # COPY's CSV format cannot carry the binary column, so series always use executemany
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.session.execute(ForecastSeries.__table__.insert(), rows[start:start + BATCH_SIZE])
+
+    logging.info(f"Stored {point_count} forecast points as {len(rows)} series")
+    return point_count
+
+def load_forecast_series(dataset_id):
+    """
+    Load the latest forecast run of a dataset as compact per-product arrays.
+
+    Falls back to row-per-point Forecast records for datasets stored in that layout.
+
+    Args:
+        dataset_id (int): Dataset id
+
+    Returns:
+        dict: Product name -> {'start': 'YYYY-MM-DD', 'quantities': [...]}
+    """
+    latest_run = db.session.execute(
+        select(func.max(ForecastSeries.run_id)).where(ForecastSeries.dataset_id == dataset_id)
+    ).scalar()
+
+    if latest_run is not None:
+        rows = db.session.execute(
+            select(ForecastSeries.product_name, ForecastSeries.start_date, ForecastSeries.quantities)
+            .where(ForecastSeries.dataset_id == dataset_id, ForecastSeries.run_id == latest_run)
+            .order_by(ForecastSeries.product_name)
+        )
+        return {
+            product: {'start': start_date.strftime('%Y-%m-%d'), 'quantities': unpack_quantities(blob)}
+            for product, start_date, blob in rows
+        }
+
+    rows = db.session.execute(
+        select(Forecast.product_name, Forecast.forecast_date, Forecast.predicted_quantity)
+        .where(Forecast.dataset_id == dataset_id)
+        .order_by(Forecast.product_name, Forecast.forecast_date)
+    )
+    series = {}
+    for product, forecast_date, quantity in rows:
+        if product not in series:
+            series[product] = {'start': forecast_date.strftime('%Y-%m-%d'), 'quantities': []}
+        series[product]['quantities'].append(quantity)
+    return series
+
+def iter_forecast_points(dataset_id, products=None, start=None, end=None, batch_size=BATCH_SIZE):
+    """
+    Stream the latest forecast run of a dataset in batches of points.
+
+    Rows are fetched through a server-side cursor (yield_per), with the product
+    and date filters applied in the query, so memory use does not depend on the
+    size of the run.
+
+    Args:
+        dataset_id (int): Dataset id
+        products (list): Only these products (all if empty)
+        start (date): First forecast date to include
+        end (date): Last forecast date to include
+        batch_size (int): Points per yielded batch
+
+    Yields:
+        list: (product, date, quantity) tuples, in product and date order
+    """
+    latest_run = db.session.execute(
+        select(func.max(ForecastSeries.run_id)).where(ForecastSeries.dataset_id == dataset_id)
+    ).scalar()
+
+    if latest_run is None:
+        query = (select(Forecast.product_name, Forecast.forecast_date, Forecast.predicted_quantity)
+                 .where(Forecast.dataset_id == dataset_id)
+                 .order_by(Forecast.product_name, Forecast.forecast_date))
+        if products:
+            query = query.where(Forecast.product_name.in_(products))
+        if start:
+            query = query.where(Forecast.forecast_date >= datetime.combine(start, datetime.min.time()))
+        if end:
+            query = query.where(Forecast.forecast_date < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+        for partition in db.session.execute(query.execution_options(yield_per=batch_size)).partitions():
+            yield [(product, forecast_date.date(), quantity) for product, forecast_date, quantity in partition]
+        return
+
+    query = (select(ForecastSeries.product_name, ForecastSeries.start_date, ForecastSeries.quantities)
+             .where(ForecastSeries.dataset_id == dataset_id, ForecastSeries.run_id == latest_run)
+             .order_by(ForecastSeries.product_name))
+    if products:
+        query = query.where(ForecastSeries.product_name.in_(products))
+    if end:
+        # Series are daily from start_date, so a series starting after the range has no points in it
+        query = query.where(ForecastSeries.start_date < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+
+    batch = []
+    for product, start_date, blob in db.session.execute(query.execution_options(yield_per=SERIES_FETCH_SIZE)):
+        first_date = start_date.date()
+        first = max((start - first_date).days, 0) if start else 0
+        last = (end - first_date).days + 1 if end else None
+        quantities = np.frombuffer(blob, dtype='<f8')[first:last]
+        batch.extend((product, first_date + timedelta(days=first + offset), quantity)
+                     for offset, quantity in enumerate(quantities.tolist()))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def iter_association_rules(dataset_id, products=None, min_lift=None, min_confidence=None, batch_size=BATCH_SIZE):
+    """
+    Stream the association rules of a dataset in batches, strongest lift first.
+
+    Args:
+        dataset_id (int): Dataset id
+        products (list): Only rules mentioning one of these products (all if empty)
+        min_lift (float): Only rules with at least this lift
+        min_confidence (float): Only rules with at least this confidence
+        batch_size (int): Rules per yielded batch
+
+    Yields:
+        list: (antecedents, consequents, support, confidence, lift) tuples, with
+            the itemsets as stored (e.g. "['Bread', 'Butter']")
+    """
+    query = (select(Association.antecedents, Association.consequents, Association.support,
+                    Association.confidence, Association.lift)
+             .where(Association.dataset_id == dataset_id)
+             .order_by(Association.lift.desc()))
+    if products:
+        # Itemsets are stored as Python list literals, so a product appears quoted
+        query = query.where(or_(*(
+            column.contains(repr(product), autoescape=True)
+            for product in products for column in (Association.antecedents, Association.consequents)
+        )))
+    if min_lift is not None:
+        query = query.where(Association.lift >= min_lift)
+    if min_confidence is not None:
+        query = query.where(Association.confidence >= min_confidence)
+    for partition in db.session.execute(query.execution_options(yield_per=batch_size)).partitions():
+        yield [tuple(row) for row in partition]
+
+def save_daily_sales(dataset_id, daily_sales):
+    """
+    Persist the daily sales rollup of a dataset.
+    
+    Args:
+        dataset_id (int): Dataset the rollup belongs to
+        daily_sales (dict): Output of build_daily_sales
+        
+    Returns:
+        int: Number of (product, day) rows written
+    """
+    product_rows = [
+        {
+            'dataset_id': dataset_id,
+            'product_name': product,
+            'category': category,
+            'sale_date': date.to_pydatetime(),
+            'quantity': float(quantity),
+            'transaction_count': int(transactions)
+        }
+        for date, product, category, quantity, transactions in daily_sales['products'][
+            ['Date', 'Product_Name', 'Category', 'Quantity', 'Transaction_Count']].itertuples(index=False, name=None)
+    ]
+    total_rows = [
+        {
+            'dataset_id': dataset_id,
+            'sale_date': date.to_pydatetime(),
+            'quantity': float(quantity),
+            'transaction_count': int(transactions)
+        }
+        for date, quantity, transactions in daily_sales['totals'][
+            ['Date', 'Quantity', 'Transaction_Count']].itertuples(index=False, name=None)
+    ]
+    bulk_insert(DailySalesTotal, total_rows)
+    return bulk_insert(DailySales, product_rows)
+
+def load_daily_sales(dataset_id):
+    """
+    Load the daily sales rollup of a dataset in the build_daily_sales layout.
+    
+    Args:
+        dataset_id (int): Dataset id
+        
+    Returns:
+        dict: 'products' and 'totals' DataFrames, or None if the dataset has no rollup
+    """
+    totals = pd.DataFrame(db.session.execute(
+        select(DailySalesTotal.sale_date, DailySalesTotal.quantity, DailySalesTotal.transaction_count)
+        .where(DailySalesTotal.dataset_id == dataset_id)
+        .order_by(DailySalesTotal.sale_date)
+    ).all(), columns=['Date', 'Quantity', 'Transaction_Count'])
+    if totals.empty:
+        return None
+    
+    products = pd.DataFrame(db.session.execute(
+        select(DailySales.sale_date, DailySales.product_name, DailySales.category, DailySales.quantity,
+               DailySales.transaction_count)
+        .where(DailySales.dataset_id == dataset_id)
+        .order_by(DailySales.sale_date, DailySales.product_name)
+    ).all(), columns=['Date', 'Product_Name', 'Category', 'Quantity', 'Transaction_Count'])
+    
+    for frame in (totals, products):
+        frame['Date'] = pd.to_datetime(frame['Date'])
+    return {'products': products, 'totals': totals}
+
+def ensure_columns():
+    """Add nullable columns declared on the models that are missing from existing tables."""
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            with db.engine.begin() as connection:
+                connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+            logging.info(f"Added column {table.name}.{column.name}")
+
+def ensure_indexes():
+    """Create indexes declared on the models that are missing from existing tables."""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
@@ -1,28 +1,88 @@
 import os
+import ast
+import gzip
 import json
+import time
+import hashlib
+import hmac
+import random
+import shutil
+import secrets
+import threading
+import multiprocessing
+from collections import OrderedDict
 import pandas as pd
-from datetime import datetime
-from flask import render_template, request, redirect, url_for, flash, jsonify, session
+from datetime import datetime, timedelta
+from flask import (render_template, request, redirect, url_for, flash, jsonify, session, abort,
+                   Response, stream_with_context, g)
 from werkzeug.utils import secure_filename
+from sqlalchemy import select, update
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, EmailField, BooleanField, SubmitField
 from wtforms.validators import DataRequired, Email, EqualTo, Length, ValidationError
 from flask_login import login_user, current_user, logout_user, login_required
-from app import app, db
-from models import User, Dataset, Association, Forecast
-from utils.data_processor import process_data, validate_data, get_dataset_summary, get_sales_data_for_visualization
-from utils.association_miner import run_apriori, visualize_association_rules
-from utils.demand_forecaster import forecast_demand
-from utils.heatmap_generator import generate_association_heatmap, generate_metrics_visualization
+from app import app, db, viz_cache, image_cache, shared_store, metrics, rule_indexes
+from models import User, Dataset, DatasetPartition, Association, ProcessingJob, UploadSession
+from jobs import JOB_STAGES, enqueue_upload, start_worker_threads, sales_data_cache_key, dataset_version
+from persistence import (load_forecast_series, load_daily_sales, write_lane, iter_forecast_points,
+                         iter_association_rules)
+from utils.data_processor import process_data
+from utils.progress import StageTracker
+from utils.metrics import stage_metrics_callback
+from utils.rule_index import METRICS as RULE_METRICS
+from utils.chunked_upload import IncrementalUpload
+from utils.memory_budget import PARSE_BYTES_PER_FILE_BYTE, estimate_parse_bytes
+from utils.export import FORMATS as EXPORT_FORMATS, PARQUET_AVAILABLE, export_chunks
+from utils.profiling import RequestProfiler
+from utils.heatmap_generator import (generate_association_heatmap, generate_metrics_visualization,
+                                     build_heatmap_matrix, heatmap_matrix_payload)
+from utils.sales_series import (GRANULARITIES, LTTB_MIN_POINTS, build_daily_sales, daily_sales_to_arrays,
+                                daily_sales_from_arrays, sales_series, sales_overview)
 import logging
 
+try:
+    import brotli
+except ImportError:  # Optional; responses fall back to gzip
+    brotli = None
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; chunk writes are then only checked by the database
+    fcntl = None
+
 ALLOWED_EXTENSIONS = {'csv', 'xlsx', 'xls'}
+# Progress streams hold a web worker, so they are closed after a while and the browser reconnects
+SSE_POLL_INTERVAL = 1.0
+SSE_MAX_STREAM_SECONDS = 60
+# Browser cache lifetime of dataset images and payloads (revalidated with ETags afterwards)
+CACHE_MAX_AGE = 3600
+# Bump when the chart rendering changes so cached images and browser copies are refreshed
+IMAGE_RENDER_VERSION = 1
+# Responses negotiated for compression, and the encodings an ETag may carry as a suffix
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/html'}
+CONTENT_ENCODINGS = ('br', 'gzip')
+# Rules listed in the analysis table
+ANALYSIS_RULE_LIMIT = 20
+# Recommendations returned by default and at most by the recommendation API
+RECOMMENDATION_DEFAULT_COUNT = 5
+RECOMMENDATION_MAX_COUNT = 50
+# Point budget of the sales series API; longer series are downsampled
+SERIES_DEFAULT_POINTS = 1000
+SERIES_MAX_POINTS = 10000
 UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
+# Bytes of a chunk request body read at a time
+UPLOAD_READ_SIZE = 64 * 1024
+# Chunked uploads whose hashing and validation state is kept in this process
+UPLOAD_STATE_LIMIT = 64
 
 # Create upload folder if it doesn't exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
+# Upload id -> IncrementalUpload, least recently used first
+_upload_states = OrderedDict()
+_upload_states_lock = threading.Lock()
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
@@ -50,10 +110,16 @@ class ForgotPasswordForm(FlaskForm):
     email = EmailField('Email', validators=[DataRequired(), Email()])
     submit = SubmitField('Send Reset Instructions')
 
+def _latest_dataset():
+    """The latest processed dataset, not counting the partitions of partitioned uploads."""
+    partition_ids = select(DatasetPartition.partition_dataset_id)
+    return Dataset.query.filter_by(processed=True).filter(Dataset.id.not_in(partition_ids)).order_by(
+        Dataset.upload_date.desc()).first()
+
 @app.route('/')
 def index():
     # Get the latest dataset if available
-    latest_dataset = Dataset.query.order_by(Dataset.upload_date.desc()).first()
+    latest_dataset = _latest_dataset()
     return render_template('index.html', dataset=latest_dataset, form=None)
 
 @app.route('/login', methods=['GET', 'POST'])
@@ -86,8 +152,9 @@ def signup():
         user.email = form.email.data
         user.set_password(form.password.data)
         
-        db.session.add(user)
-        db.session.commit()
+        with write_lane():
+            db.session.add(user)
+            db.session.commit()
         
         flash('Account created successfully! You can now log in.', 'success')
         return redirect(url_for('login'))
@@ -116,137 +183,419 @@ def forgot_password():
     
     return render_template('forgot_password.html', form=form)
 
+def _wants_json():
+    return request.accept_mimetypes.best == 'application/json'
+
+def _upload_error(message):
+    if _wants_json():
+        return jsonify({'error': message}), 400
+    flash(message, 'error')
+    return redirect(request.url)
+
+def _upload_options(form):
+    """Processing options from the upload form (raises ValueError for non-numeric thresholds)."""
+    return {
+        'min_support': float(form.get('min_support', 0.05)),
+        'min_confidence': float(form.get('min_confidence', 0.2)),
+        'use_associations': bool(form.get('use_associations')),
+        'partition_by': (form.get('partition_by') or '').strip() or None
+    }
+
+def _job_accepted(job):
+    return jsonify({
+        'job_id': job.id,
+        'dataset_id': job.dataset_id,
+        'status_url': url_for('job_status_api', job_id=job.id),
+        'events_url': url_for('job_events_api', job_id=job.id)
+    }), 202
+
 @app.route('/upload', methods=['GET', 'POST'])
 @login_required
 def upload():
     if request.method == 'POST':
         # Check if the post request has the file part
         if 'file' not in request.files:
-            flash('No file part', 'error')
-            return redirect(request.url)
+            return _upload_error('No file part')
         
         file = request.files['file']
         
         # If the user does not select a file, the browser submits an empty file
         if file.filename == '':
-            flash('No selected file', 'error')
-            return redirect(request.url)
+            return _upload_error('No selected file')
         
         if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename or "")
+            try:
+                options = _upload_options(request.form)
+            except ValueError:
+                return _upload_error('Minimum support and confidence must be numbers.')
+            
+            # A random prefix keeps uploads of the same name from overwriting each other's file
+            filename = f"{secrets.token_hex(4)}-{secure_filename(file.filename or '')}"
             filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
             file.save(filepath)
             
-            # Validate file
-            is_valid, message = validate_data(filepath)
-            
-            if not is_valid:
-                os.remove(filepath)  # Delete invalid file
-                flash(f'Invalid file: {message}', 'error')
-                return redirect(request.url)
-            
-            # Process data and store in database
+            # Queue validation, mining, forecasting and persistence for a background worker
             try:
-                dataset_summary = get_dataset_summary(filepath)
-                
-                new_dataset = Dataset()
-                new_dataset.filename = filename
-                new_dataset.row_count = dataset_summary['row_count']
-                new_dataset.product_count = dataset_summary['product_count']
-                new_dataset.transaction_count = dataset_summary['transaction_count']
-                new_dataset.date_range_start = dataset_summary['date_range_start']
-                new_dataset.date_range_end = dataset_summary['date_range_end']
-                
-                db.session.add(new_dataset)
-                db.session.commit()
-                
-                # Store the dataset ID in the session for further processing
-                session['current_dataset_id'] = new_dataset.id
-                
-                # Process the data in the background
-                df = process_data(filepath)
-                
-                # Generate sales data visualization
-                sales_data = get_sales_data_for_visualization(df)
-                session['sales_data'] = json.dumps(sales_data)
-                
-                # Run Apriori algorithm with updated default thresholds
-                min_support = float(request.form.get('min_support', 0.05))  # Updated from 0.01 to 0.05
-                min_confidence = float(request.form.get('min_confidence', 0.2))
-                
-                association_rules = run_apriori(df, min_support, min_confidence)
-                
-                # Save association rules to database
-                if not association_rules.empty:
-                    for _, rule in association_rules.iterrows():
-                        new_association = Association()
-                        new_association.dataset_id = new_dataset.id
-                        new_association.antecedents = str(list(rule['antecedents']))
-                        new_association.consequents = str(list(rule['consequents']))
-                        new_association.support = rule['support']
-                        new_association.confidence = rule['confidence']
-                        new_association.lift = rule['lift']
-                        db.session.add(new_association)
-                else:
-                    flash('No association rules found with current thresholds. Try lowering the support threshold.', 'warning')
-                
-                # Run forecasting
-                forecast_results = forecast_demand(df)
-                
-                # Save forecast results to database
-                forecast_count = 0
-                for product, product_forecasts in forecast_results.items():
-                    for forecast_item in product_forecasts:
-                        new_forecast = Forecast()
-                        new_forecast.dataset_id = new_dataset.id
-                        new_forecast.product_name = product
-                        new_forecast.forecast_date = datetime.strptime(forecast_item['date'], '%Y-%m-%d')
-                        new_forecast.predicted_quantity = float(forecast_item['quantity'])
-                        db.session.add(new_forecast)
-                        forecast_count += 1
-                
-                if forecast_count == 0:
-                    flash('Unable to generate demand forecasts. The data may be insufficient.', 'warning')
-                else:
-                    flash(f'Generated {forecast_count} forecast data points across all products.', 'success')
-                
-                db.session.commit()
-                
-                # Mark dataset as processed
-                new_dataset.processed = True
-                db.session.commit()
-                
-                flash('File successfully uploaded and processed!', 'success')
-                return redirect(url_for('analysis'))
-                
+                job = enqueue_upload(filename, filepath, options)
             except Exception as e:
-                logging.error(f"Error processing file: {str(e)}")
+                logging.error(f"Error queueing file: {str(e)}")
                 db.session.rollback()
-                flash(f'Error processing file: {str(e)}', 'error')
-                return redirect(request.url)
+                return _upload_error(f'Error processing file: {str(e)}')
+            
+            # Store the dataset ID in the session for further processing
+            session['current_dataset_id'] = job.dataset_id
+            session.pop('sales_data', None)  # Payloads now live in the server-side cache
+            
+            if _wants_json():
+                return _job_accepted(job)
+            
+            flash('File uploaded. Processing has started.', 'info')
+            return redirect(url_for('upload', job_id=job.id))
         else:
-            flash('File type not allowed. Please upload a CSV or Excel file.', 'error')
-            return redirect(request.url)
+            return _upload_error('File type not allowed. Please upload a CSV or Excel file.')
     
-    return render_template('upload.html')
+    job = None
+    if request.args.get('job_id', type=int):
+        job = ProcessingJob.query.get(request.args.get('job_id', type=int))
+    return render_template('upload.html', job=job)
 
-@app.route('/analysis')
+def _upload_state(upload):
+    """The hashing and validation state of a chunked upload, caught up with its received bytes."""
+    with _upload_states_lock:
+        state = _upload_states.pop(upload.upload_id, None)
+        if state is None or state.offset > upload.received_bytes:
+            state = IncrementalUpload(upload.filename)
+        _upload_states[upload.upload_id] = state
+        while len(_upload_states) > UPLOAD_STATE_LIMIT:
+            _upload_states.popitem(last=False)
+    state.catch_up(upload.filepath, upload.received_bytes, final=upload.received_bytes == upload.total_size)
+    return state
+
+def _discard_upload(upload, status='failed'):
+    upload.status = status
+    upload.updated_at = datetime.utcnow()
+    with _upload_states_lock:
+        _upload_states.pop(upload.upload_id, None)
+    if status != 'completed' and os.path.exists(upload.filepath):
+        os.remove(upload.filepath)
+
+def _expire_uploads():
+    """Expire the uploads that received nothing for UPLOAD_SESSION_TTL_SECONDS and delete their files."""
+    cutoff = datetime.utcnow() - timedelta(seconds=app.config['UPLOAD_SESSION_TTL_SECONDS'])
+    with write_lane():
+        stale = UploadSession.query.filter(UploadSession.status == 'receiving',
+                                           UploadSession.updated_at < cutoff).all()
+        for upload in stale:
+            _discard_upload(upload, 'expired')
+        db.session.commit()
+    if stale:
+        logging.info(f"Expired {len(stale)} abandoned uploads")
+
+def _upload_status(upload, state=None):
+    next_chunk = upload.received_bytes // upload.chunk_size
+    return {
+        'upload_id': upload.upload_id,
+        'status': upload.status,
+        'chunk_size': upload.chunk_size,
+        'total_size': upload.total_size,
+        'received_bytes': upload.received_bytes,
+        'next_chunk': next_chunk,
+        'chunk_count': -(-upload.total_size // upload.chunk_size),
+        'validation': state.validator.report() if state and state.validator else None,
+        'chunk_url': url_for('upload_chunk_api', upload_id=upload.upload_id, index=next_chunk),
+        'complete_url': url_for('upload_complete_api', upload_id=upload.upload_id)
+    }
+
+def _get_upload(upload_id):
+    upload = UploadSession.query.filter_by(upload_id=upload_id, user_id=current_user.id).first()
+    if upload is None:
+        abort(404)
+    return upload
+
+def _rejected_upload(upload, state):
+    """Fail an upload whose streaming validation found errors."""
+    report = state.validator.report()
+    with write_lane():
+        _discard_upload(upload)
+        db.session.commit()
+    message = report['file_error'] or (f"Invalid file: {report['bad_rows']} of the first {report['rows']} "
+                                       f"rows have invalid values")
+    return jsonify({
+        'error': message,
+        'details': [f"Row {e['row']}: {e['column']} '{e['value']}' {e['error']}" for e in report['errors']],
+        'validation': report
+    }), 422
+
+@app.route('/api/uploads', methods=['POST'])
 @login_required
-def analysis():
-    # Get the current dataset or the latest one
-    dataset_id = session.get('current_dataset_id')
-    if not dataset_id:
-        dataset = Dataset.query.order_by(Dataset.upload_date.desc()).first()
-        if dataset:
-            dataset_id = dataset.id
-        else:
-            flash('No dataset found. Please upload data first.', 'warning')
-            return redirect(url_for('upload'))
-    else:
-        dataset = Dataset.query.get(dataset_id)
+def create_upload_api():
+    """
+    Start a resumable chunked upload.
+    
+    The JSON body gives the 'filename', its 'size', optionally its 'sha256', and the
+    processing 'options' of the upload form. The chunks are then PUT in order to
+    chunk_url, and the upload is finished with a POST to complete_url.
+    """
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({'error': 'The request body must be a JSON object'}), 400
+    filename = secure_filename(str(body.get('filename') or ''))
+    if not filename or not allowed_file(filename):
+        return jsonify({'error': 'File type not allowed. Please upload a CSV or Excel file.'}), 400
+    size = body.get('size')
+    if not isinstance(size, int) or size <= 0:
+        return jsonify({'error': 'size must be the file size in bytes'}), 400
+    if size > app.config['UPLOAD_MAX_BYTES']:
+        return jsonify({'error': f"The file is larger than {app.config['UPLOAD_MAX_BYTES'] // (1024 * 1024)} MB"}), 413
+    # Refuse a file its job could not parse within the memory budget before any of it is sent
+    budget_bytes = app.config['JOB_MEMORY_BUDGET_MB'] * 1024 * 1024
+    if budget_bytes and estimate_parse_bytes(size) > budget_bytes:
+        return jsonify({'error': f"The file is too large to process within the "
+                                 f"{app.config['JOB_MEMORY_BUDGET_MB']} MB memory budget of a job "
+                                 f"(at most about {budget_bytes // PARSE_BYTES_PER_FILE_BYTE // (1024 * 1024)} MB). "
+                                 f"Split it into smaller uploads."}), 413
+    try:
+        options = _upload_options(body.get('options') or {})
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Minimum support and confidence must be numbers.'}), 400
+    
+    _expire_uploads()
+    active = UploadSession.query.filter_by(user_id=current_user.id, status='receiving').count()
+    if active >= app.config['UPLOAD_MAX_ACTIVE']:
+        return jsonify({'error': f"You already have {active} uploads in progress. Finish or wait for them "
+                                 f"before starting another."}), 429
+    
+    upload_id = secrets.token_hex(16)
+    os.makedirs(app.config['UPLOAD_TEMP_DIR'], exist_ok=True)
+    filepath = os.path.join(app.config['UPLOAD_TEMP_DIR'], f"{upload_id}.part")
+    open(filepath, 'wb').close()
+    
+    with write_lane():
+        upload = UploadSession()
+        upload.upload_id = upload_id
+        upload.user_id = current_user.id
+        upload.filename = filename
+        upload.filepath = filepath
+        upload.options = json.dumps(options)
+        upload.total_size = size
+        upload.chunk_size = app.config['UPLOAD_CHUNK_BYTES']
+        upload.received_bytes = 0
+        upload.sha256 = str(body['sha256']).lower() if body.get('sha256') else None
+        db.session.add(upload)
+        db.session.commit()
+    return jsonify(_upload_status(upload)), 201
+
+@app.route('/api/uploads/<upload_id>')
+@login_required
+def upload_status_api(upload_id):
+    """Status of a chunked upload; a client resumes from its next_chunk."""
+    upload = _get_upload(upload_id)
+    return jsonify(_upload_status(upload))
+
+@app.route('/api/uploads/<upload_id>/chunks/<int:index>', methods=['PUT'])
+@login_required
+def upload_chunk_api(upload_id, index):
+    """
+    Receive chunk number index of an upload as the raw request body.
+    
+    Chunks must arrive in order; a chunk that was already received is acknowledged
+    without being written again. An optional X-Chunk-SHA256 header is checked
+    against the chunk. CSV rows are validated as they arrive, and the upload is
+    rejected with the bad rows as soon as any are found.
+    """
+    upload = _get_upload(upload_id)
+    if upload.status != 'receiving':
+        return jsonify({'error': f'The upload is {upload.status}', **_upload_status(upload)}), 409
+    
+    with open(upload.filepath, 'r+b') as f:
+        # Requests for the same upload write one at a time, also across processes
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        db.session.refresh(upload)
+        # The upload may have expired while this request waited for the lock
+        if upload.status != 'receiving':
+            return jsonify({'error': f'The upload is {upload.status}', **_upload_status(upload)}), 409
+        next_chunk = upload.received_bytes // upload.chunk_size
+        if index < next_chunk:
+            return jsonify(_upload_status(upload))
+        if index > next_chunk:
+            return jsonify({'error': f'Expected chunk {next_chunk}', **_upload_status(upload)}), 409
+        
+        offset = index * upload.chunk_size
+        expected = min(upload.chunk_size, upload.total_size - offset)
+        chunk_hash = hashlib.sha256()
+        written = 0
+        # Anything past the last received chunk is left over from an interrupted request
+        f.truncate(offset)
+        f.seek(offset)
+        while written <= expected:
+            data = request.stream.read(min(UPLOAD_READ_SIZE, expected + 1 - written))
+            if not data:
+                break
+            f.write(data)
+            chunk_hash.update(data)
+            written += len(data)
+        if written != expected:
+            f.truncate(offset)
+            return jsonify({'error': f'Chunk {index} must be {expected} bytes, got {written}',
+                            **_upload_status(upload)}), 400
+        supplied = request.headers.get('X-Chunk-SHA256')
+        if supplied and supplied.lower() != chunk_hash.hexdigest():
+            f.truncate(offset)
+            return jsonify({'error': f'Chunk {index} does not match its checksum', **_upload_status(upload)}), 400
+        f.flush()
+        os.fsync(f.fileno())
+        
+        # Guards against writers without the file lock (e.g. on Windows)
+        with write_lane():
+            advanced = db.session.execute(
+                update(UploadSession)
+                .where(UploadSession.id == upload.id, UploadSession.received_bytes == offset)
+                .values(received_bytes=offset + written, updated_at=datetime.utcnow())
+            ).rowcount
+            db.session.commit()
+    db.session.refresh(upload)
+    if not advanced:
+        return jsonify({'error': f'Chunk {index} was received concurrently', **_upload_status(upload)}), 409
+    
+    state = _upload_state(upload)
+    if state.validator and state.validator.failed:
+        return _rejected_upload(upload, state)
+    return jsonify(_upload_status(upload, state))
+
+@app.route('/api/uploads/<upload_id>/complete', methods=['POST'])
+@login_required
+def upload_complete_api(upload_id):
+    """Check a fully received upload and queue it for processing like a form upload."""
+    upload = _get_upload(upload_id)
+    if upload.status != 'receiving':
+        return jsonify({'error': f'The upload is {upload.status}', **_upload_status(upload)}), 409
+    if upload.received_bytes != upload.total_size:
+        return jsonify({'error': f'{upload.total_size - upload.received_bytes} bytes are missing',
+                        **_upload_status(upload)}), 409
+    
+    state = _upload_state(upload)
+    if state.validator and state.validator.failed:
+        return _rejected_upload(upload, state)
+    if upload.sha256 and state.sha256 != upload.sha256:
+        with write_lane():
+            _discard_upload(upload)
+            db.session.commit()
+        return jsonify({'error': 'The received file does not match its checksum. Please upload it again.'}), 422
     
-    # Get association rules for the dataset
-    associations = Association.query.filter_by(dataset_id=dataset_id).all()
+    options = json.loads(upload.options or '{}')
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{upload.upload_id[:8]}-{upload.filename}")
+    shutil.move(upload.filepath, filepath)
+    
+    try:
+        job = enqueue_upload(os.path.basename(filepath), filepath, options)
+    except Exception as e:
+        logging.error(f"Error queueing file: {str(e)}")
+        db.session.rollback()
+        # Put the file back so the session still matches its file and can be completed again
+        shutil.move(filepath, upload.filepath)
+        return jsonify({'error': f'Error processing file: {str(e)}'}), 500
+    
+    with write_lane():
+        upload.job_id = job.id
+        _discard_upload(upload, 'completed')
+        db.session.commit()
+    
+    session['current_dataset_id'] = job.dataset_id
+    return _job_accepted(job)
+
+def _job_status(job):
+    stage_log = json.loads(job.stage_log or '[]')
+    completed_stages = len({record['stage'] for record in stage_log if record['status'] == 'done'})
+    if job.status == 'completed':
+        completed_stages = len(JOB_STAGES)
+    return {
+        'id': job.id,
+        'dataset_id': job.dataset_id,
+        'status': job.status,
+        'stage': job.stage,
+        'stages': JOB_STAGES,
+        'progress': round(100 * completed_stages / len(JOB_STAGES)),
+        'stage_log': stage_log,
+        'messages': [{'category': c, 'message': m} for c, m in json.loads(job.messages or '[]')],
+        'error': job.error,
+        'created_at': job.created_at.strftime('%Y-%m-%d %H:%M:%S') if job.created_at else None,
+        'started_at': job.started_at.strftime('%Y-%m-%d %H:%M:%S') if job.started_at else None,
+        'finished_at': job.finished_at.strftime('%Y-%m-%d %H:%M:%S') if job.finished_at else None,
+        'redirect': url_for('analysis') if job.status == 'completed' else None
+    }
+
+@app.route('/api/jobs/<int:job_id>')
+@login_required
+def job_status_api(job_id):
+    job = ProcessingJob.query.get_or_404(job_id)
+    return jsonify(_job_status(job))
+
+@app.route('/api/jobs/<int:job_id>/events')
+@login_required
+def job_events_api(job_id):
+    ProcessingJob.query.get_or_404(job_id)
+    
+    def stream():
+        # Ask the browser to reconnect quickly when the stream ends before the job does
+        yield f"retry: {int(SSE_POLL_INTERVAL * 1000)}\n\n"
+        
+        last_payload = None
+        deadline = time.monotonic() + SSE_MAX_STREAM_SECONDS
+        while time.monotonic() < deadline:
+            # End the read transaction so changes committed by the worker become visible
+            db.session.rollback()
+            job = db.session.get(ProcessingJob, job_id)
+            payload = json.dumps(_job_status(job))
+            if payload != last_payload:
+                yield f"event: progress\ndata: {payload}\n\n"
+                last_payload = payload
+            else:
+                yield ": keep-alive\n\n"
+            
+            if job.status in ('completed', 'failed'):
+                yield "event: end\ndata: {}\n\n"
+                return
+            time.sleep(SSE_POLL_INTERVAL)
+    
+    return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def _redirect_if_not_processed(dataset):
+    if dataset is None:
+        flash('No dataset found. Please upload data first.', 'warning')
+        return redirect(url_for('upload'))
+    if dataset.processed:
+        return None
+    
+    job = ProcessingJob.query.filter_by(dataset_id=dataset.id).order_by(ProcessingJob.id.desc()).first()
+    if job and job.status == 'failed':
+        session.pop('current_dataset_id', None)
+        flash(job.error or 'Processing of this dataset failed.', 'error')
+        return redirect(url_for('upload'))
+    
+    flash('This dataset is still being processed.', 'info')
+    return redirect(url_for('upload', job_id=job.id if job else None))
+
+def _partition_nav(dataset):
+    """Links between a partitioned dataset and its partitions, or None if it has none."""
+    parent = DatasetPartition.query.filter_by(partition_dataset_id=dataset.id).first()
+    combined_id = parent.dataset_id if parent else dataset.id
+    partitions = DatasetPartition.query.filter_by(dataset_id=combined_id).order_by(
+        DatasetPartition.partition_value).all()
+    if not partitions:
+        return None
+    return {
+        'key': partitions[0].partition_key,
+        'combined_id': combined_id,
+        'current_id': dataset.id,
+        'partitions': [(partition.partition_value, partition.partition_dataset_id) for partition in partitions]
+    }
+
+def _load_rules_data(dataset_id, limit=None):
+    """Load a dataset's association rules as dicts, strongest lift first (at most limit rules)."""
+    query = Association.query.filter_by(dataset_id=dataset_id).order_by(Association.lift.desc())
+    associations = query.limit(limit).all() if limit else query.all()
     
     # Prepare data for visualization
     rules_data = []
@@ -280,50 +629,52 @@ def analysis():
                 continue
             continue
     
-    # Get sales data for visualization (from session or regenerate)
-    sales_data = session.get('sales_data')
-    
-    if sales_data:
-        sales_data = json.loads(sales_data)
+    return rules_data
+
+@app.route('/analysis')
+@login_required
+def analysis():
+    # Get the requested (e.g. a partition), current or latest dataset
+    if request.args.get('dataset_id', type=int):
+        session['current_dataset_id'] = request.args.get('dataset_id', type=int)
+    dataset_id = session.get('current_dataset_id')
+    if not dataset_id:
+        dataset = _latest_dataset()
+        if dataset:
+            dataset_id = dataset.id
+        else:
+            flash('No dataset found. Please upload data first.', 'warning')
+            return redirect(url_for('upload'))
     else:
-        # If no sales data in session, try to regenerate from the dataset file
-        try:
-            if dataset and dataset.filename:
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], dataset.filename)
-                if os.path.exists(filepath):
-                    df = process_data(filepath)
-                    sales_data = get_sales_data_for_visualization(df)
-                else:
-                    sales_data = {'top_products': {}, 'sales_over_time': []}
-            else:
-                sales_data = {'top_products': {}, 'sales_over_time': []}
-        except Exception as e:
-            logging.error(f"Error regenerating sales data: {str(e)}")
-            sales_data = {'top_products': {}, 'sales_over_time': []}
-    
-    # Generate association heatmap
-    heatmap_image = None
-    if rules_data:
-        try:
-            heatmap_image = generate_association_heatmap(rules_data)
-            logging.info(f"Generated association heatmap with {len(rules_data)} rules")
-        except Exception as e:
-            logging.error(f"Error generating heatmap: {str(e)}")
-            flash(f'Error generating association heatmap: {str(e)}', 'warning')
+        dataset = Dataset.query.get(dataset_id)
+    
+    not_ready = _redirect_if_not_processed(dataset)
+    if not_ready:
+        return not_ready
+    
+    # Only the rules shown in the table are loaded; charts fetch their data from the cacheable APIs
+    rules_data = _load_rules_data(dataset_id, ANALYSIS_RULE_LIMIT)
+    rule_count = Association.query.filter_by(dataset_id=dataset_id).count()
+    
+    # Heatmaps are served from cached endpoints; ?heatmap=canvas draws it in the browser instead
+    heatmap_mode = request.args.get('heatmap', app.config['HEATMAP_MODE'])
     
     return render_template('analysis.html', 
                           dataset=dataset, 
                           rules=rules_data, 
-                          sales_data=json.dumps(sales_data),
-                          heatmap_image=heatmap_image)
+                          rule_count=rule_count,
+                          heatmap_mode=heatmap_mode,
+                          partition_nav=_partition_nav(dataset))
 
 @app.route('/forecast')
 @login_required
 def forecast():
-    # Get the current dataset or the latest one
+    # Get the requested (e.g. a partition), current or latest dataset
+    if request.args.get('dataset_id', type=int):
+        session['current_dataset_id'] = request.args.get('dataset_id', type=int)
     dataset_id = session.get('current_dataset_id')
     if not dataset_id:
-        dataset = Dataset.query.order_by(Dataset.upload_date.desc()).first()
+        dataset = _latest_dataset()
         if dataset:
             dataset_id = dataset.id
         else:
@@ -332,31 +683,28 @@ def forecast():
     else:
         dataset = Dataset.query.get(dataset_id)
     
-    # Get forecast data for the dataset
-    forecasts = Forecast.query.filter_by(dataset_id=dataset_id).all()
+    not_ready = _redirect_if_not_processed(dataset)
+    if not_ready:
+        return not_ready
     
-    # Group forecasts by product
-    forecast_data = {}
-    for forecast in forecasts:
-        if forecast.product_name not in forecast_data:
-            forecast_data[forecast.product_name] = []
-        
-        forecast_data[forecast.product_name].append({
-            'date': forecast.forecast_date.strftime('%Y-%m-%d'),
-            'quantity': forecast.predicted_quantity
-        })
+    # The chart fetches the series from the forecast API; this warms the same cache entry
+    forecast_data = _forecast_payload(dataset_id)
     
     # If no forecast data is found, provide a clear message
-    if not forecast_data:
+    if forecast_data == '{}':
         flash('No forecast data is available. The system may need more data for accurate forecasting.', 'warning')
     
-    return render_template('forecast.html', dataset=dataset, forecast_data=json.dumps(forecast_data))
+    return render_template('forecast.html', dataset=dataset, partition_nav=_partition_nav(dataset))
 
 @app.route('/api/dataset/<int:dataset_id>/summary')
 @login_required
 def dataset_summary_api(dataset_id):
     dataset = Dataset.query.get_or_404(dataset_id)
-    return jsonify({
+    etag = _etag_for('summary', dataset_id, dataset_version(dataset_id))
+    if _etag_matches(etag):
+        return _not_modified(etag)
+    
+    return _cacheable_response(json.dumps({
         'filename': dataset.filename,
         'upload_date': dataset.upload_date.strftime('%Y-%m-%d %H:%M:%S'),
         'row_count': dataset.row_count,
@@ -366,8 +714,387 @@ def dataset_summary_api(dataset_id):
             'start': dataset.date_range_start.strftime('%Y-%m-%d') if dataset.date_range_start else None,
             'end': dataset.date_range_end.strftime('%Y-%m-%d') if dataset.date_range_end else None
         }
+    }), 'application/json', etag)
+
+def _etag_for(*parts):
+    return hashlib.sha1(':'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+def _etag_matches(etag):
+    """Return the ETag the client holds for any encoding of this payload, or None."""
+    for candidate in (etag,) + tuple(f'{etag}-{encoding}' for encoding in CONTENT_ENCODINGS):
+        if request.if_none_match.contains(candidate):
+            return candidate
+    return None
+
+def _cacheable_response(body, mimetype, etag):
+    if _etag_matches(etag):
+        return _not_modified(etag)
+    
+    response = Response(body, mimetype=mimetype)
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = CACHE_MAX_AGE
+    return response
+
+def _not_modified(etag):
+    response = Response(status=304)
+    # Echo the validator the client sent, which carries its encoding suffix
+    response.set_etag(_etag_matches(etag) or etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = CACHE_MAX_AGE
+    return response
+
+def _negotiate_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+@app.after_request
+def compress_response(response):
+    """Compress JSON and HTML responses for clients that accept br or gzip."""
+    if (response.mimetype not in COMPRESSIBLE_MIMETYPES or response.status_code != 200
+            or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers):
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    encoding = _negotiate_encoding()
+    if encoding is None or len(body) < app.config['COMPRESS_MIN_BYTES']:
+        return response
+    
+    if encoding == 'br':
+        response.set_data(brotli.compress(body, quality=5))
+    else:
+        response.set_data(gzip.compress(body, compresslevel=6))
+    response.headers['Content-Encoding'] = encoding
+    
+    # Each encoding is a different representation, so it gets its own strong ETag
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(f'{etag}-{encoding}')
+    return response
+
+@app.route('/api/dataset/<int:dataset_id>/images/<kind>.png')
+@login_required
+def dataset_image_api(dataset_id, kind):
+    if kind not in ('heatmap', 'metrics'):
+        abort(404)
+    
+    params = {'max_products': request.args.get('max_products', 15, type=int)} if kind == 'heatmap' else {}
+    key = image_cache.make_key(kind, dataset_id, version=dataset_version(dataset_id), **params)
+    etag = _etag_for(key, IMAGE_RENDER_VERSION)
+    
+    # Results of a processing run never change, so a matching ETag skips rendering entirely
+    if _etag_matches(etag):
+        return _not_modified(etag)
+    
+    def render():
+        rules_data = _load_rules_data(dataset_id)
+        if not rules_data:
+            abort(404)
+        tracker = StageTracker(stage_metrics_callback(metrics))
+        with tracker.stage(f'render_{kind}', rules=len(rules_data)):
+            if kind == 'heatmap':
+                return generate_association_heatmap(rules_data, params['max_products'], output='png')
+            return generate_metrics_visualization(rules_data, output='png')
+    
+    return _cacheable_response(image_cache.get_or_create(key, render), 'image/png', etag)
+
+@app.route('/api/dataset/<int:dataset_id>/heatmap')
+@login_required
+def heatmap_matrix_api(dataset_id):
+    max_products = request.args.get('max_products', 15, type=int)
+    key = viz_cache.make_key('heatmap', dataset_id, version=dataset_version(dataset_id), max_products=max_products)
+    etag = _etag_for(key)
+    
+    if _etag_matches(etag):
+        return _not_modified(etag)
+    
+    def build():
+        rules_data = _load_rules_data(dataset_id)
+        if not rules_data:
+            return json.dumps({'products': [], 'lift': [], 'support': [], 'confidence': []})
+        return json.dumps(heatmap_matrix_payload(build_heatmap_matrix(rules_data, max_products)))
+    
+    return _cacheable_response(viz_cache.get_or_create(key, build), 'application/json', etag)
+
+def _daily_sales(dataset):
+    """
+    Daily sales rollup of a dataset, from the shared array store or the database.
+    
+    Datasets processed before rollups were persisted are rolled up from their file.
+    Rollups loaded here are published to the store for the other workers.
+    
+    Returns:
+        dict: 'products' and 'totals' DataFrames, or None if no data is available
+    """
+    arrays = shared_store.get(dataset.id)
+    if arrays is not None:
+        return daily_sales_from_arrays(arrays)
+    
+    try:
+        daily_sales = load_daily_sales(dataset.id)
+        if daily_sales is None:
+            filepath = os.path.join(app.config['UPLOAD_FOLDER'], dataset.filename) if dataset.filename else None
+            if not filepath or not os.path.exists(filepath):
+                return None
+            daily_sales = build_daily_sales(process_data(filepath))
+    except Exception as e:
+        logging.error(f"Error loading daily sales of dataset {dataset.id}: {str(e)}")
+        return None
+    
+    try:
+        shared_store.publish(dataset.id, dataset_version(dataset.id), daily_sales_to_arrays(daily_sales))
+    except OSError as e:
+        logging.warning(f"Could not publish shared arrays for dataset {dataset.id}: {str(e)}")
+    return daily_sales
+
+def _sales_payload(dataset, version):
+    """Sales overview payload of a dataset version, built from its daily rollup on a cache miss."""
+    def build():
+        daily_sales = _daily_sales(dataset)
+        if daily_sales is None:
+            return json.dumps({'top_products': {}, 'sales_over_time': []})
+        return json.dumps(sales_overview(daily_sales))
+    
+    return viz_cache.get_or_create(sales_data_cache_key(dataset.id, version), build)
+
+@app.route('/api/dataset/<int:dataset_id>/sales')
+@login_required
+def sales_data_api(dataset_id):
+    dataset = Dataset.query.get_or_404(dataset_id)
+    version = dataset_version(dataset_id)
+    etag = _etag_for(sales_data_cache_key(dataset_id, version))
+    if _etag_matches(etag):
+        return _not_modified(etag)
+    
+    return _cacheable_response(_sales_payload(dataset, version), 'application/json', etag)
+
+@app.route('/api/dataset/<int:dataset_id>/sales/series')
+@login_required
+def sales_series_api(dataset_id):
+    dataset = Dataset.query.get_or_404(dataset_id)
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in GRANULARITIES:
+        return jsonify({'error': f"granularity must be one of {', '.join(GRANULARITIES)}"}), 400
+    products = sorted(request.args.getlist('product'))
+    categories = sorted(request.args.getlist('category'))
+    points = min(request.args.get('points', SERIES_DEFAULT_POINTS, type=int), SERIES_MAX_POINTS)
+    if points < LTTB_MIN_POINTS:
+        return jsonify({'error': f'points must be at least {LTTB_MIN_POINTS}'}), 400
+    
+    key = viz_cache.make_key('series', dataset_id, version=dataset_version(dataset_id), granularity=granularity,
+                             products=json.dumps(products), categories=json.dumps(categories), points=points)
+    etag = _etag_for(key)
+    if _etag_matches(etag):
+        return _not_modified(etag)
+    
+    def build():
+        daily_sales = _daily_sales(dataset)
+        if daily_sales is None:
+            abort(404)
+        return json.dumps(sales_series(daily_sales, granularity, products, categories, max_points=points))
+    
+    return _cacheable_response(viz_cache.get_or_create(key, build), 'application/json', etag)
+
+def _forecast_cache_key(dataset_id):
+    return viz_cache.make_key('forecast', dataset_id, version=dataset_version(dataset_id))
+
+def _forecast_payload(dataset_id, key=None):
+    """JSON forecast series of a dataset's latest run, from the payload cache."""
+    return viz_cache.get_or_create(key or _forecast_cache_key(dataset_id),
+                                   lambda: json.dumps(load_forecast_series(dataset_id)))
+
+@app.route('/api/dataset/<int:dataset_id>/forecast')
+@login_required
+def forecast_data_api(dataset_id):
+    Dataset.query.get_or_404(dataset_id)
+    key = _forecast_cache_key(dataset_id)
+    etag = _etag_for(key)
+    if _etag_matches(etag):
+        return _not_modified(etag)
+    
+    return _cacheable_response(_forecast_payload(dataset_id, key), 'application/json', etag)
+
+# Columns of the forecast and rule exports
+FORECAST_EXPORT_COLUMNS = [('product', 'string'), ('date', 'date'), ('quantity', 'float')]
+RULE_EXPORT_COLUMNS = [('antecedents', 'list'), ('consequents', 'list'), ('support', 'float'),
+                       ('confidence', 'float'), ('lift', 'float')]
+
+def _parse_itemset(text):
+    """Parse a stored itemset ("['Bread', 'Butter']") into a list of products."""
+    try:
+        return [str(item) for item in ast.literal_eval(text)]
+    except (ValueError, SyntaxError):
+        return [item.strip().strip("'\"") for item in text.strip('[]').split(',')]
+
+def _export_response(dataset_id, name, export_format, columns, batches):
+    """Stream row batches as a CSV or Parquet download."""
+    return Response(
+        stream_with_context(export_chunks(export_format, columns, batches)),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={
+            'Content-Disposition': f'attachment; filename=dataset-{dataset_id}-{name}.{export_format}',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+def _export_format(export_format):
+    """Error response for an unsupported export format, or None."""
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(EXPORT_FORMATS)}"}), 404
+    if export_format == 'parquet' and not PARQUET_AVAILABLE:
+        return jsonify({'error': 'Parquet export requires the pyarrow package'}), 501
+    return None
+
+@app.route('/api/dataset/<int:dataset_id>/export/forecasts.<export_format>')
+@login_required
+def export_forecasts_api(dataset_id, export_format):
+    error = _export_format(export_format)
+    if error:
+        return error
+    Dataset.query.get_or_404(dataset_id)
+    try:
+        start = datetime.strptime(request.args['start'], '%Y-%m-%d').date() if request.args.get('start') else None
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d').date() if request.args.get('end') else None
+    except ValueError:
+        return jsonify({'error': 'start and end must be dates in the YYYY-MM-DD format'}), 400
+    
+    batches = iter_forecast_points(dataset_id, request.args.getlist('product'), start, end)
+    return _export_response(dataset_id, 'forecasts', export_format, FORECAST_EXPORT_COLUMNS, batches)
+
+@app.route('/api/dataset/<int:dataset_id>/export/rules.<export_format>')
+@login_required
+def export_rules_api(dataset_id, export_format):
+    error = _export_format(export_format)
+    if error:
+        return error
+    Dataset.query.get_or_404(dataset_id)
+    products = request.args.getlist('product')
+    min_lift = request.args.get('min_lift', type=float)
+    min_confidence = request.args.get('min_confidence', type=float)
+    
+    def batches():
+        for batch in iter_association_rules(dataset_id, products, min_lift, min_confidence):
+            yield [(_parse_itemset(antecedents), _parse_itemset(consequents), support, confidence, lift)
+                   for antecedents, consequents, support, confidence, lift in batch]
+    
+    return _export_response(dataset_id, 'rules', export_format, RULE_EXPORT_COLUMNS, batches())
+
+def _recommendation_authorized():
+    token = app.config['RECOMMENDATION_TOKEN']
+    authorization = request.headers.get('Authorization', '')
+    if token and hmac.compare_digest(authorization, f'Bearer {token}'):
+        return True
+    return current_user.is_authenticated
+
+@app.route('/api/dataset/<int:dataset_id>/recommendations', methods=['GET', 'POST'])
+def recommendations_api(dataset_id):
+    """
+    Recommend products for a basket from a dataset's association rules.
+    
+    The basket is given as repeated ?item= parameters or as a JSON body
+    {"items": [...], "k": 5, "metric": "lift"}.
+    """
+    if not _recommendation_authorized():
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    body = (request.get_json(silent=True) or {}) if request.method == 'POST' else {}
+    if not isinstance(body, dict):
+        return jsonify({'error': 'The request body must be a JSON object'}), 400
+    items = body.get('items') if 'items' in body else request.args.getlist('item')
+    if not isinstance(items, list) or not all(isinstance(item, str) for item in items):
+        return jsonify({'error': 'items must be a list of product names'}), 400
+    metric = body.get('metric') or request.args.get('metric', 'lift')
+    if metric not in RULE_METRICS:
+        return jsonify({'error': f"metric must be one of {', '.join(RULE_METRICS)}"}), 400
+    # An explicit k is checked as given (0 is not "missing"); only an absent k gets the default
+    k = body['k'] if body.get('k') is not None else request.args.get('k', RECOMMENDATION_DEFAULT_COUNT)
+    if isinstance(k, str):
+        try:
+            k = int(k)
+        except ValueError:
+            pass
+    if isinstance(k, bool) or not isinstance(k, int) or not 1 <= k <= RECOMMENDATION_MAX_COUNT:
+        return jsonify({'error': f'k must be an integer from 1 to {RECOMMENDATION_MAX_COUNT}'}), 400
+    
+    version = dataset_version(dataset_id)
+    if version == 0 and Dataset.query.get(dataset_id) is None:
+        abort(404)
+    index = rule_indexes.get(dataset_id, version, lambda: _load_rules_data(dataset_id))
+    
+    started = time.perf_counter()
+    recommendations = index.recommend(items, k, metric)
+    lookup_ms = (time.perf_counter() - started) * 1000
+    return jsonify({
+        'dataset_id': dataset_id,
+        'version': version,
+        'items': items,
+        'metric': metric,
+        'recommendations': recommendations,
+        'lookup_ms': round(lookup_ms, 3)
     })
 
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is not None:
+        metrics.observe('http_request_duration_seconds', time.perf_counter() - started,
+                        endpoint=request.endpoint or 'unmatched', method=request.method,
+                        status=response.status_code)
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    token = app.config['METRICS_TOKEN']
+    # Latencies and pipeline sizes are not public: without a token the endpoint is disabled
+    if not token:
+        abort(404)
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        abort(403)
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def _profile_requested():
+    token = app.config['PROFILE_TOKEN']
+    if token:
+        supplied = request.headers.get('X-Profile') or request.args.get('profile')
+        if supplied and hmac.compare_digest(supplied, token):
+            return True
+    rate = app.config['PROFILE_SAMPLE_RATE']
+    return rate > 0 and random.random() < rate
+
+def start_request_profile():
+    if not _profile_requested():
+        return
+    # "X-Profile-Mode: deterministic" adds cProfile to the stack sampling
+    mode = request.headers.get('X-Profile-Mode') or request.args.get('profile_mode')
+    g.profiler = RequestProfiler(deterministic=(mode == 'deterministic'))
+    g.profiler.start()
+
+def finish_request_profile(exc):
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return
+    dataset_id = (request.view_args or {}).get('dataset_id') or session.get('current_dataset_id')
+    try:
+        path = profiler.stop(app.config['PROFILE_DIR'], request.endpoint or 'unmatched', dataset_id)
+        logging.info(f"Profiled {request.method} {request.path}: {path}")
+    except OSError as e:
+        logging.warning(f"Could not write request profile: {str(e)}")
+
+# Without a token or sample rate the hooks are not installed at all
+if app.config['PROFILE_TOKEN'] or app.config['PROFILE_SAMPLE_RATE'] > 0:
+    app.before_request(start_request_profile)
+    app.teardown_request(finish_request_profile)
+
 @app.errorhandler(404)
 def page_not_found(e):
     return render_template('404.html'), 404
@@ -375,3 +1102,10 @@ def page_not_found(e):
 @app.errorhandler(500)
 def server_error(e):
     return render_template('500.html'), 500
+
+# Process queued uploads in this web process unless a dedicated worker.py pool is used.
+# A preloaded gunicorn master must not run them; each worker starts its own after the fork.
+# Nor must the processes of a partition pool, which import the main module (and so the
+# routes) again when they are spawned.
+if not app.config['PRELOAD_APP'] and multiprocessing.parent_process() is None:
+    start_worker_threads(app.config['JOB_WORKERS'])
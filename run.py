@@ -19,10 +19,9 @@ def run_app():
     # First, make sure the database is properly set up
     print("Setting up database...")
     try:
-        from app import app, db
-        with app.app_context():
-            db.create_all()
-            print("✅ Database initialized successfully")
+        from app import init_db
+        init_db()
+        print("✅ Database initialized successfully")
     except Exception as e:
         print(f"❌ Error initializing database: {str(e)}")
         print("Please fix the database connection issues before continuing")
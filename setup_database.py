@@ -97,10 +97,9 @@ def setup_database():
     
     # Import and initialize models
     try:
-        from app import app, db
-        with app.app_context():
-            db.create_all()
-            logging.info("✅ Database tables created successfully.")
+        from app import init_db
+        init_db()
+        logging.info("✅ Database tables created successfully.")
         return True
     except Exception as e:
         logging.error(f"❌ Error creating database tables: {str(e)}")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Startup timing report for the Demand Forecasting System
+
+Imports a module (the web entry point by default) in a fresh interpreter with
+`python -X importtime` and reports where import time goes, grouped by top-level
+package, together with the total import time and peak memory of the process.
+
+Usage:
+    python startup_report.py
+    python startup_report.py --module jobs --top 25
+"""
+import re
+import sys
+import argparse
+import resource
+import subprocess
+from collections import defaultdict
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s*(\S+)')
+
+def parse_importtime(stderr):
+    """
+    Parse `-X importtime` output.
+
+    Args:
+        stderr (str): Standard error of the profiled interpreter
+
+    Returns:
+        list: (module, self_us, cumulative_us) tuples in import order
+    """
+    records = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, module = match.groups()
+            records.append((module, int(self_us), int(cumulative_us)))
+    return records
+
+def group_by_package(records):
+    """Sum the self time of every module by its top-level package, in seconds."""
+    totals = defaultdict(float)
+    for module, self_us, _ in records:
+        totals[module.split('.')[0]] += self_us / 1e6
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+def profile_import(module):
+    """
+    Import a module in a child interpreter.
+
+    Returns:
+        tuple: (records, peak_rss_mb) where records come from parse_importtime
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    # ru_maxrss is in kilobytes on Linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return parse_importtime(result.stderr), peak_rss_mb
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Report where startup import time goes.')
+    parser.add_argument('--module', default='main', help='Module to import (default: main, the web entry point)')
+    parser.add_argument('--top', type=int, default=15, help='Number of packages and modules listed')
+    args = parser.parse_args(argv)
+
+    records, peak_rss_mb = profile_import(args.module)
+    total = sum(self_us for _, self_us, _ in records) / 1e6
+
+    print(f"\n===== Startup report: import {args.module} =====\n")
+    print(f"Total import time: {total:.3f}s   Peak RSS: {peak_rss_mb:.0f} MB   Modules: {len(records)}\n")
+
+    print(f"{'Package':<30} {'Seconds':>9} {'Share':>7}")
+    for package, seconds in group_by_package(records)[:args.top]:
+        print(f"{package:<30} {seconds:>9.3f} {seconds / total:>7.1%}")
+
+    print(f"\n{'Slowest modules (cumulative)':<50} {'Seconds':>9}")
+    slowest = sorted(records, key=lambda record: record[2], reverse=True)[:args.top]
+    for module, _, cumulative_us in slowest:
+        print(f"{module:<50} {cumulative_us / 1e6:>9.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -604,8 +604,7 @@ document.addEventListener('DOMContentLoaded', function() {
   // Check for product sales chart
   const salesChartCanvas = document.getElementById('sales-chart');
   if (salesChartCanvas) {
-    try {
-      const salesData = salesChartCanvas.dataset.sales;
+    canvasPayload(salesChartCanvas, 'sales').then(salesData => {
       if (salesData) {
         console.log("Found sales chart canvas, initializing...");
         // Clear any existing chart instance
@@ -615,16 +614,15 @@ document.addEventListener('DOMContentLoaded', function() {
         const chart = createEnhancedProductSalesChart(salesChartCanvas, salesData);
         if (chart) productSalesChart = chart;
       }
-    } catch (error) {
+    }).catch(error => {
       console.error("Error initializing product sales chart:", error);
-    }
+    });
   }
   
   // Check for sales over time chart
   const salesTimeChartCanvas = document.getElementById('sales-time-chart');
   if (salesTimeChartCanvas) {
-    try {
-      const salesData = salesTimeChartCanvas.dataset.sales;
+    canvasPayload(salesTimeChartCanvas, 'sales').then(salesData => {
       if (salesData) {
         console.log("Found sales time chart canvas, initializing...");
         // Clear any existing chart instance
@@ -634,9 +632,9 @@ document.addEventListener('DOMContentLoaded', function() {
         const chart = createEnhancedSalesOverTimeChart(salesTimeChartCanvas, salesData);
         if (chart) salesTimeChart = chart;
       }
-    } catch (error) {
+    }).catch(error => {
       console.error("Error initializing sales over time chart:", error);
-    }
+    });
   }
   
   // Check for association heatmap
@@ -85,15 +85,253 @@ document.addEventListener('DOMContentLoaded', function() {
     const uploadForm = document.getElementById('data-upload-form');
     const progressBar = document.getElementById('upload-progress-bar');
     const progressContainer = document.getElementById('upload-progress-container');
+    const jobStage = document.getElementById('job-stage');
+    
+    function showUploadError(message, details) {
+        // Display error message
+        const alertContainer = document.getElementById('alert-container');
+        if (alertContainer) {
+            // Messages can quote the uploaded file, so the alert is built from nodes and filled with text
+            const alertBox = document.createElement('div');
+            alertBox.className = 'alert alert-danger alert-dismissible fade show';
+            alertBox.setAttribute('role', 'alert');
+            alertBox.append(message || '');
+            if (details && details.length) {
+                const list = document.createElement('ul');
+                list.className = 'mb-0 mt-2 small';
+                details.forEach(detail => {
+                    const item = document.createElement('li');
+                    item.textContent = detail;
+                    list.appendChild(item);
+                });
+                alertBox.appendChild(list);
+            }
+            const closeButton = document.createElement('button');
+            closeButton.type = 'button';
+            closeButton.className = 'btn-close';
+            closeButton.setAttribute('data-bs-dismiss', 'alert');
+            closeButton.setAttribute('aria-label', 'Close');
+            alertBox.appendChild(closeButton);
+            alertContainer.replaceChildren(alertBox);
+        }
+        // Reset progress bar
+        progressBar.style.width = '0%';
+        progressBar.setAttribute('aria-valuenow', 0);
+        progressBar.textContent = '';
+        progressContainer.classList.add('d-none');
+    }
+    
+    const jobStageList = document.getElementById('job-stage-list');
+    
+    function formatStageCounts(record) {
+        const skip = ['stage', 'status', 'started_at', 'seconds'];
+        return Object.keys(record)
+            .filter(key => !skip.includes(key) && typeof record[key] === 'number')
+            .map(key => `${key.replace(/_/g, ' ')}: ${record[key].toLocaleString()}`)
+            .join(', ');
+    }
+    
+    // Show the state of a processing job; returns true once it has finished
+    function updateJob(job) {
+        progressContainer.classList.remove('d-none');
+        progressBar.style.width = job.progress + '%';
+        progressBar.setAttribute('aria-valuenow', job.progress);
+        progressBar.textContent = job.status === 'queued' ? 'Queued...' : `Processing: ${job.stage || 'starting'}`;
+        if (jobStage) {
+            jobStage.textContent = `Stage ${Math.max(job.stages.indexOf(job.stage) + 1, 1)} of ${job.stages.length}`;
+        }
+        
+        if (jobStageList) {
+            jobStageList.innerHTML = '';
+            (job.stage_log || []).forEach(record => {
+                const icon = record.status === 'done' ? 'fa-check text-success'
+                    : record.status === 'failed' ? 'fa-times text-danger' : 'fa-spinner fa-spin';
+                const timing = record.seconds !== null ? `${record.seconds.toFixed(2)}s` : '';
+                const item = document.createElement('li');
+                item.className = 'list-group-item d-flex justify-content-between bg-transparent';
+                // The partition label comes from the uploaded file, so it is set as text
+                const label = document.createElement('span');
+                label.innerHTML = `<i class="fas ${icon} me-2"></i>`;
+                label.append(record.partition !== undefined ? `${record.stage} (${record.partition})` : record.stage);
+                const counts = document.createElement('span');
+                counts.className = 'text-muted';
+                counts.textContent = `${formatStageCounts(record)} ${timing}`;
+                item.append(label, counts);
+                jobStageList.appendChild(item);
+            });
+        }
+        
+        if (job.status === 'completed') {
+            window.location.href = job.redirect;
+            return true;
+        }
+        if (job.status === 'failed') {
+            showUploadError(job.error, job.messages
+                .filter(m => m.category === 'error')
+                .map(m => m.message));
+            return true;
+        }
+        return false;
+    }
+    
+    // Poll a background processing job until it completes or fails
+    function pollJob(statusUrl) {
+        fetch(statusUrl, { headers: { 'Accept': 'application/json' } })
+            .then(response => response.json())
+            .then(job => {
+                if (!updateJob(job)) {
+                    setTimeout(() => pollJob(statusUrl), 2000);
+                }
+            })
+            .catch(() => setTimeout(() => pollJob(statusUrl), 5000));
+    }
+    
+    // Follow job progress over Server-Sent Events, falling back to polling
+    function watchJob(statusUrl, eventsUrl) {
+        progressContainer.classList.remove('d-none');
+        
+        if (!window.EventSource || !eventsUrl) {
+            pollJob(statusUrl);
+            return;
+        }
+        
+        // The server closes streams periodically; EventSource reconnects on its own
+        const source = new EventSource(eventsUrl);
+        source.addEventListener('progress', function(e) {
+            if (updateJob(JSON.parse(e.data))) {
+                source.close();
+            }
+        });
+        source.addEventListener('end', function() {
+            source.close();
+        });
+    }
+    
+    if (progressContainer && progressContainer.dataset.statusUrl && !progressContainer.classList.contains('d-none')) {
+        watchJob(progressContainer.dataset.statusUrl, progressContainer.dataset.eventsUrl);
+    }
+    
+    function setUploadProgress(percentComplete) {
+        progressBar.style.width = percentComplete + '%';
+        progressBar.setAttribute('aria-valuenow', percentComplete);
+        progressBar.textContent = percentComplete < 100 ? Math.round(percentComplete) + '%' : 'Processing data...';
+    }
+    
+    function sha256Hex(buffer) {
+        return crypto.subtle.digest('SHA-256', buffer).then(digest =>
+            Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join(''));
+    }
+    
+    // Send a file in numbered chunks; a dropped connection resumes from the last chunk the server has
+    function chunkedUpload(file, formData) {
+        const resumeKey = `upload:${file.name}:${file.size}:${file.lastModified}`;
+        const jsonHeaders = { 'Accept': 'application/json', 'Content-Type': 'application/json' };
+        const maxRetries = 5;
+        const failed = response => response.json()
+            .catch(() => ({ error: 'Unexpected response from the server. Please try again.' }))
+            .then(body => { const error = new Error(body.error); error.body = body; throw error; });
+        
+        function create() {
+            const options = {
+                min_support: formData.get('min_support'),
+                min_confidence: formData.get('min_confidence'),
+                use_associations: formData.get('use_associations'),
+                partition_by: formData.get('partition_by')
+            };
+            return fetch(uploadForm.dataset.chunkedUrl, {
+                method: 'POST', headers: jsonHeaders,
+                body: JSON.stringify({ filename: file.name, size: file.size, options: options })
+            }).then(response => response.ok ? response.json() : failed(response))
+              .then(upload => {
+                  localStorage.setItem(resumeKey, upload.upload_id);
+                  return upload;
+              });
+        }
+        
+        // Continue an upload of the same file started before a reload, if the server still has it
+        function start() {
+            const uploadId = localStorage.getItem(resumeKey);
+            if (!uploadId) {
+                return create();
+            }
+            return fetch(`${uploadForm.dataset.chunkedUrl}/${uploadId}`, { headers: { 'Accept': 'application/json' } })
+                .then(response => response.ok ? response.json() : null)
+                .then(upload => upload && upload.status === 'receiving' ? upload : create());
+        }
+        
+        function sendChunk(upload, retries) {
+            setUploadProgress(100 * upload.received_bytes / upload.total_size);
+            if (upload.next_chunk >= upload.chunk_count) {
+                return fetch(upload.complete_url, { method: 'POST', headers: { 'Accept': 'application/json' } })
+                    .then(response => response.ok ? response.json() : failed(response));
+            }
+            
+            const start = upload.next_chunk * upload.chunk_size;
+            const chunk = file.slice(start, Math.min(start + upload.chunk_size, file.size));
+            return chunk.arrayBuffer()
+                .then(buffer => (window.crypto && crypto.subtle ? sha256Hex(buffer) : Promise.resolve(null))
+                    .then(digest => fetch(upload.chunk_url, {
+                        method: 'PUT',
+                        headers: Object.assign({ 'Accept': 'application/json', 'Content-Type': 'application/octet-stream' },
+                                               digest ? { 'X-Chunk-SHA256': digest } : {}),
+                        body: buffer
+                    })))
+                .then(response => {
+                    if (response.ok) {
+                        return response.json().then(next => sendChunk(next, maxRetries));
+                    }
+                    return response.json().catch(() => ({})).then(body => {
+                        // Out of step with the server (e.g. a retried chunk): continue from its position
+                        if (response.status === 409 && body.status === 'receiving' && retries > 0) {
+                            return sendChunk(body, retries - 1);
+                        }
+                        const error = new Error(body.error || 'The upload failed. Please try again.');
+                        error.body = body;
+                        throw error;
+                    });
+                }, () => {
+                    if (retries <= 0) {
+                        throw new Error('The connection was lost. Select the file again to resume the upload.');
+                    }
+                    // Network error: wait, ask the server where to resume, and continue
+                    return new Promise(resolve => setTimeout(resolve, 1000 * (maxRetries - retries + 1)))
+                        .then(() => fetch(`${uploadForm.dataset.chunkedUrl}/${upload.upload_id}`,
+                                          { headers: { 'Accept': 'application/json' } }))
+                        .then(response => response.json(), () => upload)
+                        .then(current => sendChunk(current, retries - 1));
+                });
+        }
+        
+        progressContainer.classList.remove('d-none');
+        start()
+            .then(upload => sendChunk(upload, maxRetries))
+            .then(job => {
+                localStorage.removeItem(resumeKey);
+                watchJob(job.status_url, job.events_url);
+            })
+            .catch(error => {
+                if (error.body) {
+                    localStorage.removeItem(resumeKey);
+                }
+                showUploadError(error.message, error.body && error.body.details);
+            });
+    }
     
     if (uploadForm && progressBar && progressContainer) {
         uploadForm.addEventListener('submit', function(e) {
             e.preventDefault();
             
             const formData = new FormData(uploadForm);
+            const file = formData.get('file');
+            if (uploadForm.dataset.chunkedUrl && window.fetch && file && file.size) {
+                chunkedUpload(file, formData);
+                return;
+            }
+            
             const xhr = new XMLHttpRequest();
             
             xhr.open('POST', uploadForm.action, true);
+            xhr.setRequestHeader('Accept', 'application/json');
             
             xhr.upload.onprogress = function(e) {
                 if (e.lengthComputable) {
@@ -110,44 +348,25 @@ document.addEventListener('DOMContentLoaded', function() {
             };
             
             xhr.onload = function() {
-                if (xhr.status === 200) {
-                    window.location.href = JSON.parse(xhr.responseText).redirect;
+                let response = {};
+                try {
+                    response = JSON.parse(xhr.responseText);
+                } catch (err) {
+                    response = { error: 'Unexpected response from the server. Please try again.' };
+                }
+                
+                if (xhr.status === 202) {
+                    // Upload accepted, follow the background job
+                    watchJob(response.status_url, response.events_url);
+                } else if (xhr.status === 200 && response.redirect) {
+                    window.location.href = response.redirect;
                 } else {
-                    const response = JSON.parse(xhr.responseText);
-                    // Display error message
-                    const alertContainer = document.getElementById('alert-container');
-                    if (alertContainer) {
-                        alertContainer.innerHTML = `
-                            <div class="alert alert-danger alert-dismissible fade show" role="alert">
-                                ${response.error}
-                                <button type="button" class="btn-close" data-bs-dismiss="alert" aria-label="Close"></button>
-                            </div>
-                        `;
-                    }
-                    // Reset progress bar
-                    progressBar.style.width = '0%';
-                    progressBar.setAttribute('aria-valuenow', 0);
-                    progressBar.textContent = '';
-                    progressContainer.classList.add('d-none');
+                    showUploadError(response.error);
                 }
             };
             
             xhr.onerror = function() {
-                // Display error message
-                const alertContainer = document.getElementById('alert-container');
-                if (alertContainer) {
-                    alertContainer.innerHTML = `
-                        <div class="alert alert-danger alert-dismissible fade show" role="alert">
-                            An error occurred during upload. Please try again.
-                            <button type="button" class="btn-close" data-bs-dismiss="alert" aria-label="Close"></button>
-                        </div>
-                    `;
-                }
-                // Reset progress bar
-                progressBar.style.width = '0%';
-                progressBar.setAttribute('aria-valuenow', 0);
-                progressBar.textContent = '';
-                progressContainer.classList.add('d-none');
+                showUploadError('An error occurred during upload. Please try again.');
             };
             
             // Show progress container
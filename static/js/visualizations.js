@@ -47,14 +47,36 @@ document.addEventListener('DOMContentLoaded', function() {
     initForecastVisualizations();
 });
 
+// Fetch a JSON payload once per page, so charts drawing the same data share one request
+const payloadRequests = new Map();
+
+function fetchPayload(url) {
+    if (!payloadRequests.has(url)) {
+        payloadRequests.set(url, fetch(url, { headers: { 'Accept': 'application/json' } })
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`HTTP ${response.status}`);
+                }
+                return response.json();
+            }));
+    }
+    return payloadRequests.get(url);
+}
+
+// Load a canvas's data from its data-<name>-url API, or from an inline data-<name> attribute
+function canvasPayload(canvas, name) {
+    const url = canvas.dataset[name + 'Url'];
+    if (url) {
+        return fetchPayload(url);
+    }
+    return new Promise(resolve => resolve(JSON.parse(canvas.dataset[name] || '{}')));
+}
+
 // Sales data visualization
 function initSalesVisualizations() {
     const salesChartCanvas = document.getElementById('sales-chart');
     if (salesChartCanvas) {
-        try {
-            // Get sales data from data attribute
-            const salesData = JSON.parse(salesChartCanvas.dataset.sales || '{}');
-            
+        canvasPayload(salesChartCanvas, 'sales').then(salesData => {
             if (salesData && salesData.top_products) {
                 createProductSalesChart(salesChartCanvas, salesData.top_products);
             } else {
@@ -65,22 +87,19 @@ function initSalesVisualizations() {
                         No product sales data available for visualization.
                     </div>`;
             }
-        } catch (error) {
+        }).catch(error => {
             console.error("Error initializing product sales chart:", error);
             salesChartCanvas.parentNode.innerHTML = `
                 <div class="alert alert-danger">
                     <i class="fas fa-exclamation-circle me-2"></i>
                     Error loading sales data: ${error.message}
                 </div>`;
-        }
+        });
     }
     
     const salesTimeChartCanvas = document.getElementById('sales-time-chart');
     if (salesTimeChartCanvas) {
-        try {
-            // Get sales over time data from data attribute
-            const salesData = JSON.parse(salesTimeChartCanvas.dataset.sales || '{}');
-            
+        canvasPayload(salesTimeChartCanvas, 'sales').then(salesData => {
             if (salesData && salesData.sales_over_time && salesData.sales_over_time.length > 0) {
                 createSalesOverTimeChart(salesTimeChartCanvas, salesData.sales_over_time);
             } else {
@@ -91,14 +110,14 @@ function initSalesVisualizations() {
                         No time series data available for visualization.
                     </div>`;
             }
-        } catch (error) {
+        }).catch(error => {
             console.error("Error initializing sales over time chart:", error);
             salesTimeChartCanvas.parentNode.innerHTML = `
                 <div class="alert alert-danger">
                     <i class="fas fa-exclamation-circle me-2"></i>
                     Error loading time series data: ${error.message}
                 </div>`;
-        }
+        });
     }
 }
 
@@ -658,22 +677,31 @@ function createAssociationNetwork(container, rules) {
 function initForecastVisualizations() {
     const forecastChartCanvas = document.getElementById('forecast-chart');
     if (forecastChartCanvas) {
-        // Get forecast data from data attribute
-        const forecastData = JSON.parse(forecastChartCanvas.dataset.forecast || '{}');
-        
-        if (Object.keys(forecastData).length > 0) {
-            createForecastChart(forecastChartCanvas, forecastData);
-        }
+        canvasPayload(forecastChartCanvas, 'forecast').then(forecastData => {
+            if (Object.keys(forecastData).length > 0) {
+                createForecastChart(forecastChartCanvas, forecastData);
+            }
+        }).catch(error => console.error("Error loading forecast data:", error));
     }
 }
 
+// Expand a compact forecast series ({start, quantities}) into its daily date labels
+function forecastSeriesDates(series) {
+    const start = new Date(series.start + 'T00:00:00Z');
+    return series.quantities.map((_, i) => {
+        const date = new Date(start);
+        date.setUTCDate(start.getUTCDate() + i);
+        return date.toISOString().slice(0, 10);
+    });
+}
+
 // Create forecast chart (line chart)
 function createForecastChart(canvas, forecastData) {
     if (!forecastData || Object.keys(forecastData).length === 0) return;
     
     // Get all dates from the first product (assuming all products have the same dates)
     const firstProduct = Object.keys(forecastData)[0];
-    const dates = forecastData[firstProduct].map(item => item.date);
+    const dates = forecastSeriesDates(forecastData[firstProduct]);
     
     // Prepare datasets for each product
     const datasets = Object.keys(forecastData).map((product, index) => {
@@ -681,7 +709,7 @@ function createForecastChart(canvas, forecastData) {
         
         return {
             label: product,
-            data: forecastData[product].map(item => item.quantity),
+            data: forecastData[product].quantities,
             backgroundColor: color + '33',  // 20% opacity
             borderColor: color,
             borderWidth: 2,
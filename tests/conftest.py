@@ -0,0 +1,48 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The app is configured from the environment when it is imported, so point every
+# file it writes at a scratch directory and keep job threads out of the tests
+_scratch = tempfile.mkdtemp(prefix='demand-forecast-tests-')
+os.environ['SQLITE_PATH'] = os.path.join(_scratch, 'app.db')
+os.environ['JOB_WORKERS'] = '0'
+os.environ['METRICS_DIR'] = ''
+for name, subdir in [('UPLOAD_TEMP_DIR', 'partial'), ('VIZ_CACHE_DIR', 'cache'), ('SHARED_DATA_DIR', 'shared'),
+                     ('PROFILE_DIR', 'profiles')]:
+    os.environ[name] = os.path.join(_scratch, subdir)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture(scope='session')
+def app():
+    from app import app, init_db
+    import routes  # noqa: F401 (registers the views)
+
+    app.config['TESTING'] = True
+    app.config['UPLOAD_FOLDER'] = os.path.join(_scratch, 'uploads')
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    init_db()
+    return app
+
+@pytest.fixture
+def user_id(app):
+    from app import db
+    from models import User
+
+    with app.app_context():
+        user = User(fullname='Test User', email=f'user-{os.urandom(4).hex()}@example.com')
+        user.set_password('password')
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+@pytest.fixture
+def client(app, user_id):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client
@@ -0,0 +1,51 @@
+import pandas as pd
+
+from utils.backtester import get_rolling_origins, _summarise
+
+def _sales(days):
+    dates = pd.date_range('2024-01-01', periods=days, freq='D')
+    return pd.DataFrame({'Date': dates, 'Product_Name': 'Bread', 'Quantity': 1.0})
+
+def test_rolling_origins_leave_a_full_horizon_after_each_origin():
+    df = _sales(100)
+    origins = get_rolling_origins(df, n_origins=3, horizon=10, step=5)
+
+    last_day = df['Date'].max()
+    assert origins == sorted(origins)
+    assert len(origins) == 3
+    assert all(last_day - origin >= pd.Timedelta(days=10) for origin in origins)
+    assert [(b - a).days for a, b in zip(origins, origins[1:])] == [5, 5]
+
+def test_rolling_origins_snap_to_days_with_sales():
+    df = _sales(60)
+    df = df[df['Date'] != pd.Timestamp('2024-02-19')]  # The first target (60 - 1 - 10 days in)
+    origins = get_rolling_origins(df, n_origins=1, horizon=10)
+    assert origins == [pd.Timestamp('2024-02-18')]
+
+def test_rolling_origins_stop_when_history_runs_out():
+    # An origin needs a day of training history before it
+    assert get_rolling_origins(_sales(11), n_origins=5, horizon=10) == []
+    assert len(get_rolling_origins(_sales(25), n_origins=5, horizon=10)) == 2
+
+def test_summarise_pools_errors_over_origins_per_product():
+    origin_results = [
+        {'origin': pd.Timestamp('2024-02-01'), 'train_seconds': 1.0, 'predict_seconds': 0.5, 'peak_memory_mb': 10.0,
+         'products': {'Bread': {'abs_error': 2.0, 'squared_error': 4.0, 'actual_total': 10.0, 'n': 2}}},
+        {'origin': pd.Timestamp('2024-01-01'), 'train_seconds': 2.0, 'predict_seconds': 0.5, 'peak_memory_mb': 20.0,
+         'products': {'Bread': {'abs_error': 4.0, 'squared_error': 8.0, 'actual_total': 10.0, 'n': 2},
+                      'Milk': {'abs_error': 0.0, 'squared_error': 0.0, 'actual_total': 0.0, 'n': 2}}},
+        {'origin': pd.Timestamp('2024-03-01'), 'error': 'Not enough data'},
+    ]
+    summary = _summarise('xgboost', {}, origin_results)
+
+    assert summary['aggregate']['mae'] == 6.0 / 6
+    assert summary['aggregate']['wape'] == 6.0 / 20
+    assert summary['aggregate']['rmse'] == (12.0 / 6) ** 0.5
+    assert summary['per_product']['Bread']['mae'] == 6.0 / 4
+    # No actual demand: WAPE is undefined rather than a division by zero
+    assert summary['per_product']['Milk']['wape'] is None
+    # Failed origins count in the list but not in the timings
+    assert summary['train_seconds'] == 3.0
+    assert summary['peak_memory_mb'] == 20.0
+    assert [origin['origin'] for origin in summary['origins']] == sorted(r['origin'] for r in origin_results)
+    assert all('products' not in origin for origin in summary['origins'])
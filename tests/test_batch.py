@@ -0,0 +1,44 @@
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import batch
+
+def test_only_the_file_whose_worker_died_is_retried(tmp_path, monkeypatch):
+    files = []
+    for name in ('crashes-once.csv', 'crashes-always.csv', 'fine.csv'):
+        path = tmp_path / name
+        path.write_text('Transaction_ID,Product_Name,Date,Quantity\n')
+        files.append(str(path))
+    job_ids = {path: index for index, path in enumerate(files, 1)}
+    crashes = {1: 1, 2: batch.MAX_ATTEMPTS}
+    resets = []
+
+    class SingleFileExecutor:
+        def __init__(self, **kwargs):
+            pass
+
+        def submit(self, fn, job_id):
+            future = Future()
+            if crashes.get(job_id):
+                crashes[job_id] -= 1
+                future.set_exception(BrokenProcessPool('A process in the process pool was terminated abruptly'))
+            else:
+                future.set_result({'status': 'completed', 'job_id': job_id})
+            return future
+
+        def shutdown(self, wait=True):
+            pass
+
+    monkeypatch.setattr(batch, 'ProcessPoolExecutor', SingleFileExecutor)
+    monkeypatch.setattr(batch, 'prepare_file', lambda path, options: job_ids[path])
+    monkeypatch.setattr(batch, '_reset_job', lambda job_id, error=None: resets.append((job_id, error)))
+
+    report = batch.run_batch(files, {}, str(tmp_path / 'report.json'), workers=3)
+
+    entries = [report['files'][path] for path in files]
+    assert [(entry['status'], entry['attempts']) for entry in entries] == [
+        ('completed', 2), ('failed', batch.MAX_ATTEMPTS), ('completed', 1)]
+    # The retried job is reset for another run; the job that used up its attempts is failed
+    assert sorted(resets, key=lambda reset: (reset[0], reset[1] is not None)) == [
+        (1, None), (2, None), (2, 'The worker process died (out of memory?)')]
+    assert report['summary']['failed'] == 1
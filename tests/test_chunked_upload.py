@@ -0,0 +1,142 @@
+import os
+import hashlib
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils.chunked_upload import IncrementalUpload, StreamingCsvValidator
+
+HEADER = 'Transaction_ID,Product_Name,Date,Quantity\n'
+CSV = (HEADER + ''.join(f'T{i},"Bread, white",2024-03-{i % 28 + 1:02d},{i % 5 + 1}\n' for i in range(40))).encode()
+
+def _feed_in_pieces(validator, data, size):
+    for start in range(0, len(data), size):
+        validator.feed(data[start:start + size])
+    validator.feed(b'', final=True)
+
+@pytest.mark.parametrize('piece_size', [1, 7, 64, len(CSV)])
+def test_validator_accepts_a_good_file_in_any_pieces(piece_size):
+    validator = StreamingCsvValidator()
+    _feed_in_pieces(validator, CSV, piece_size)
+    assert not validator.failed
+    assert validator.rows == 40
+    assert validator.date_format == '%Y-%m-%d'
+
+def test_validator_reports_bad_rows():
+    data = HEADER + 'T1,Bread,2024-03-01,1\nT2,,2024-03-02,x\nT3,Milk,not a date,2\n'
+    validator = StreamingCsvValidator()
+    _feed_in_pieces(validator, data.encode(), 10)
+
+    report = validator.report()
+    assert validator.failed and report['bad_rows'] == 2
+    assert [(e['row'], e['column']) for e in report['errors']] == [(3, 'Product_Name'), (3, 'Quantity'), (4, 'Date')]
+
+def test_validator_rejects_missing_columns():
+    validator = StreamingCsvValidator()
+    validator.feed(b'Transaction_ID,Product_Name\nT1,Bread\n', final=True)
+    assert validator.file_error == 'Missing required columns: Date, Quantity'
+
+def test_validator_keeps_ambiguous_date_formats_until_a_row_decides():
+    # Date-sorted dd/mm/yyyy: the days in the sample all read as months too
+    days = [day for day in range(1, 29) for _ in range(90)]
+    rows = [f'T{i},Bread,{day:02d}/03/2024,1\n' for i, day in enumerate(days)]
+    validator = StreamingCsvValidator()
+    validator.feed((HEADER + ''.join(rows)).encode(), final=True)
+    assert not validator.failed
+    assert validator.date_format == '%d/%m/%Y'
+
+def test_incremental_upload_catches_up_with_the_file(tmp_path):
+    path = tmp_path / 'upload.part'
+    path.write_bytes(CSV)
+    upload = IncrementalUpload('sales.csv')
+    upload.catch_up(str(path), 100)
+    upload.catch_up(str(path), len(CSV), final=True)
+
+    assert upload.sha256 == hashlib.sha256(CSV).hexdigest()
+    assert upload.validator.rows == 40 and not upload.validator.failed
+
+@pytest.fixture
+def small_chunks(app):
+    chunk_bytes = app.config['UPLOAD_CHUNK_BYTES']
+    app.config['UPLOAD_CHUNK_BYTES'] = 256
+    yield 256
+    app.config['UPLOAD_CHUNK_BYTES'] = chunk_bytes
+
+def _start(client, data=CSV, **body):
+    response = client.post('/api/uploads', json={'filename': 'sales.csv', 'size': len(data), **body})
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()
+
+def _put(client, upload, index, data=CSV, chunk_size=256):
+    return client.put(f"/api/uploads/{upload['upload_id']}/chunks/{index}",
+                      data=data[index * chunk_size:(index + 1) * chunk_size])
+
+def test_chunks_resume_from_the_next_missing_chunk(client, small_chunks):
+    upload = _start(client, sha256=hashlib.sha256(CSV).hexdigest())
+    assert upload['next_chunk'] == 0 and upload['chunk_count'] == -(-len(CSV) // small_chunks)
+
+    assert _put(client, upload, 0).get_json()['next_chunk'] == 1
+    # A chunk sent again after a dropped response is acknowledged without being written twice
+    repeated = _put(client, upload, 0)
+    assert repeated.status_code == 200 and repeated.get_json()['received_bytes'] == small_chunks
+    # Skipping ahead is refused with the chunk to resume from
+    skipped = _put(client, upload, 2)
+    assert skipped.status_code == 409 and skipped.get_json()['next_chunk'] == 1
+
+    status = client.get(f"/api/uploads/{upload['upload_id']}").get_json()
+    for index in range(status['next_chunk'], status['chunk_count']):
+        assert _put(client, upload, index).status_code == 200
+
+    completed = client.post(upload['complete_url'])
+    assert completed.status_code == 202, completed.get_json()
+    from app import app
+    from models import ProcessingJob, Dataset
+    with app.app_context():
+        job = ProcessingJob.query.get(completed.get_json()['job_id'])
+        assert job.status == 'queued'
+        assert os.path.basename(job.filepath) == Dataset.query.get(job.dataset_id).filename
+        with open(job.filepath, 'rb') as f:
+            assert f.read() == CSV
+
+def test_incomplete_uploads_cannot_be_completed(client, small_chunks):
+    upload = _start(client)
+    _put(client, upload, 0)
+    response = client.post(upload['complete_url'])
+    assert response.status_code == 409
+    assert response.get_json()['next_chunk'] == 1
+
+def test_a_wrong_chunk_size_is_rolled_back(client, small_chunks):
+    upload = _start(client)
+    response = client.put(f"/api/uploads/{upload['upload_id']}/chunks/0", data=CSV[:100])
+    assert response.status_code == 400
+    assert response.get_json()['received_bytes'] == 0
+
+def test_bad_rows_reject_the_upload_while_it_is_sent(client, small_chunks):
+    data = (HEADER + 'T1,,2024-03-01,1\n' * 30).encode()
+    upload = _start(client, data)
+    for index in range(upload['chunk_count']):
+        response = _put(client, upload, index, data)
+        if response.status_code != 200:
+            break
+    assert response.status_code == 422
+    assert response.get_json()['details'][0].startswith('Row 2: Product_Name')
+    assert client.get(f"/api/uploads/{upload['upload_id']}").get_json()['status'] == 'failed'
+    assert client.post(upload['complete_url']).status_code == 409
+
+def test_abandoned_uploads_expire_and_active_uploads_are_capped(app, client, small_chunks):
+    from app import db
+    from models import UploadSession
+
+    uploads = [_start(client) for _ in range(app.config['UPLOAD_MAX_ACTIVE'])]
+    refused = client.post('/api/uploads', json={'filename': 'sales.csv', 'size': len(CSV)})
+    assert refused.status_code == 429
+
+    with app.app_context():
+        stale = UploadSession.query.filter_by(upload_id=uploads[0]['upload_id']).first()
+        stale.updated_at = datetime.utcnow() - timedelta(seconds=app.config['UPLOAD_SESSION_TTL_SECONDS'] + 1)
+        db.session.commit()
+        stale_path = stale.filepath
+
+    _start(client)
+    assert not os.path.exists(stale_path)
+    assert client.get(f"/api/uploads/{uploads[0]['upload_id']}").get_json()['status'] == 'expired'
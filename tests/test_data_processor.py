@@ -0,0 +1,43 @@
+import pandas as pd
+
+from utils.data_processor import infer_date_format, validate_data
+
+def test_date_format_is_inferred_over_the_whole_column():
+    # Date-sorted dd/mm/yyyy whose first 1000 rows all have a day up to 12
+    days = pd.date_range('2024-01-01', '2024-03-31', freq='D').repeat(100)
+    values = pd.Series(days.strftime('%d/%m/%Y'))
+    assert values.head(1000).str.slice(0, 2).astype(int).max() <= 12
+    assert infer_date_format(values) == '%d/%m/%Y'
+
+def test_ambiguous_dates_prefer_the_format_parsing_the_most_values():
+    # Every sampled value parses either way; only the unsampled rows tell them apart
+    values = pd.Series(['01/02/2024'] * 3001)
+    values[1] = values[2] = '13/01/2024'
+    assert infer_date_format(values) == '%d/%m/%Y'
+    assert infer_date_format(pd.Series(['01/02/2024'] * 10)) == '%m/%d/%Y'
+
+def test_no_format_parses():
+    assert infer_date_format(pd.Series(['soon', None])) is None
+
+def test_validation_accepts_a_date_sorted_day_first_file(tmp_path):
+    days = pd.date_range('2024-01-01', '2024-06-30', freq='D').repeat(100)
+    path = tmp_path / 'sales.csv'
+    pd.DataFrame({
+        'Transaction_ID': [f'T{i}' for i in range(len(days))],
+        'Product_Name': 'Bread',
+        'Date': days.strftime('%d/%m/%Y'),
+        'Quantity': 1,
+    }).to_csv(path, index=False)
+
+    is_valid, message, errors = validate_data(str(path))
+    assert is_valid, message
+    assert errors == []
+
+def test_validation_message_quotes_no_file_contents(tmp_path):
+    path = tmp_path / 'sales.csv'
+    path.write_text('Transaction_ID,Product_Name,Date,Quantity\n'
+                    'T1,Bread,2024-01-01,<img src=x onerror=alert(1)>\n')
+    is_valid, message, errors = validate_data(str(path))
+    assert not is_valid
+    assert '<img' not in message
+    assert errors[0]['value'].startswith('<img')
@@ -0,0 +1,56 @@
+import pandas as pd
+import pytest
+
+from persistence import save_forecast_series
+from utils.partitioning import process_partitions, rollup_forecasts, rollup_rules, split_partitions
+
+def _points(start, quantities):
+    dates = pd.date_range(start, periods=len(quantities), freq='D').strftime('%Y-%m-%d')
+    return [{'date': date, 'quantity': quantity} for date, quantity in zip(dates, quantities)]
+
+def test_rollup_sums_forecasts_per_product_and_day():
+    rollup = rollup_forecasts({
+        'North': {'Bread': _points('2024-03-01', [1.0, 2.0]), 'Milk': _points('2024-03-01', [5.0])},
+        'South': {'Bread': _points('2024-03-01', [10.0, 20.0])},
+    })
+    assert rollup['Bread'] == _points('2024-03-01', [11.0, 22.0])
+    assert rollup['Milk'] == _points('2024-03-01', [5.0])
+
+def test_rollup_fills_days_no_partition_forecasts():
+    rollup = rollup_forecasts({
+        'North': {'Bread': _points('2024-03-01', [1.0, 1.0])},
+        'South': {'Bread': _points('2024-03-05', [2.0])},
+    })
+    assert rollup['Bread'] == _points('2024-03-01', [1.0, 1.0, 0.0, 0.0, 2.0])
+
+def test_forecast_series_must_cover_consecutive_days():
+    gapped = {'Bread': _points('2024-03-01', [1.0]) + _points('2024-03-05', [2.0])}
+    with pytest.raises(ValueError):
+        save_forecast_series(1, 1, gapped)
+
+def test_rollup_rules_keeps_each_rule_once_with_its_highest_lift():
+    def rules(lift):
+        return pd.DataFrame({'antecedents': [frozenset({'Bread'}), frozenset({'Jam'})],
+                             'consequents': [frozenset({'Butter'}), frozenset({'Bread'})],
+                             'lift': [lift, 1.0]})
+
+    rollup = rollup_rules({'North': rules(2.0), 'South': rules(3.0), 'East': pd.DataFrame()})
+    assert len(rollup) == 2
+    bread = rollup[rollup['antecedents'] == frozenset({'Bread'})].iloc[0]
+    assert (bread['lift'], bread['Partition']) == (3.0, 'South')
+
+def test_partitions_forecast_the_same_days():
+    rows = []
+    for store, days in [('North', 60), ('South', 45)]:
+        for day in pd.date_range('2024-01-01', periods=days, freq='D'):
+            for product in ('Bread', 'Milk'):
+                rows.append({'Transaction_ID': f'{store}-{day:%Y%m%d}', 'Product_Name': product, 'Date': day,
+                             'Quantity': 1.0 + day.day % 3, 'Store': store})
+    df = pd.DataFrame(rows)
+    options = {'min_support': 0.5, 'min_confidence': 0.5, 'use_associations': False}
+
+    results = process_partitions(split_partitions(df, 'Store'), options, max_workers=1)
+
+    first_days = {value: {points[0]['date'] for points in result['forecasts'].values()}
+                  for value, result in results.items()}
+    assert first_days == {'North': {'2024-03-01'}, 'South': {'2024-03-01'}}
@@ -0,0 +1,28 @@
+import time
+import threading
+
+from persistence import write_lane
+
+def test_write_lane_is_reentrant(app):
+    with write_lane():
+        with write_lane():
+            pass
+
+def test_write_lane_runs_writers_one_at_a_time(app):
+    assert app.config['SQLITE_WRITE_LANE']
+    active, overlaps = [], []
+
+    def writer():
+        with write_lane():
+            active.append(1)
+            if len(active) > 1:
+                overlaps.append(len(active))
+            time.sleep(0.01)
+            active.pop()
+
+    threads = [threading.Thread(target=writer) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert overlaps == []
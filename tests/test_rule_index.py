@@ -0,0 +1,57 @@
+import pytest
+
+from utils.rule_index import RuleIndex, RuleIndexCache
+
+def _rule(antecedents, consequents, lift, confidence=0.5, support=0.1):
+    return {'antecedents': antecedents, 'consequents': consequents, 'lift': lift, 'confidence': confidence,
+            'support': support}
+
+RULES = [
+    _rule(['Bread'], ['Butter'], 2.0),
+    _rule(['Bread', 'Milk'], ['Cereal'], 3.0, confidence=0.9),
+    _rule(['Milk'], ['Cereal'], 1.5),
+    _rule(['Jam'], ['Bread'], 1.2),
+    _rule(['Bread'], ['Bread'], 9.0),  # Nothing left to recommend once the antecedent is removed
+]
+
+def test_rules_match_only_when_the_whole_antecedent_is_in_the_basket():
+    index = RuleIndex(RULES)
+    assert len(index) == 4
+    assert [r['product'] for r in index.recommend(['Bread'])] == ['Butter']
+    assert [r['product'] for r in index.recommend(['Milk'])] == ['Cereal']
+
+def test_each_product_is_scored_by_its_best_matching_rule():
+    recommendations = RuleIndex(RULES).recommend(['Bread', 'Milk'])
+    assert [r['product'] for r in recommendations] == ['Cereal', 'Butter']
+    assert recommendations[0]['lift'] == 3.0
+    assert recommendations[0]['because'] == ['Bread', 'Milk']
+
+def test_basket_items_and_unknown_products_are_not_recommended():
+    index = RuleIndex(RULES)
+    assert [r['product'] for r in index.recommend(['Jam', 'Bread', 'Caviar'])] == ['Butter']
+    assert index.recommend(['Caviar']) == []
+
+def test_k_and_metric():
+    index = RuleIndex(RULES)
+    assert len(index.recommend(['Bread', 'Milk'], k=1)) == 1
+    assert index.recommend(['Bread', 'Milk'], metric='confidence')[0]['product'] == 'Cereal'
+    with pytest.raises(ValueError):
+        index.recommend(['Bread'], metric='popularity')
+
+def test_cache_rebuilds_on_a_new_version_and_evicts_the_oldest():
+    cache = RuleIndexCache(max_datasets=2)
+    loads = []
+
+    def loader(rules):
+        def load():
+            loads.append(rules)
+            return rules
+        return load
+
+    first = cache.get(1, 1, loader(RULES))
+    assert cache.get(1, 1, loader([])) is first
+    assert len(cache.get(1, 2, loader(RULES[:1]))) == 1
+    cache.get(2, 1, loader(RULES))
+    cache.get(3, 1, loader(RULES))
+    assert len(cache.get(1, 2, loader([]))) == 0  # Evicted, so rebuilt
+    assert len(loads) == 5
@@ -0,0 +1,30 @@
+import numpy as np
+
+from utils.sales_series import LTTB_MIN_POINTS, lttb_indices
+
+def test_lttb_keeps_the_end_points_and_the_requested_count():
+    x = np.arange(1000)
+    y = np.sin(x / 25.0)
+    indices = lttb_indices(x, y, 50)
+
+    assert len(indices) == 50
+    assert indices[0] == 0 and indices[-1] == 999
+    assert np.all(np.diff(indices) > 0)
+
+def test_lttb_keeps_a_spike():
+    x = np.arange(500)
+    y = np.zeros(500)
+    y[123] = 100.0
+    assert 123 in lttb_indices(x, y, 10)
+
+def test_lttb_leaves_short_series_and_small_thresholds_alone():
+    x = np.arange(10)
+    assert list(lttb_indices(x, x, 10)) == list(range(10))
+    assert list(lttb_indices(x, x, 20)) == list(range(10))
+    assert list(lttb_indices(x, x, LTTB_MIN_POINTS - 1)) == list(range(10))
+
+def test_lttb_minimum_threshold():
+    x = np.arange(100)
+    indices = lttb_indices(x, x ** 2, LTTB_MIN_POINTS)
+    assert len(indices) == LTTB_MIN_POINTS
+    assert indices[0] == 0 and indices[-1] == 99
@@ -1,19 +1,29 @@
-from mlxtend.frequent_patterns import apriori, association_rules
-from mlxtend.preprocessing import TransactionEncoder
 import pandas as pd
 import numpy as np
 import logging
+from utils.progress import track_stage
+from utils.memory_budget import (MemoryBudgetExceeded, estimate_dense_encoding_bytes, estimate_sparse_encoding_bytes,
+                                 estimate_mining_bytes, estimate_rules_bytes)
 
-def prepare_transactions(df):
+# Fewest transactions worth mining when a sample has to be taken to fit the memory budget
+MIN_SAMPLE_TRANSACTIONS = 1000
+
+# mlxtend and scipy are imported by the functions that use them, so that
+# importing this module (and with it the web app) does not load them
+
+def prepare_transactions(df, sparse=False):
     """
     Prepare transaction data for association rule mining.
     
     Args:
         df (DataFrame): The processed dataframe
+        sparse (bool): Encode into sparse columns instead of a dense boolean matrix
         
     Returns:
         DataFrame: One-hot encoded transaction data
     """
+    from mlxtend.preprocessing import TransactionEncoder
+    
     # Check if we have at least two transactions
     transaction_count = df['Transaction_ID'].nunique()
     if transaction_count < 2:
@@ -26,8 +36,10 @@ def prepare_transactions(df):
     # One-hot encode the transactions
     try:
         te = TransactionEncoder()
-        te_ary = te.fit(transactions).transform(transactions)
+        te_ary = te.fit(transactions).transform(transactions, sparse=sparse)
         column_names = list(te.columns_)
+        if sparse:
+            return pd.DataFrame.sparse.from_spmatrix(te_ary, columns=column_names)
         df_encoded = pd.DataFrame(te_ary, columns=column_names)
         return df_encoded
     except Exception as e:
@@ -35,7 +47,63 @@ def prepare_transactions(df):
         logging.exception("Full details:")
         return pd.DataFrame()
 
-def run_apriori(df, min_support=0.05, min_confidence=0.2):
+def plan_mining(df, min_support, budget):
+    """
+    Choose the cheapest-sufficient encoding and mining path for a memory budget.
+    
+    The dense path is kept when it fits. Otherwise mining tests one candidate at
+    a time (low memory), the encoding becomes sparse, and as a last resort the
+    rules are mined on a sample of the transactions, which keeps support and
+    confidence as fractions. Each fallback is recorded on the budget.
+    
+    Args:
+        df (DataFrame): The processed dataframe
+        min_support (float): Minimum support threshold
+        budget (MemoryBudget): Memory budget of the job
+        
+    Returns:
+        dict: 'sparse', 'low_memory', 'sample_fraction', 'encode_bytes' and 'mine_bytes'
+        
+    Raises:
+        MemoryBudgetExceeded: If even a sample of MIN_SAMPLE_TRANSACTIONS does not fit
+    """
+    items = df[['Transaction_ID', 'Product_Name']].drop_duplicates()
+    baskets = items['Transaction_ID'].nunique()
+    line_items = len(items)
+    item_counts = items['Product_Name'].value_counts()
+    frequent_items = int((item_counts >= min_support * baskets).sum())
+    
+    plan = {'sparse': False, 'low_memory': False, 'sample_fraction': 1.0,
+            'encode_bytes': estimate_dense_encoding_bytes(baskets, len(item_counts), line_items),
+            'mine_bytes': estimate_mining_bytes(baskets, frequent_items)}
+    
+    if not budget.fits(plan['mine_bytes']):
+        plan['low_memory'] = True
+        plan['mine_bytes'] = estimate_mining_bytes(baskets, frequent_items, low_memory=True)
+        budget.decide(f"Frequent itemsets are mined one candidate at a time ({frequent_items} frequent products "
+                      f"in {baskets} transactions); this is slower but uses far less memory.")
+    
+    if not budget.fits(plan['encode_bytes']):
+        plan['sparse'] = True
+        plan['encode_bytes'] = estimate_sparse_encoding_bytes(baskets, line_items)
+        budget.decide(f"Transactions are encoded as a sparse matrix ({baskets} transactions x "
+                      f"{len(item_counts)} products would not fit as a dense one).")
+    
+    cost = max(plan['encode_bytes'], plan['mine_bytes'])
+    if not budget.fits(cost):
+        fraction = budget.available_bytes / cost * 0.8
+        if fraction * baskets < MIN_SAMPLE_TRANSACTIONS:
+            raise MemoryBudgetExceeded('mine', cost, budget.limit_bytes,
+                                       'Try a higher minimum support or a smaller file.', budget.resident_bytes)
+        plan['sample_fraction'] = fraction
+        plan['encode_bytes'] = int(plan['encode_bytes'] * fraction)
+        plan['mine_bytes'] = int(plan['mine_bytes'] * fraction)
+        budget.decide(f"Association rules were mined on a random sample of {fraction:.0%} of the "
+                      f"{baskets} transactions to stay within the memory budget.")
+    
+    return plan
+
+def run_apriori(df, min_support=0.05, min_confidence=0.2, tracker=None, budget=None):
     """
     Run the Apriori algorithm and generate association rules.
     
@@ -43,29 +111,58 @@ def run_apriori(df, min_support=0.05, min_confidence=0.2):
         df (DataFrame): The processed dataframe
         min_support (float): Minimum support threshold
         min_confidence (float): Minimum confidence threshold
+        tracker (StageTracker): Optional tracker for the encode, mine and rules stages
+        budget (MemoryBudget): Optional memory budget; see plan_mining
         
     Returns:
         DataFrame: Association rules
+        
+    Raises:
+        MemoryBudgetExceeded: If the budget cannot be met
     """
+    from mlxtend.frequent_patterns import apriori, association_rules
+    
     try:
+        plan = {'sparse': False, 'low_memory': False, 'sample_fraction': 1.0,
+                'encode_bytes': None, 'mine_bytes': None}
+        if budget is not None:
+            plan = plan_mining(df, min_support, budget)
+            if plan['sample_fraction'] < 1.0:
+                sample = df['Transaction_ID'].drop_duplicates().sample(frac=plan['sample_fraction'], random_state=0)
+                df = df[df['Transaction_ID'].isin(sample)]
+        
         # Prepare transaction data
-        df_encoded = prepare_transactions(df)
+        with track_stage(tracker, 'encode', rows=len(df), estimated_bytes=plan['encode_bytes']) as stage:
+            df_encoded = prepare_transactions(df, sparse=plan['sparse'])
+            stage['baskets'], stage['products'] = df_encoded.shape
         
         logging.info(f"Running Apriori with min_support={min_support}, min_confidence={min_confidence}")
         logging.info(f"Transaction data shape: {df_encoded.shape}")
         
-        # Run apriori to find frequent itemsets
-        frequent_itemsets = apriori(df_encoded, min_support=min_support, use_colnames=True)
-        
-        # No frequent itemsets found
-        if frequent_itemsets.empty:
-            logging.warning("No frequent itemsets found with the current support threshold.")
-            return pd.DataFrame()
+        with track_stage(tracker, 'mine', baskets=df_encoded.shape[0], products=df_encoded.shape[1],
+                         estimated_bytes=plan['mine_bytes']) as stage:
+            # Run apriori to find frequent itemsets
+            frequent_itemsets = apriori(df_encoded, min_support=min_support, use_colnames=True,
+                                        low_memory=plan['low_memory'])
+            stage['itemsets'] = len(frequent_itemsets)
+            
+            # No frequent itemsets found
+            if frequent_itemsets.empty:
+                logging.warning("No frequent itemsets found with the current support threshold.")
+                return pd.DataFrame()
+            
+            logging.info(f"Found {len(frequent_itemsets)} frequent itemsets")
         
-        logging.info(f"Found {len(frequent_itemsets)} frequent itemsets")
+        rules_bytes = estimate_rules_bytes(frequent_itemsets['itemsets'].map(len))
+        if budget is not None:
+            budget.require('rules', rules_bytes, 'Try a higher minimum support or confidence.')
+            # The rules stay in memory until the job persists them
+            budget.hold('rules', rules_bytes)
         
-        # Generate association rules
-        rules = association_rules(frequent_itemsets, metric="confidence", min_threshold=min_confidence)
+        with track_stage(tracker, 'rules', itemsets=len(frequent_itemsets), estimated_bytes=rules_bytes) as stage:
+            # Generate association rules
+            rules = association_rules(frequent_itemsets, metric="confidence", min_threshold=min_confidence)
+            stage['rules'] = len(rules)
         
         # No rules found
         if rules.empty:
@@ -83,11 +180,54 @@ def run_apriori(df, min_support=0.05, min_confidence=0.2):
         
         return rules
     
+    except MemoryBudgetExceeded:
+        raise
     except Exception as e:
         logging.error(f"Error running Apriori algorithm: {str(e)}")
         logging.exception("Full exception details:")
         return pd.DataFrame()
 
+def build_association_matrix(rules, products, metric='lift', top_k=3):
+    """
+    Build a sparse product x product association matrix from mined rules.
+    
+    Row i holds the metric of the top_k strongest rules from product i (in the
+    antecedents) to another product (in the consequents). Multi-item rules
+    contribute to every antecedent/consequent pair; the maximum value is kept.
+    
+    Args:
+        rules (DataFrame or list): Association rules
+        products (array-like): Product names defining the row/column order
+        metric (str): Rule metric used as the weight
+        top_k (int): Number of associated products kept per product
+        
+    Returns:
+        csr_matrix: Association weights of shape (len(products), len(products))
+    """
+    from scipy.sparse import csr_matrix
+    
+    n_products = len(products)
+    if rules is None or len(rules) == 0:
+        return csr_matrix((n_products, n_products))
+    
+    rules = pd.DataFrame(rules)
+    pairs = rules[['antecedents', 'consequents', metric]].explode('antecedents').explode('consequents')
+    
+    # Map product names to matrix positions, dropping unknown products and self-pairs
+    product_index = pd.Index(products)
+    pairs = pd.DataFrame({
+        'row': product_index.get_indexer(pairs['antecedents']),
+        'col': product_index.get_indexer(pairs['consequents']),
+        'weight': pairs[metric].astype(float).to_numpy()
+    })
+    pairs = pairs[(pairs['row'] >= 0) & (pairs['col'] >= 0) & (pairs['row'] != pairs['col'])]
+    
+    # Keep the strongest rule per pair, then the top_k pairs per product
+    pairs = pairs.groupby(['row', 'col'], as_index=False)['weight'].max()
+    pairs = pairs.sort_values(['row', 'weight'], ascending=[True, False]).groupby('row').head(top_k)
+    
+    return csr_matrix((pairs['weight'], (pairs['row'], pairs['col'])), shape=(n_products, n_products))
+
 def visualize_association_rules(rules):
     """
     Prepare association rules for visualization.
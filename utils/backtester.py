@@ -0,0 +1,286 @@
+"""
+Rolling-origin backtesting for the demand forecasting engines.
+
+The dataset is replayed over several forecast origins: each engine is trained
+on the history up to an origin and scored on the following horizon. Origins
+run in parallel in a process pool.
+
+Usage:
+    python -m utils.backtester uploads/sales_data.csv --origins 4 --horizon 14 \\
+        --config xgboost --config 'xgboost:{"max_depth": 4}' --config moving_average
+"""
+import argparse
+import json
+import logging
+import math
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import timedelta
+
+import pandas as pd
+
+from utils.association_miner import run_apriori, build_association_matrix
+from utils.data_processor import process_data
+from utils.demand_forecaster import (prepare_features, train_model, generate_forecasts,
+                                     get_associated_sales)
+
+DEFAULT_CONFIGURATIONS = [('xgboost', {}), ('xgboost_associations', {}), ('moving_average', {})]
+
+# Dataset shared with the pool workers, set once per process by _init_worker
+_BACKTEST_DF = None
+
+def _fit_xgboost(train_df, **params):
+    X, y, le, daily_sales = prepare_features(train_df)
+    model = train_model(X, y, params)
+    return model, le, daily_sales, train_df['Product_Name'].unique(), train_df['Date'].max()
+
+def _predict_xgboost(state, horizon):
+    model, le, daily_sales, product_names, max_date = state
+    return generate_forecasts(model, le, daily_sales, product_names, max_date, horizon)
+
+def _fit_xgboost_associations(train_df, min_support=0.05, min_confidence=0.2, top_k=3, **params):
+    rules = run_apriori(train_df, min_support, min_confidence)
+    products = sorted(train_df['Product_Name'].unique())
+    associated_sales = get_associated_sales(train_df, build_association_matrix(rules, products, top_k=top_k))
+    X, y, le, daily_sales = prepare_features(train_df, associated_sales)
+    model = train_model(X, y, params)
+    return model, le, daily_sales, train_df['Product_Name'].unique(), train_df['Date'].max(), associated_sales
+
+def _predict_xgboost_associations(state, horizon):
+    model, le, daily_sales, product_names, max_date, associated_sales = state
+    return generate_forecasts(model, le, daily_sales, product_names, max_date, horizon, associated_sales)
+
+def _fit_moving_average(train_df, window=7):
+    daily = get_daily_demand(train_df)
+    return daily.iloc[:, -window:].mean(axis=1), train_df['Date'].max()
+
+def _predict_moving_average(state, horizon):
+    means, max_date = state
+    dates = [(max_date + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(1, horizon + 1)]
+    return {
+        product: [{'date': date, 'quantity': float(mean)} for date in dates]
+        for product, mean in means.items()
+    }
+
+# Engine name -> (fit(train_df, **params) -> state, predict(state, horizon) -> forecasts)
+ENGINES = {
+    'xgboost': (_fit_xgboost, _predict_xgboost),
+    'xgboost_associations': (_fit_xgboost_associations, _predict_xgboost_associations),
+    'moving_average': (_fit_moving_average, _predict_moving_average),
+}
+
+def get_daily_demand(df):
+    """
+    Build a product x day matrix of sold quantities, with zeros on days without sales.
+
+    Args:
+        df (DataFrame): The processed dataframe
+
+    Returns:
+        DataFrame: Quantities indexed by product with one column per calendar day
+    """
+    daily = df.groupby(['Product_Name', pd.Grouper(key='Date', freq='D')])['Quantity'].sum().unstack(fill_value=0)
+    all_days = pd.date_range(daily.columns.min(), daily.columns.max(), freq='D')
+    return daily.reindex(columns=all_days, fill_value=0)
+
+def get_rolling_origins(df, n_origins=3, horizon=30, step=None):
+    """
+    Pick forecast origins so that each one is followed by a full horizon of history.
+
+    Args:
+        df (DataFrame): The processed dataframe
+        n_origins (int): Number of origins to evaluate
+        horizon (int): Number of days scored after each origin
+        step (int): Days between consecutive origins (defaults to horizon)
+
+    Returns:
+        list: Origin dates in ascending order
+    """
+    step = step or horizon
+    observed_days = pd.DatetimeIndex(df['Date'].dt.normalize().unique()).sort_values()
+    last_day = observed_days[-1]
+
+    origins = []
+    for k in range(n_origins):
+        target = last_day - timedelta(days=horizon + k * step)
+        # Snap to the last day with sales so the forecast starts right after the origin
+        candidates = observed_days[observed_days <= target]
+        if len(candidates) < 2:
+            break
+        origin = candidates[-1]
+        if origin not in origins:
+            origins.append(origin)
+
+    return sorted(origins)
+
+def _error_totals(actual, predicted):
+    error = predicted - actual
+    return {
+        'abs_error': float(error.abs().sum()),
+        'squared_error': float((error ** 2).sum()),
+        'actual_total': float(actual.sum()),
+        'n': int(len(actual))
+    }
+
+def _metrics(totals):
+    n = totals['n']
+    return {
+        'mae': totals['abs_error'] / n if n else None,
+        'wape': totals['abs_error'] / totals['actual_total'] if totals['actual_total'] else None,
+        'rmse': math.sqrt(totals['squared_error'] / n) if n else None,
+    }
+
+def _init_worker(df):
+    global _BACKTEST_DF
+    _BACKTEST_DF = df
+
+def _run_origin(engine, params, origin, horizon):
+    df = _BACKTEST_DF
+    fit, predict = ENGINES[engine]
+
+    train_df = df[df['Date'].dt.normalize() <= origin]
+    window = pd.date_range(origin + timedelta(days=1), periods=horizon, freq='D')
+    actual = get_daily_demand(df).reindex(index=train_df['Product_Name'].unique(), columns=window, fill_value=0)
+
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        state = fit(train_df, **params)
+        train_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        forecasts = predict(state, horizon)
+        predict_seconds = time.perf_counter() - start
+
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    window_keys = window.strftime('%Y-%m-%d')
+    products = {}
+    for product, actual_row in actual.iterrows():
+        predicted_by_date = {item['date']: item['quantity'] for item in forecasts.get(product, [])}
+        predicted = pd.Series([predicted_by_date.get(day, 0.0) for day in window_keys], index=actual_row.index)
+        products[product] = _error_totals(actual_row.astype(float), predicted)
+
+    return {
+        'origin': origin.strftime('%Y-%m-%d'),
+        'train_rows': int(len(train_df)),
+        'train_seconds': train_seconds,
+        'predict_seconds': predict_seconds,
+        'peak_memory_mb': peak_bytes / (1024 * 1024),
+        'products': products
+    }
+
+def _summarise(engine, params, origin_results):
+    product_totals = {}
+    for result in origin_results:
+        for product, totals in result.get('products', {}).items():
+            combined = product_totals.setdefault(product, dict.fromkeys(totals, 0))
+            for key, value in totals.items():
+                combined[key] += value
+
+    aggregate_totals = dict.fromkeys(['abs_error', 'squared_error', 'actual_total', 'n'], 0)
+    for totals in product_totals.values():
+        for key, value in totals.items():
+            aggregate_totals[key] += value
+
+    completed = [r for r in origin_results if 'error' not in r]
+    return {
+        'engine': engine,
+        'params': params,
+        'aggregate': _metrics(aggregate_totals),
+        'per_product': {product: _metrics(totals) for product, totals in sorted(product_totals.items())},
+        'train_seconds': sum(r['train_seconds'] for r in completed),
+        'predict_seconds': sum(r['predict_seconds'] for r in completed),
+        'peak_memory_mb': max((r['peak_memory_mb'] for r in completed), default=None),
+        'origins': [
+            {key: value for key, value in r.items() if key != 'products'}
+            for r in sorted(origin_results, key=lambda r: r['origin'])
+        ]
+    }
+
+def run_backtest(df, configurations=None, n_origins=3, horizon=30, step=None, max_workers=None):
+    """
+    Backtest forecasting engines over rolling origins in a process pool.
+
+    Args:
+        df (DataFrame): The processed dataframe
+        configurations (list): (engine name, params dict) pairs to evaluate
+        n_origins (int): Number of forecast origins
+        horizon (int): Number of days forecast and scored per origin
+        step (int): Days between consecutive origins (defaults to horizon)
+        max_workers (int): Size of the process pool (defaults to the CPU count)
+
+    Returns:
+        dict: Error metrics, timings and peak memory per configuration
+    """
+    configurations = configurations or DEFAULT_CONFIGURATIONS
+    for engine, _ in configurations:
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown forecasting engine '{engine}'. Available: {', '.join(ENGINES)}")
+
+    origins = get_rolling_origins(df, n_origins, horizon, step)
+    if not origins:
+        raise ValueError("Not enough history for a backtest. Try a shorter horizon or fewer origins.")
+
+    logging.info(f"Backtesting {len(configurations)} configurations over {len(origins)} origins")
+
+    results = {index: [] for index in range(len(configurations))}
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(df,)) as executor:
+        futures = {}
+        for index, (engine, params) in enumerate(configurations):
+            for origin in origins:
+                future = executor.submit(_run_origin, engine, params, origin, horizon)
+                futures[future] = (index, origin)
+
+        for future in as_completed(futures):
+            index, origin = futures[future]
+            try:
+                results[index].append(future.result())
+            except Exception as e:
+                engine = configurations[index][0]
+                logging.error(f"Backtest of {engine} at origin {origin:%Y-%m-%d} failed: {str(e)}")
+                results[index].append({'origin': origin.strftime('%Y-%m-%d'), 'error': str(e)})
+
+    return {
+        'horizon': horizon,
+        'origins': [origin.strftime('%Y-%m-%d') for origin in origins],
+        'configurations': [
+            _summarise(engine, params, results[index])
+            for index, (engine, params) in enumerate(configurations)
+        ]
+    }
+
+def _parse_configuration(value):
+    engine, _, params = value.partition(':')
+    return engine, json.loads(params) if params else {}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Rolling-origin backtest of the demand forecasting engines.')
+    parser.add_argument('file', help='Sales data file (CSV or Excel)')
+    parser.add_argument('--config', action='append', type=_parse_configuration,
+                        help="Engine and optional JSON params, e.g. 'xgboost:{\"max_depth\": 4}'. Repeatable.")
+    parser.add_argument('--origins', type=int, default=3, help='Number of forecast origins')
+    parser.add_argument('--horizon', type=int, default=30, help='Days forecast per origin')
+    parser.add_argument('--step', type=int, help='Days between origins (defaults to the horizon)')
+    parser.add_argument('--workers', type=int, help='Process pool size')
+    parser.add_argument('--output', help='Write the JSON report to this path instead of stdout')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    df = process_data(args.file)
+    report = run_backtest(df, args.config, args.origins, args.horizon, args.step, args.workers)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+        logging.info(f"Backtest report written to {args.output}")
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
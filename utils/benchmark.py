@@ -0,0 +1,275 @@
+"""
+Benchmark suite for the processing pipeline.
+
+Generates synthetic datasets of increasing size (see utils.synthetic_data) and
+times every pipeline stage on each, with the peak memory allocated by the
+stage (tracemalloc). Results are written as JSON, one file per run, so that
+runs on different commits can be compared with --baseline.
+
+Usage:
+    python -m utils.benchmark --rows 1000 10000 100000
+    python -m utils.benchmark --rows 1000000 --skip persist --baseline instance/benchmarks/<run>.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from utils.data_processor import process_data
+from utils.association_miner import prepare_transactions, run_apriori
+from utils.demand_forecaster import prepare_features, forecast_demand
+from utils.heatmap_generator import generate_association_heatmap
+from utils.sales_series import build_daily_sales
+from utils.synthetic_data import generate_sales_data, write_sales_csv
+
+DEFAULT_ROWS = [1000, 10000, 100000]
+DEFAULT_OUTPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'benchmarks')
+
+def _stage_process_data(ctx):
+    ctx['df'] = process_data(ctx['path'])
+    return {'rows': len(ctx['df'])}
+
+def _stage_build_daily_sales(ctx):
+    ctx['daily_sales'] = build_daily_sales(ctx['df'])
+    return {'daily_rows': len(ctx['daily_sales']['products'])}
+
+def _stage_prepare_transactions(ctx):
+    encoded = prepare_transactions(ctx['df'])
+    return {'baskets': encoded.shape[0], 'products': encoded.shape[1]}
+
+def _stage_run_apriori(ctx):
+    ctx['rules'] = run_apriori(ctx['df'], ctx['min_support'], ctx['min_confidence'])
+    return {'rules': len(ctx['rules'])}
+
+def _stage_prepare_features(ctx):
+    X = prepare_features(ctx['daily_sales']['products'])[0]
+    return {'training_rows': X.shape[0], 'features': X.shape[1]}
+
+def _stage_forecast_demand(ctx):
+    ctx['forecasts'] = forecast_demand(ctx['daily_sales']['products'], ctx['forecast_days'])
+    return {'points': sum(len(points) for points in ctx['forecasts'].values())}
+
+def _stage_generate_association_heatmap(ctx):
+    image = generate_association_heatmap(ctx['rules'], output='png')
+    return {'bytes': len(image) if image else 0}
+
+def _stage_persist(ctx):
+    # The app (and its database configuration) is only loaded when this stage runs
+    from app import app, db, init_db
+    from models import Dataset
+    from persistence import save_daily_sales, save_association_rules, save_forecast_series, write_lane
+
+    init_db()
+    with app.app_context(), write_lane():
+        try:
+            dataset = Dataset(filename='benchmark.csv')
+            db.session.add(dataset)
+            db.session.flush()
+            sizes = {
+                'daily_rows': save_daily_sales(dataset.id, ctx['daily_sales']),
+                'rules': save_association_rules(dataset.id, ctx['rules']),
+                'points': save_forecast_series(dataset.id, 0, ctx['forecasts'])
+            }
+            db.session.flush()
+        finally:
+            # Measure the writes without keeping the benchmark data
+            db.session.rollback()
+    return sizes
+
+# Stage name -> (function(context) -> sizes, context keys the stage needs)
+STAGES = {
+    'process_data': (_stage_process_data, ['path']),
+    'build_daily_sales': (_stage_build_daily_sales, ['df']),
+    'prepare_transactions': (_stage_prepare_transactions, ['df']),
+    'run_apriori': (_stage_run_apriori, ['df']),
+    'prepare_features': (_stage_prepare_features, ['daily_sales']),
+    'forecast_demand': (_stage_forecast_demand, ['daily_sales']),
+    'generate_association_heatmap': (_stage_generate_association_heatmap, ['rules']),
+    'persist': (_stage_persist, ['daily_sales', 'rules', 'forecasts']),
+}
+
+def _run_stage(name, ctx, measure_memory=True):
+    function, requires = STAGES[name]
+    missing = [key for key in requires if key not in ctx]
+    if missing:
+        return {'stage': name, 'status': 'skipped', 'missing': missing}
+
+    if measure_memory:
+        tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        sizes = function(ctx)
+        result = {'stage': name, 'status': 'done', 'seconds': time.perf_counter() - start, **sizes}
+    except Exception as e:
+        logging.error(f"Benchmark stage {name} failed: {str(e)}")
+        result = {'stage': name, 'status': 'failed', 'seconds': time.perf_counter() - start, 'error': str(e)}
+    finally:
+        if measure_memory:
+            result['peak_memory_mb'] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            tracemalloc.stop()
+    return result
+
+def run_benchmark(rows=None, n_products=100, n_days=365, mean_basket_size=3.0, stages=None,
+                  min_support=0.01, min_confidence=0.2, forecast_days=30, measure_memory=True, seed=42):
+    """
+    Benchmark the pipeline stages on synthetic datasets.
+
+    Args:
+        rows (list): Approximate line item counts of the generated datasets
+        n_products (int): Distinct products per dataset
+        n_days (int): Days of sales history per dataset
+        mean_basket_size (float): Average products per transaction
+        stages (list): Stage names to run, in pipeline order (defaults to all of STAGES)
+        min_support (float): Apriori support threshold
+        min_confidence (float): Apriori confidence threshold
+        forecast_days (int): Forecast horizon
+        measure_memory (bool): Record peak allocations (tracemalloc slows the stages down)
+        seed (int): Random seed of the generator
+
+    Returns:
+        dict: Run metadata and one list of stage results per dataset size
+    """
+    stages = [name for name in STAGES if name in (stages or STAGES)]
+    results = []
+    for target_rows in rows or DEFAULT_ROWS:
+        n_baskets = max(2, int(round(target_rows / mean_basket_size)))
+        start = time.perf_counter()
+        df = generate_sales_data(n_baskets, n_products, n_days, mean_basket_size, seed=seed)
+        generate_seconds = time.perf_counter() - start
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            ctx = {
+                'path': os.path.join(tmp_dir, 'sales.csv'),
+                'min_support': min_support,
+                'min_confidence': min_confidence,
+                'forecast_days': forecast_days
+            }
+            write_sales_csv(df, ctx['path'])
+            dataset = {
+                'target_rows': target_rows,
+                'rows': len(df),
+                'baskets': n_baskets,
+                'products': n_products,
+                'days': n_days,
+                'file_mb': os.path.getsize(ctx['path']) / (1024 * 1024),
+                'generate_seconds': generate_seconds,
+                'stages': []
+            }
+            del df
+
+            logging.info(f"Benchmarking {dataset['rows']} rows ({n_baskets} transactions)")
+            for name in stages:
+                result = _run_stage(name, ctx, measure_memory)
+                dataset['stages'].append(result)
+                if result['status'] == 'done':
+                    logging.info(f"  {name}: {result['seconds']:.3f}s")
+        results.append(dataset)
+
+    return {'environment': _environment(), 'seed': seed, 'min_support': min_support,
+            'min_confidence': min_confidence, 'forecast_days': forecast_days,
+            'memory_measured': measure_memory, 'datasets': results}
+
+def _environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__
+    }
+
+def compare_results(baseline, current):
+    """
+    Compare two benchmark runs stage by stage.
+
+    Args:
+        baseline (dict): Earlier output of run_benchmark
+        current (dict): Later output of run_benchmark
+
+    Returns:
+        list: (target rows, stage, baseline seconds, current seconds, ratio) for the
+            stages completed in both runs
+    """
+    def completed(run):
+        return {
+            (dataset['target_rows'], stage['stage']): stage['seconds']
+            for dataset in run['datasets'] for stage in dataset['stages'] if stage['status'] == 'done'
+        }
+
+    before, after = completed(baseline), completed(current)
+    return [
+        (rows, stage, before[(rows, stage)], seconds,
+         seconds / before[(rows, stage)] if before[(rows, stage)] else None)
+        for (rows, stage), seconds in after.items() if (rows, stage) in before
+    ]
+
+def _print_report(report, comparison=None):
+    print(f"\n{'Rows':>10} {'Stage':<30} {'Seconds':>9} {'Peak MB':>9}")
+    for dataset in report['datasets']:
+        for stage in dataset['stages']:
+            seconds = f"{stage['seconds']:.3f}" if 'seconds' in stage else '-'
+            peak = f"{stage['peak_memory_mb']:.1f}" if 'peak_memory_mb' in stage else '-'
+            status = '' if stage['status'] == 'done' else f"  ({stage['status']})"
+            print(f"{dataset['rows']:>10} {stage['stage']:<30} {seconds:>9} {peak:>9}{status}")
+
+    if comparison:
+        print(f"\n{'Rows':>10} {'Stage':<30} {'Baseline':>9} {'Current':>9} {'Ratio':>7}")
+        for rows, stage, before, after, ratio in comparison:
+            ratio = f"{ratio:.2f}x" if ratio is not None else '-'
+            print(f"{rows:>10} {stage:<30} {before:>9.3f} {after:>9.3f} {ratio:>7}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the pipeline stages on synthetic data.')
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS,
+                        help='Approximate line items per dataset, e.g. 1000 10000 100000 10000000')
+    parser.add_argument('--products', type=int, default=100, help='Distinct products per dataset')
+    parser.add_argument('--days', type=int, default=365, help='Days of sales history')
+    parser.add_argument('--basket-size', type=float, default=3.0, help='Mean products per transaction')
+    parser.add_argument('--stage', action='append', choices=list(STAGES), help='Run only these stages. Repeatable.')
+    parser.add_argument('--skip', action='append', choices=list(STAGES), default=[], help='Skip a stage. Repeatable.')
+    parser.add_argument('--min-support', type=float, default=0.01, help='Apriori support threshold')
+    parser.add_argument('--no-memory', action='store_true', help='Do not trace allocations (faster, no peak memory)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed of the generator')
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR, help='Directory of the JSON results')
+    parser.add_argument('--baseline', help='Earlier results file to compare this run with')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    stages = [name for name in (args.stage or STAGES) if name not in args.skip]
+    report = run_benchmark(args.rows, args.products, args.days, args.basket_size, stages,
+                           min_support=args.min_support, measure_memory=not args.no_memory, seed=args.seed)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    environment = report['environment']
+    name = f"{environment['timestamp'].replace(':', '')}-{environment['commit'] or 'unknown'}.json"
+    output_path = os.path.join(args.output_dir, name)
+    with open(output_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    logging.info(f"Benchmark results written to {output_path}")
+
+    comparison = None
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            comparison = compare_results(json.load(f), report)
+    _print_report(report, comparison)
+
+if __name__ == '__main__':
+    main()
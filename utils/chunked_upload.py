@@ -0,0 +1,221 @@
+"""
+Incremental hashing and validation of chunked uploads.
+
+Large files are uploaded as numbered chunks appended to a temporary file (see
+the /api/uploads routes). An IncrementalUpload follows that file as it grows:
+it hashes the received bytes with SHA-256 and, for CSV files, validates the
+rows that have arrived, so a bad file is rejected while it is still being
+transferred. These checks are an early rejection only; the processing job
+validates the complete file with validate_data.
+
+The hasher and validator live in the memory of one process. A process that
+sees an upload for the first time, or after other processes received some of
+its chunks, catches up by reading the part of the file it has not seen yet.
+"""
+import io
+import csv
+import codecs
+import hashlib
+import threading
+from datetime import datetime
+
+from utils.data_processor import REQUIRED_COLUMNS, DATE_FORMATS, DATE_SAMPLE_SIZE, MAX_REPORTED_ERRORS
+
+# Bytes read at a time when catching up with a file
+READ_BLOCK_SIZE = 1024 * 1024
+# Longest record accepted; longer ones usually come from an unbalanced quote
+MAX_RECORD_CHARS = 1024 * 1024
+
+class StreamingCsvValidator:
+    """
+    Validate CSV rows as they arrive, with the checks of validate_data.
+
+    Rows are checked in complete records; the date format is inferred from the
+    first DATE_SAMPLE_SIZE rows and the rows held back for the sample are
+    checked once it is known. Formats that parse the sample equally well stay
+    candidates until a later row rules them out, so a date-sorted dd/mm file
+    whose first days are all up to 12 is not rejected as mm/dd.
+    """
+
+    def __init__(self, max_errors=MAX_REPORTED_ERRORS):
+        """
+        Args:
+            max_errors (int): Number of bad rows listed in the report
+        """
+        self.max_errors = max_errors
+        self.file_error = None
+        self.errors = []
+        self.bad_rows = 0
+        self.rows = 0
+        self.date_format = None
+        self._date_formats = []  # Formats that parsed every date checked so far, best first
+        self._columns = None
+        self._pending = ''
+        self._decoder = codecs.getincrementaldecoder('utf-8-sig')(errors='replace')
+        self._newlines = io.IncrementalNewlineDecoder(None, translate=True)
+        self._sample = []  # (row number, values) held back until the date format is known
+        self._format_known = False
+
+    @property
+    def failed(self):
+        return self.file_error is not None or self.bad_rows > 0
+
+    def feed(self, data, final=False):
+        """
+        Validate the complete records in the next bytes of the file.
+
+        Args:
+            data (bytes): Next bytes of the file
+            final (bool): No more data follows; the last record need not end with a newline
+        """
+        if self.file_error:
+            return
+        text = self._pending + self._newlines.decode(self._decoder.decode(data, final=final), final=final)
+
+        # Records may contain quoted newlines; only split where the quotes are balanced
+        end = len(text) if final else text.rfind('\n') + 1
+        quotes = text.count('"', 0, end)
+        while end > 0 and quotes % 2:
+            previous = text.rfind('\n', 0, end - 1) + 1
+            quotes -= text.count('"', previous, end)
+            end = previous
+        complete, self._pending = text[:end], text[end:]
+        if len(self._pending) > MAX_RECORD_CHARS:
+            self.file_error = "A record is longer than 1 MB; check the file for an unbalanced quote"
+            return
+        if complete:
+            for values in csv.reader(io.StringIO(complete)):
+                self._record(values)
+                # A bad header makes the rows meaningless
+                if self.file_error:
+                    return
+        if final:
+            self._check_sample()
+
+    def _record(self, values):
+        if self._columns is None:
+            self._columns = {name.strip(): i for i, name in enumerate(values)}
+            missing = [col for col in REQUIRED_COLUMNS if col not in self._columns]
+            if missing:
+                self.file_error = f"Missing required columns: {', '.join(missing)}"
+            return
+        if not values:
+            return
+
+        self.rows += 1
+        # Row number in the file, counting the header as row 1
+        row = self.rows + 1
+        if not self._format_known:
+            self._sample.append((row, values))
+            if len(self._sample) >= DATE_SAMPLE_SIZE:
+                self._check_sample()
+            return
+        self._check_row(row, values)
+
+    def _check_sample(self):
+        if self._format_known:
+            return
+        self._format_known = True
+        dates = [self._value(values, 'Date') for _, values in self._sample]
+        counts = {date_format: sum(1 for value in dates if value and _parses(value, date_format))
+                  for date_format in DATE_FORMATS}
+        best_count = max(counts.values())
+        if best_count:
+            self._date_formats = [date_format for date_format in DATE_FORMATS if counts[date_format] == best_count]
+            self.date_format = self._date_formats[0]
+        for row, values in self._sample:
+            self._check_row(row, values)
+        self._sample = []
+
+    def _value(self, values, column):
+        i = self._columns[column]
+        return values[i].strip() if i < len(values) else ''
+
+    def _check_row(self, row, values):
+        problems = []
+        for col in REQUIRED_COLUMNS:
+            if not self._value(values, col):
+                problems.append((col, "is empty"))
+        date = self._value(values, 'Date')
+        # Without a known format the dates are left to the full validation of the job
+        if date and self._date_formats:
+            matching = [date_format for date_format in self._date_formats if _parses(date, date_format)]
+            if matching:
+                self._date_formats = matching
+                self.date_format = matching[0]
+            else:
+                problems.append(('Date', f"is not a date in the {self.date_format} format"))
+        quantity = self._value(values, 'Quantity')
+        if quantity:
+            try:
+                float(quantity)
+            except ValueError:
+                problems.append(('Quantity', "is not a number"))
+
+        if problems:
+            self.bad_rows += 1
+            for col, error in problems:
+                if len(self.errors) < self.max_errors:
+                    self.errors.append({'row': row, 'column': col, 'value': self._value(values, col)[:50],
+                                        'error': error})
+
+    def report(self):
+        """Validation outcome so far as a JSON-serializable dict."""
+        return {
+            'rows': self.rows,
+            'bad_rows': self.bad_rows,
+            'file_error': self.file_error,
+            'date_format': self.date_format,
+            'errors': sorted(self.errors, key=lambda e: e['row'])
+        }
+
+def _parses(value, date_format):
+    try:
+        datetime.strptime(value, date_format)
+        return True
+    except ValueError:
+        return False
+
+class IncrementalUpload:
+    """SHA-256 and streaming validation state of one upload, following its temporary file."""
+
+    def __init__(self, filename):
+        """
+        Args:
+            filename (str): Name of the uploaded file; only CSV files are validated while streaming
+        """
+        self.offset = 0
+        self.finished = False
+        self.hasher = hashlib.sha256()
+        self.validator = StreamingCsvValidator() if filename.lower().endswith('.csv') else None
+        self._lock = threading.Lock()
+
+    def catch_up(self, path, offset, final=False):
+        """
+        Hash and validate the file from the last position seen up to offset.
+
+        Args:
+            path (str): Temporary file of the upload
+            offset (int): Number of bytes received so far
+            final (bool): The upload is complete
+        """
+        with self._lock:
+            if self.offset < offset:
+                with open(path, 'rb') as f:
+                    f.seek(self.offset)
+                    while self.offset < offset:
+                        data = f.read(min(READ_BLOCK_SIZE, offset - self.offset))
+                        if not data:
+                            raise IOError(f"{path} is shorter than the {offset} bytes received")
+                        self.hasher.update(data)
+                        if self.validator:
+                            self.validator.feed(data)
+                        self.offset += len(data)
+            if final and not self.finished:
+                self.finished = True
+                if self.validator:
+                    self.validator.feed(b'', final=True)
+
+    @property
+    def sha256(self):
+        return self.hasher.hexdigest()
@@ -2,82 +2,194 @@ import pandas as pd
 import numpy as np
 from datetime import datetime
 import os
+import importlib.util
+from utils.sales_series import build_daily_sales, sales_overview
 
-def validate_data(file_path):
+# Declared input schema: the columns read from an upload and their dtypes. Other
+# columns are never read. Dates are read as text and parsed with one inferred format.
+REQUIRED_COLUMNS = {'Transaction_ID': str, 'Product_Name': str, 'Date': str, 'Quantity': 'float64'}
+OPTIONAL_COLUMNS = {'Category': str, 'Store': str, 'Region': str}
+
+# Date formats tried on a sample of the Date column; a tie goes to the first
+DATE_FORMATS = ['%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y/%m/%d', '%m/%d/%Y', '%d/%m/%Y',
+                '%m-%d-%Y', '%d-%m-%Y', '%d.%m.%Y', '%Y%m%d', '%m/%d/%Y %H:%M', '%d/%m/%Y %H:%M']
+DATE_SAMPLE_SIZE = 1000
+
+# Bad rows listed in a validation report
+MAX_REPORTED_ERRORS = 20
+
+# The PyArrow CSV engine parses in parallel; without pyarrow installed the C engine is used
+CSV_ENGINE = 'pyarrow' if importlib.util.find_spec('pyarrow') else 'c'
+
+def read_columns(file_path):
+    """Return the column names of an upload without reading its rows."""
+    if file_path.endswith('.csv'):
+        return list(pd.read_csv(file_path, nrows=0).columns)
+    return list(pd.read_excel(file_path, nrows=0).columns)
+
+def read_sales_data(file_path, columns=None, as_text=False):
+    """
+    Read the schema columns of an upload with their declared dtypes.
+    
+    Args:
+        file_path (str): Path to the uploaded file
+        columns (list): Columns to read (defaults to the schema columns present in the file);
+            columns outside the schema are read as text
+        as_text (bool): Read every column as text, so that bad values can be reported
+        
+    Returns:
+        DataFrame: The requested columns, with Date still as text
+    """
+    schema = {**REQUIRED_COLUMNS, **OPTIONAL_COLUMNS}
+    if columns is None:
+        columns = [column for column in read_columns(file_path) if column in schema]
+    dtypes = {column: str if as_text else schema.get(column, str) for column in columns}
+    
+    if file_path.endswith('.csv'):
+        return pd.read_csv(file_path, usecols=columns, dtype=dtypes, engine=CSV_ENGINE)
+    return pd.read_excel(file_path, usecols=columns, dtype=dtypes)
+
+def infer_date_format(values):
+    """
+    Infer the format of a column of date strings from a sample.
+    
+    The sample is spread evenly over the whole column, since a date-sorted file
+    can start with weeks whose days are all valid months. When several formats
+    parse the sample equally well (e.g. mm/dd and dd/mm), the one that parses the
+    most values of the whole column wins.
+    
+    Args:
+        values (Series): Date strings
+        
+    Returns:
+        str: The DATE_FORMATS entry that parses most of the sample, or None if none parses any
+    """
+    values = values.dropna()
+    if values.empty:
+        return None
+    sample = values
+    if len(values) > DATE_SAMPLE_SIZE:
+        sample = values.iloc[np.linspace(0, len(values) - 1, DATE_SAMPLE_SIZE).astype(int)]
+    
+    counts = {date_format: pd.to_datetime(sample, format=date_format, errors='coerce').notna().sum()
+              for date_format in DATE_FORMATS}
+    best_count = max(counts.values())
+    if best_count == 0:
+        return None
+    candidates = [date_format for date_format in DATE_FORMATS if counts[date_format] == best_count]
+    if len(candidates) == 1 or len(sample) == len(values):
+        return candidates[0]
+    
+    full_counts = {date_format: pd.to_datetime(values, format=date_format, errors='coerce').notna().sum()
+                   for date_format in candidates}
+    return max(candidates, key=lambda date_format: full_counts[date_format])
+
+def parse_dates(values, date_format=None, errors='raise'):
+    """
+    Parse a column of date strings with a single format (vectorised).
+    
+    Args:
+        values (Series): Date strings
+        date_format (str): strptime format (inferred from a sample if not given)
+        errors (str): 'raise' or 'coerce' (unparseable values become NaT)
+        
+    Returns:
+        Series: datetime64 values
+    """
+    date_format = date_format or infer_date_format(values)
+    if date_format is None:
+        # No known format fits; let pandas guess per element
+        return pd.to_datetime(values, errors=errors, format='mixed')
+    return pd.to_datetime(values, format=date_format, errors=errors)
+
+def validate_data(file_path, max_errors=MAX_REPORTED_ERRORS):
     """
     Validate that the uploaded file has the required columns and format.
     
     Args:
         file_path (str): Path to the uploaded file
+        max_errors (int): Number of bad rows listed in the report
         
     Returns:
-        tuple: (is_valid, message)
+        tuple: (is_valid, message, errors) where errors lists the first bad rows as
+            dicts with the row number in the file (header = 1), column, value and error
     """
     try:
-        # Determine file type based on extension
-        if file_path.endswith('.csv'):
-            df = pd.read_csv(file_path)
-        elif file_path.endswith(('.xlsx', '.xls')):
-            df = pd.read_excel(file_path)
-        else:
-            return False, "Unsupported file format. Please upload a CSV or Excel file."
+        if not file_path.endswith(('.csv', '.xlsx', '.xls')):
+            return False, "Unsupported file format. Please upload a CSV or Excel file.", []
         
         # Check for required columns
-        required_columns = ['Transaction_ID', 'Product_Name', 'Date', 'Quantity']
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        
+        missing_columns = [col for col in REQUIRED_COLUMNS if col not in read_columns(file_path)]
         if missing_columns:
-            return False, f"Missing required columns: {', '.join(missing_columns)}"
+            return False, f"Missing required columns: {', '.join(missing_columns)}", []
+        
+        df = read_sales_data(file_path, list(REQUIRED_COLUMNS), as_text=True)
+        if df.empty:
+            return False, "The file has no data rows", []
         
-        # Check data types and format
-        try:
-            # Check if Date column can be converted to datetime
-            pd.to_datetime(df['Date'])
-        except:
-            return False, "Invalid date format in the 'Date' column"
+        # Every check is a (mask of bad rows, column, error) triple
+        empty = {col: df[col].isna() | (df[col].str.strip() == '') for col in REQUIRED_COLUMNS}
+        date_format = infer_date_format(df['Date'])
+        dates = parse_dates(df['Date'], date_format, errors='coerce')
+        quantities = pd.to_numeric(df['Quantity'], errors='coerce')
+        date_error = f"is not a date in the {date_format} format" if date_format else "is not a date"
+        checks = [(empty[col], col, "is empty") for col in REQUIRED_COLUMNS]
+        checks.append((dates.isna() & ~empty['Date'], 'Date', date_error))
+        checks.append((quantities.isna() & ~empty['Quantity'], 'Quantity', "is not a number"))
         
-        # Check if Quantity column can be converted to numeric
-        if not pd.to_numeric(df['Quantity'], errors='coerce').notna().all():
-            return False, "Invalid numeric values in the 'Quantity' column"
+        bad_rows = np.zeros(len(df), dtype=bool)
+        for mask, _, _ in checks:
+            bad_rows |= mask.to_numpy()
+        bad_count = int(bad_rows.sum())
+        if bad_count == 0:
+            return True, "Data is valid", []
         
-        # Check for empty values in required columns
-        for col in required_columns:
-            if df[col].isna().any():
-                return False, f"Missing values in '{col}' column"
+        # The first max_errors bad rows overall are among the first max_errors of every check
+        errors = []
+        for mask, col, error in checks:
+            for position in np.flatnonzero(mask.to_numpy())[:max_errors]:
+                value = df[col].iat[position]
+                errors.append({
+                    'row': int(position) + 2,
+                    'column': col,
+                    'value': '' if pd.isna(value) else str(value)[:50],
+                    'error': error
+                })
+        errors = sorted(errors, key=lambda e: e['row'])[:max_errors]
         
-        return True, "Data is valid"
+        first = errors[0]
+        # The values stay in the error list; the message is shown as the job's error and quotes no file contents
+        message = (f"{bad_count} of {len(df)} rows have invalid values "
+                   f"(first in row {first['row']}: {first['column']} {first['error']})")
+        return False, message, errors
     
     except Exception as e:
-        return False, str(e)
+        return False, str(e), []
 
-def process_data(file_path):
+def process_data(file_path, extra_columns=None):
     """
     Process the uploaded file to prepare for analysis.
     
     Args:
         file_path (str): Path to the uploaded file
+        extra_columns (list): Columns to read besides the schema (e.g. a partition key)
         
     Returns:
         DataFrame: Processed data
     """
-    # Determine file type based on extension
-    if file_path.endswith('.csv'):
-        df = pd.read_csv(file_path)
-    elif file_path.endswith(('.xlsx', '.xls')):
-        df = pd.read_excel(file_path)
-    
-    # Convert date column to datetime
-    df['Date'] = pd.to_datetime(df['Date'])
+    columns = None
+    if extra_columns:
+        present = read_columns(file_path)
+        schema = {**REQUIRED_COLUMNS, **OPTIONAL_COLUMNS}
+        columns = [col for col in present if col in schema or col in extra_columns]
+    df = read_sales_data(file_path, columns)
     
-    # Convert quantity to numeric
-    df['Quantity'] = pd.to_numeric(df['Quantity'])
+    # Convert date column to datetime with one format inferred from a sample
+    df['Date'] = parse_dates(df['Date'])
     
     # Sort by date
     df = df.sort_values('Date')
     
-    # Create transaction-product matrix for association analysis
-    df['Transaction_ID'] = df['Transaction_ID'].astype(str)
-    
     return df
 
 def get_dataset_summary(file_path):
@@ -90,21 +202,15 @@ def get_dataset_summary(file_path):
     Returns:
         dict: Summary statistics
     """
-    # Determine file type based on extension
-    if file_path.endswith('.csv'):
-        df = pd.read_csv(file_path)
-    elif file_path.endswith(('.xlsx', '.xls')):
-        df = pd.read_excel(file_path)
-    
-    # Convert date column to datetime
-    df['Date'] = pd.to_datetime(df['Date'])
+    df = read_sales_data(file_path, ['Transaction_ID', 'Product_Name', 'Date'])
+    dates = parse_dates(df['Date'])
     
     # Get summary statistics
     row_count = len(df)
     product_count = df['Product_Name'].nunique()
     transaction_count = df['Transaction_ID'].nunique()
-    date_range_start = df['Date'].min()
-    date_range_end = df['Date'].max()
+    date_range_start = dates.min()
+    date_range_end = dates.max()
     
     return {
         'row_count': row_count,
@@ -118,6 +224,9 @@ def get_sales_data_for_visualization(df):
     """
     Process sales data for visualization.
     
+    The payload is derived from the daily rollup; callers that already have the
+    rollup should use sales_overview directly.
+    
     Args:
         df (DataFrame): The processed dataframe
         
@@ -125,36 +234,7 @@ def get_sales_data_for_visualization(df):
         dict: Data for visualization
     """
     try:
-        # Group by product and date to get total sales
-        product_sales = df.groupby('Product_Name')['Quantity'].sum().sort_values(ascending=False)
-        top_products = product_sales.head(10).to_dict()
-        
-        # Ensure we have date data
-        if df.empty or 'Date' not in df.columns:
-            return {
-                'top_products': top_products,
-                'sales_over_time': []
-            }
-        
-        # Group by date to get sales over time
-        try:
-            # Convert to string format for easier JSON serialization
-            df['Date_Str'] = df['Date'].dt.strftime('%Y-%m-%d')
-            sales_over_time = df.groupby('Date_Str').agg({
-                'Quantity': 'sum',
-                'Transaction_ID': 'nunique'
-            }).reset_index()
-            
-            sales_over_time.columns = ['Date', 'Total_Quantity', 'Transaction_Count']
-            sales_over_time_list = sales_over_time.to_dict(orient='records')
-        except Exception as e:
-            print(f"Error processing time series data: {str(e)}")
-            sales_over_time_list = []
-        
-        return {
-            'top_products': top_products,
-            'sales_over_time': sales_over_time_list
-        }
+        return sales_overview(build_daily_sales(df))
     except Exception as e:
         print(f"Error in sales data visualization: {str(e)}")
         return {
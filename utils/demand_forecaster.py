@@ -1,25 +1,55 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import xgboost as xgb
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_squared_error
-from sklearn.preprocessing import LabelEncoder
 import logging
 import warnings
+from utils.progress import track_stage
 
 warnings.filterwarnings('ignore')
 
-def prepare_features(df):
+# xgboost and scikit-learn are imported by the functions that use them, so that
+# importing this module (and with it the web app) does not load them
+
+def get_associated_sales(df, association_matrix):
+    """
+    Compute the association-weighted daily sales of each product's associated products.
+    
+    The daily sales panel (products x days) is multiplied by the sparse association
+    matrix once for all products, so row i holds sum_j weight[i, j] * sales[j, day].
+    
+    Args:
+        df (DataFrame): The processed dataframe
+        association_matrix (csr_matrix): Matrix from build_association_matrix, with
+            rows and columns in sorted product name order
+        
+    Returns:
+        DataFrame: Weighted sales indexed by product name with one column per day
+    """
+    panel = df.groupby(['Product_Name', pd.Grouper(key='Date', freq='D')])['Quantity'].sum().unstack(fill_value=0)
+    all_days = pd.date_range(panel.columns.min(), panel.columns.max(), freq='D')
+    panel = panel.reindex(columns=all_days, fill_value=0)
+    
+    if association_matrix.shape != (len(panel), len(panel)):
+        raise ValueError(f"Association matrix shape {association_matrix.shape} does not match "
+                         f"{len(panel)} products in the data")
+    
+    associated_sales = association_matrix @ panel.to_numpy(dtype=float)
+    return pd.DataFrame(associated_sales, index=panel.index, columns=panel.columns)
+
+def prepare_features(df, associated_sales=None):
     """
     Prepare features for the demand forecasting model.
     
     Args:
         df (DataFrame): The processed dataframe
+        associated_sales (DataFrame): Optional output of get_associated_sales, adds
+            the AssocLag1 and AssocMean7 cross-product features
         
     Returns:
         tuple: X, y, and LabelEncoder for product names
     """
+    from sklearn.preprocessing import LabelEncoder
+    
     # Group by product and date to get daily sales
     daily_sales = df.groupby(['Product_Name', pd.Grouper(key='Date', freq='D')])['Quantity'].sum().reset_index()
     
@@ -45,45 +75,63 @@ def prepare_features(df):
     daily_sales['RollingMean30'] = daily_sales.groupby('Product_Name')['Quantity'].transform(
         lambda x: x.rolling(window=30, min_periods=1).mean())
     
-    # Drop rows with NaN values
-    daily_sales = daily_sales.dropna()
-    
     # Define features and target
     features = ['Year', 'Month', 'Day', 'DayOfWeek', 'Weekend', 'Product_Encoded', 
                 'Lag1', 'Lag7', 'RollingMean7', 'RollingMean30']
     
+    # Create cross-product features (previous days' sales of associated products)
+    if associated_sales is not None:
+        assoc_lag1 = associated_sales.shift(1, axis=1).fillna(0)
+        assoc_mean7 = associated_sales.T.rolling(window=7, min_periods=1).mean().T.shift(1, axis=1).fillna(0)
+        assoc_features = pd.DataFrame({'AssocLag1': assoc_lag1.stack(), 'AssocMean7': assoc_mean7.stack()})
+        assoc_features.index.names = ['Product_Name', 'Date']
+        daily_sales = daily_sales.join(assoc_features, on=['Product_Name', 'Date'])
+        features += ['AssocLag1', 'AssocMean7']
+    
+    # Drop rows with NaN values
+    daily_sales = daily_sales.dropna()
+    
     X = daily_sales[features]
     y = daily_sales['Quantity']
     
     return X, y, le, daily_sales
 
-def train_model(X, y):
+DEFAULT_MODEL_PARAMS = {
+    'objective': 'reg:squarederror',
+    'n_estimators': 100,
+    'learning_rate': 0.1,
+    'max_depth': 6,
+    'subsample': 0.8,
+    'colsample_bytree': 0.8,
+    'seed': 42
+}
+
+def train_model(X, y, params=None):
     """
     Train the XGBoost model for demand forecasting.
     
     Args:
         X (DataFrame): Features
         y (Series): Target variable
+        params (dict): Optional overrides for DEFAULT_MODEL_PARAMS
         
     Returns:
         XGBRegressor: Trained model
     """
+    import xgboost as xgb
+    from sklearn.model_selection import train_test_split
+    from sklearn.metrics import mean_squared_error
+    
     # Split data into train and test sets
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
     
     # Define XGBoost parameters
-    params = {
-        'objective': 'reg:squarederror',
-        'n_estimators': 100,
-        'learning_rate': 0.1,
-        'max_depth': 6,
-        'subsample': 0.8,
-        'colsample_bytree': 0.8,
-        'seed': 42
-    }
+    model_params = dict(DEFAULT_MODEL_PARAMS)
+    if params:
+        model_params.update(params)
     
     # Train the model
-    model = xgb.XGBRegressor(**params)
+    model = xgb.XGBRegressor(**model_params)
     model.fit(X_train, y_train)
     
     # Evaluate the model
@@ -93,101 +141,149 @@ def train_model(X, y):
     
     return model
 
-def forecast_demand(df, forecast_days=30):
+def generate_forecasts(model, le, daily_sales, product_names, max_date, forecast_days=30,
+                       associated_sales=None):
     """
-    Forecast demand for the next specified number of days.
+    Recursively forecast daily demand for each product with a trained model.
     
     Args:
-        df (DataFrame): The processed dataframe
+        model (XGBRegressor): Trained model
+        le (LabelEncoder): Encoder fitted on the product names
+        daily_sales (DataFrame): Daily sales with features from prepare_features
+        product_names (array-like): Products to forecast
+        max_date (datetime): Last date of the history
         forecast_days (int): Number of days to forecast
+        associated_sales (DataFrame): Output of get_associated_sales if the model
+            was trained with cross-product features
         
     Returns:
         dict: Forecasted demand by product and date
     """
-    try:
-        # Check if we have enough data
-        if len(df) < 30:
-            logging.warning("Insufficient data for accurate forecasting. Minimum 30 records recommended.")
-            
-        # Prepare features
-        X, y, le, daily_sales = prepare_features(df)
+    if associated_sales is not None:
+        # Latest known values of the cross-product features
+        assoc_lag1 = associated_sales.iloc[:, -1]
+        assoc_mean7 = associated_sales.iloc[:, -7:].mean(axis=1)
+    
+    logging.info(f"Forecasting demand for {len(product_names)} products over {forecast_days} days")
+    
+    forecast_results = {}
+    
+    for product in product_names:
+        forecast_results[product] = []
         
-        if len(X) < 10:
-            logging.warning("Very limited data after feature preparation. Forecasts may be inaccurate.")
-            
-        # Train the model
-        model = train_model(X, y)
+        # Get the latest data for this product
+        product_data = daily_sales[daily_sales['Product_Name'] == product].sort_values('Date')
         
-        # Prepare forecast data
-        max_date = df['Date'].max()
-        product_names = df['Product_Name'].unique()
+        if product_data.empty:
+            logging.warning(f"No data available for product: {product}")
+            continue
         
-        logging.info(f"Forecasting demand for {len(product_names)} products over {forecast_days} days")
+        # Get the encoded value for this product
+        product_encoded = le.transform([product])[0]
         
-        forecast_results = {}
+        # Store the last known values for updating rolling features
+        last_predictions = {}
         
-        for product in product_names:
-            forecast_results[product] = []
+        # Iterate through each day to forecast
+        for i in range(1, forecast_days + 1):
+            forecast_date = max_date + timedelta(days=i)
             
-            # Get the latest data for this product
-            product_data = daily_sales[daily_sales['Product_Name'] == product].sort_values('Date')
+            # Create features for this date
+            features = {
+                'Year': forecast_date.year,
+                'Month': forecast_date.month,
+                'Day': forecast_date.day,
+                'DayOfWeek': forecast_date.weekday(),
+                'Weekend': 1 if forecast_date.weekday() >= 5 else 0,
+                'Product_Encoded': product_encoded
+            }
             
-            if product_data.empty:
-                logging.warning(f"No data available for product: {product}")
-                continue
+            # Use the last known values for lag and rolling features
+            if i == 1:
+                features['Lag1'] = float(product_data['Quantity'].iloc[-1])
+            else:
+                features['Lag1'] = last_predictions.get(i-1, float(product_data['Quantity'].mean()))
             
-            # Get the encoded value for this product
-            product_encoded = le.transform([product])[0]
+            # Handle lag7 (previous week's sales)
+            if len(product_data) >= 7:
+                features['Lag7'] = float(product_data['Quantity'].iloc[-7])
+            else:
+                features['Lag7'] = float(product_data['Quantity'].mean())
             
-            # Store the last known values for updating rolling features
-            last_predictions = {}
+            # Handle rolling means
+            features['RollingMean7'] = float(product_data['Quantity'].iloc[-min(7, len(product_data)):].mean())
             
-            # Iterate through each day to forecast
-            for i in range(1, forecast_days + 1):
-                forecast_date = max_date + timedelta(days=i)
-                
-                # Create features for this date
-                features = {
-                    'Year': forecast_date.year,
-                    'Month': forecast_date.month,
-                    'Day': forecast_date.day,
-                    'DayOfWeek': forecast_date.weekday(),
-                    'Weekend': 1 if forecast_date.weekday() >= 5 else 0,
-                    'Product_Encoded': product_encoded
-                }
-                
-                # Use the last known values for lag and rolling features
-                if i == 1:
-                    features['Lag1'] = float(product_data['Quantity'].iloc[-1])
-                else:
-                    features['Lag1'] = last_predictions.get(i-1, float(product_data['Quantity'].mean()))
-                
-                # Handle lag7 (previous week's sales)
-                if len(product_data) >= 7:
-                    features['Lag7'] = float(product_data['Quantity'].iloc[-7])
-                else:
-                    features['Lag7'] = float(product_data['Quantity'].mean())
-                
-                # Handle rolling means
-                features['RollingMean7'] = float(product_data['Quantity'].iloc[-min(7, len(product_data)):].mean())
-                
-                if len(product_data) >= 30:
-                    features['RollingMean30'] = float(product_data['Quantity'].iloc[-30:].mean())
-                else:
-                    features['RollingMean30'] = float(product_data['Quantity'].mean())
-                
-                # Make prediction
-                features_df = pd.DataFrame([features])
-                prediction = max(0, float(model.predict(features_df)[0]))  # Ensure non-negative prediction
-                
-                # Store for next iteration
-                last_predictions[i] = prediction
+            if len(product_data) >= 30:
+                features['RollingMean30'] = float(product_data['Quantity'].iloc[-30:].mean())
+            else:
+                features['RollingMean30'] = float(product_data['Quantity'].mean())
+            
+            if associated_sales is not None:
+                features['AssocLag1'] = float(assoc_lag1[product])
+                features['AssocMean7'] = float(assoc_mean7[product])
+            
+            # Make prediction
+            features_df = pd.DataFrame([features])
+            prediction = max(0, float(model.predict(features_df)[0]))  # Ensure non-negative prediction
+            
+            # Store for next iteration
+            last_predictions[i] = prediction
+            
+            # Store forecast in the list format to avoid JSON serialization issues
+            forecast_results[product].append({
+                'date': forecast_date.strftime('%Y-%m-%d'),
+                'quantity': prediction
+            })
+    
+    return forecast_results
+
+def forecast_demand(df, forecast_days=30, model_params=None, association_matrix=None, tracker=None,
+                    history_end=None):
+    """
+    Forecast demand for the next specified number of days.
+    
+    Args:
+        df (DataFrame): The processed dataframe, or its daily (product, day) rollup
+        forecast_days (int): Number of days to forecast
+        model_params (dict): Optional overrides for the XGBoost parameters
+        association_matrix (csr_matrix): Optional output of build_association_matrix
+            over the sorted product names, enables cross-product features
+        tracker (StageTracker): Optional tracker for the train and forecast stages
+        history_end (datetime): Day the forecasts start after; defaults to the last date in df.
+            Partitions pass the last date of the whole dataset so they forecast the same days
+        
+    Returns:
+        dict: Forecasted demand by product and date
+    """
+    try:
+        # Check if we have enough data
+        if len(df) < 30:
+            logging.warning("Insufficient data for accurate forecasting. Minimum 30 records recommended.")
+            
+        with track_stage(tracker, 'train', rows=len(df)) as stage:
+            # Compute the association signal once for all products
+            associated_sales = None
+            if association_matrix is not None:
+                associated_sales = get_associated_sales(df, association_matrix)
+            
+            # Prepare features
+            X, y, le, daily_sales = prepare_features(df, associated_sales)
+            stage['training_rows'], stage['features'] = X.shape
+            
+            if len(X) < 10:
+                logging.warning("Very limited data after feature preparation. Forecasts may be inaccurate.")
                 
-                # Store forecast in the list format to avoid JSON serialization issues
-                forecast_results[product].append({
-                    'date': forecast_date.strftime('%Y-%m-%d'),
-                    'quantity': prediction
-                })
+            # Train the model
+            model = train_model(X, y, model_params)
+        
+        # Prepare forecast data
+        max_date = history_end if history_end is not None else df['Date'].max()
+        product_names = df['Product_Name'].unique()
+        
+        with track_stage(tracker, 'forecast', products=len(product_names), days=forecast_days) as stage:
+            forecast_results = generate_forecasts(model, le, daily_sales, product_names, max_date,
+                                                  forecast_days, associated_sales)
+            stage['points'] = sum(len(points) for points in forecast_results.values())
         
         return forecast_results
     
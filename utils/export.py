@@ -0,0 +1,107 @@
+"""
+Streaming serialization of exported tables.
+
+Exports are produced from generators of row batches (see
+persistence.iter_forecast_points) and serialized batch by batch, so a response
+of millions of rows never holds more than one batch in memory. CSV is written
+as text chunks; Parquet writes one row group per batch and needs the optional
+pyarrow package.
+"""
+import io
+import csv
+import importlib.util
+
+# Export format -> response mimetype
+FORMATS = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+PARQUET_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that collects what pyarrow writes until it is drained."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def csv_chunks(columns, batches):
+    """
+    Serialize row batches as CSV.
+
+    Args:
+        columns (list): (name, type) pairs; list-typed values are joined with ", "
+        batches (iterable): Lists of row tuples
+
+    Yields:
+        str: The header, then one chunk per batch
+    """
+    list_columns = [i for i, (_, kind) in enumerate(columns) if kind == 'list']
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in columns])
+    yield buffer.getvalue()
+
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        for row in batch:
+            if list_columns:
+                row = list(row)
+                for i in list_columns:
+                    row[i] = ', '.join(row[i])
+            writer.writerow(row)
+        yield buffer.getvalue()
+
+def parquet_chunks(columns, batches):
+    """
+    Serialize row batches as a Parquet file, one row group per batch.
+
+    Args:
+        columns (list): (name, type) pairs with types 'string', 'date', 'float' or 'list' (of strings)
+        batches (iterable): Lists of row tuples
+
+    Yields:
+        bytes: The file, in pieces as row groups are completed
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {'string': pa.string(), 'date': pa.date32(), 'float': pa.float64(), 'list': pa.list_(pa.string())}
+    schema = pa.schema([(name, types[kind]) for name, kind in columns])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression='snappy')
+    try:
+        for batch in batches:
+            if not batch:
+                continue
+            arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*batch), schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+def export_chunks(export_format, columns, batches):
+    """Serialize row batches in an export format (a key of FORMATS)."""
+    if export_format == 'parquet':
+        return parquet_chunks(columns, batches)
+    return csv_chunks(columns, batches)
@@ -4,86 +4,119 @@ Heatmap Generator for Product Association Analysis
 import numpy as np
 import base64
 from io import BytesIO
-import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend
-import matplotlib.pyplot as plt
 import json
 import pandas as pd
 
-def generate_association_heatmap(rules, max_products=15):
+RULE_FIELDS = ['antecedents', 'consequents', 'support', 'confidence', 'lift']
+
+def _pyplot():
+    """Import matplotlib on first use; it is only needed when an image is rendered."""
+    import matplotlib
+    matplotlib.use('Agg')  # Use non-interactive backend
+    import matplotlib.pyplot as plt
+    return plt
+
+def rules_to_frame(rules):
     """
-    Generate a heatmap visualization for product associations.
+    Normalize association rules to a DataFrame.
     
     Args:
-        rules (list): List of association rules
-        max_products (int): Maximum number of products to display
+        rules (DataFrame or list): Rules as a DataFrame, dicts or objects with rule attributes
         
     Returns:
-        str: Base64 encoded image
+        DataFrame: One row per rule with the RULE_FIELDS columns
     """
-    if not rules or len(rules) == 0:
-        return None
+    if isinstance(rules, pd.DataFrame):
+        return rules
+    records = [rule if isinstance(rule, dict) else {field: getattr(rule, field) for field in RULE_FIELDS}
+               for rule in rules]
+    return pd.DataFrame.from_records(records, columns=RULE_FIELDS)
+
+def build_heatmap_matrix(rules, max_products=15):
+    """
+    Build the product x product association matrix shown by the heatmaps.
+    
+    Rules are indexed once by (antecedent item, consequent item); each cell holds
+    the metrics of the highest-lift rule linking the pair.
+    
+    Args:
+        rules (DataFrame or list): Association rules
+        max_products (int): Number of most frequent products kept
+        
+    Returns:
+        dict: 'products' (row/column labels) and 'lift', 'support', 'confidence' matrices
+    """
+    frame = rules_to_frame(rules).reset_index(drop=True)
+    
+    # One row per (rule, antecedent item, consequent item)
+    pairs = frame[RULE_FIELDS].explode('antecedents').explode('consequents')
+    
+    # Get top products by how often they appear in rules
+    appearances = pd.concat([frame['antecedents'].explode(), frame['consequents'].explode()])
+    frequency = appearances.value_counts(sort=False).sort_values(ascending=False, kind='stable')
+    top_products = list(frequency.index[:max_products])
+    
+    # Map items to matrix positions and keep the highest-lift rule per cell
+    product_index = pd.Index(top_products)
+    pairs = pairs.assign(row=product_index.get_indexer(pairs['antecedents']),
+                         col=product_index.get_indexer(pairs['consequents']))
+    pairs = pairs[(pairs['row'] >= 0) & (pairs['col'] >= 0) & (pairs['row'] != pairs['col'])]
+    best = pairs.sort_values('lift', ascending=False, kind='stable').drop_duplicates(['row', 'col'])
+    
+    matrix_size = len(top_products)
+    heatmap = {'products': top_products}
+    rows, cols = best['row'].to_numpy(), best['col'].to_numpy()
+    for metric in ['lift', 'support', 'confidence']:
+        matrix = np.zeros((matrix_size, matrix_size))
+        matrix[rows, cols] = best[metric].to_numpy(dtype=float)
+        heatmap[metric] = matrix
+    
+    return heatmap
+
+def heatmap_matrix_payload(heatmap):
+    """
+    Convert a heatmap matrix to plain lists for JSON responses and templates.
     
-    # Extract product information and count frequency
-    product_frequency = {}
-    for rule in rules:
-        # Handle both dict and object access patterns
-        if isinstance(rule, dict):
-            antecedents = rule['antecedents'] if isinstance(rule['antecedents'], list) else [rule['antecedents']]
-            consequents = rule['consequents'] if isinstance(rule['consequents'], list) else [rule['consequents']]
-        else:
-            antecedents = rule.antecedents if isinstance(rule.antecedents, list) else [rule.antecedents]
-            consequents = rule.consequents if isinstance(rule.consequents, list) else [rule.consequents]
+    Args:
+        heatmap (dict): Output of build_heatmap_matrix
         
-        for product in antecedents + consequents:
-            if product in product_frequency:
-                product_frequency[product] += 1
-            else:
-                product_frequency[product] = 1
+    Returns:
+        dict: Same keys with matrices as nested lists
+    """
+    return {key: value.round(4).tolist() if isinstance(value, np.ndarray) else value
+            for key, value in heatmap.items()}
+
+def generate_association_heatmap(rules, max_products=15, heatmap=None, output='base64'):
+    """
+    Generate a heatmap visualization for product associations.
     
-    # Get top products by frequency
-    top_products = sorted(product_frequency.items(), key=lambda x: x[1], reverse=True)
-    top_products = [p[0] for p in top_products[:max_products]]
+    Args:
+        rules (list or DataFrame): Association rules
+        max_products (int): Maximum number of products to display
+        heatmap (dict): Precomputed output of build_heatmap_matrix
+        output (str): 'base64' for an encoded string, 'png' for raw PNG bytes
+        
+    Returns:
+        str or bytes: Base64 encoded image, or PNG bytes
+    """
+    if rules is None or len(rules) == 0:
+        return None
     
-    # Create a matrix for the heatmap
+    if heatmap is None:
+        heatmap = build_heatmap_matrix(rules, max_products)
+    top_products = heatmap['products']
+    heatmap_matrix = heatmap['lift']
     matrix_size = len(top_products)
-    heatmap_matrix = np.zeros((matrix_size, matrix_size))
-    
-    # Fill the matrix with lift values
-    for i, p1 in enumerate(top_products):
-        for j, p2 in enumerate(top_products):
-            if i != j:  # Skip self-associations
-                # Find rules where p1 -> p2
-                matching_rules = []
-                for r in rules:
-                    if isinstance(r, dict):
-                        antecedents = r['antecedents'] if isinstance(r['antecedents'], list) else [r['antecedents']]
-                        consequents = r['consequents'] if isinstance(r['consequents'], list) else [r['consequents']]
-                        if p1 in antecedents and p2 in consequents:
-                            matching_rules.append(r)
-                    else:
-                        antecedents = r.antecedents if isinstance(r.antecedents, list) else [r.antecedents]
-                        consequents = r.consequents if isinstance(r.consequents, list) else [r.consequents]
-                        if p1 in antecedents and p2 in consequents:
-                            matching_rules.append(r)
-                
-                if matching_rules:
-                    # Use the highest lift value if multiple rules exist
-                    if isinstance(matching_rules[0], dict):
-                        best_rule = max(matching_rules, key=lambda r: r['lift'])
-                        heatmap_matrix[i, j] = best_rule['lift']
-                    else:
-                        best_rule = max(matching_rules, key=lambda r: r.lift)
-                        heatmap_matrix[i, j] = best_rule.lift
     
     # Create the heatmap
+    plt = _pyplot()
     plt.figure(figsize=(12, 10))
     
     # Create a mask for zero values
     mask = heatmap_matrix == 0
     
     # Get colormap
-    cmap = matplotlib.colormaps['plasma']  # Using plasma colormap
+    cmap = plt.get_cmap('plasma')  # Using plasma colormap
     
     # Plot heatmap
     plt.imshow(heatmap_matrix, cmap=cmap, interpolation='nearest')
@@ -118,44 +151,38 @@ def generate_association_heatmap(rules, max_products=15):
     image_png = buffer.getvalue()
     buffer.close()
     
-    # Encode as base64
-    image_base64 = base64.b64encode(image_png).decode('utf-8')
-    
     plt.close()
     
-    return image_base64
+    if output == 'png':
+        return image_png
+    
+    # Encode as base64
+    return base64.b64encode(image_png).decode('utf-8')
 
-def generate_metrics_visualization(rules):
+def generate_metrics_visualization(rules, output='base64'):
     """
     Generate a scatter plot showing support vs confidence with lift as bubble size.
     
     Args:
-        rules (list): List of association rules
+        rules (list or DataFrame): Association rules
+        output (str): 'base64' for an encoded string, 'png' for raw PNG bytes
         
     Returns:
-        str: Base64 encoded image
+        str or bytes: Base64 encoded image, or PNG bytes
     """
-    if not rules or len(rules) == 0:
+    if rules is None or len(rules) == 0:
         return None
     
     # Extract metrics
-    supports = []
-    confidences = []
-    lifts = []
-    
-    for rule in rules:
-        if isinstance(rule, dict):
-            supports.append(rule['support'])
-            confidences.append(rule['confidence'])
-            lifts.append(rule['lift'])
-        else:
-            supports.append(rule.support)
-            confidences.append(rule.confidence)
-            lifts.append(rule.lift)
+    frame = rules_to_frame(rules)
+    supports = frame['support'].to_numpy(dtype=float)
+    confidences = frame['confidence'].to_numpy(dtype=float)
+    lifts = frame['lift'].to_numpy(dtype=float)
     
     # Create the scatter plot
+    plt = _pyplot()
     plt.figure(figsize=(10, 6))
-    plt.scatter(supports, confidences, s=np.array(lifts) * 30, alpha=0.6, 
+    plt.scatter(supports, confidences, s=lifts * 30, alpha=0.6, 
                 c=lifts, cmap='viridis')
     
     plt.colorbar(label='Lift')
@@ -171,9 +198,10 @@ def generate_metrics_visualization(rules):
     image_png = buffer.getvalue()
     buffer.close()
     
-    # Encode as base64
-    image_base64 = base64.b64encode(image_png).decode('utf-8')
-    
     plt.close()
     
-    return image_base64
\ No newline at end of file
+    if output == 'png':
+        return image_png
+    
+    # Encode as base64
+    return base64.b64encode(image_png).decode('utf-8')
\ No newline at end of file
@@ -0,0 +1,119 @@
+"""
+Memory budget of a processing job.
+
+The budget covers the whole job: data that stays in memory for the rest of the
+job (the parsed upload, the mined rules) is held on the budget, and a stage
+fits if its working memory fits in what is left. The pipeline estimates the
+working memory of a stage before running it and asks the job's MemoryBudget
+whether it fits. Stages with a cheaper path
+(sparse encoding, low-memory mining, mining on a sample of the transactions)
+switch to it and record the decision for the user; stages without one refuse
+the job with MemoryBudgetExceeded before anything is allocated.
+
+The estimates are deliberately rough upper bounds; the actual peak of every
+stage is recorded next to its estimate in the stage log (StageTracker with
+trace_memory) so they can be checked against real jobs.
+"""
+import logging
+
+MB = 1024 * 1024
+
+# Parsed DataFrame bytes per byte of CSV (object columns hold one Python string per cell)
+PARSE_BYTES_PER_FILE_BYTE = 8
+# Training frame, features and XGBoost matrices per row of the daily rollup
+TRAIN_BYTES_PER_ROW = 1024
+# Rule frame row with its antecedent/consequent sets and metrics
+RULE_BYTES = 1024
+
+class MemoryBudgetExceeded(Exception):
+    """Raised when a stage would exceed the memory budget and has no cheaper path."""
+
+    def __init__(self, stage, estimate, limit, hint='', resident=0):
+        self.stage = stage
+        self.estimate = estimate
+        self.limit = limit
+        self.resident = resident
+        message = (f"The {stage} stage would need about {estimate / MB:,.0f} MB, more than the "
+                   f"{(limit - resident) / MB:,.0f} MB left of the {limit / MB:,.0f} MB memory budget of a job.")
+        super().__init__(f"{message} {hint}".strip())
+
+class MemoryBudget:
+    """Per-job memory limit, the data held on it, and the fallback decisions taken to stay within it."""
+
+    def __init__(self, limit_bytes=None):
+        """
+        Args:
+            limit_bytes (int): Memory allowed for the whole job, None or 0 for no limit
+        """
+        self.limit_bytes = limit_bytes or None
+        self.held = {}  # Name -> bytes of data kept in memory for the rest of the job
+        self.decisions = []
+
+    @property
+    def resident_bytes(self):
+        return sum(self.held.values())
+
+    @property
+    def available_bytes(self):
+        """Memory left for a stage's working memory, None for no limit."""
+        if self.limit_bytes is None:
+            return None
+        return max(self.limit_bytes - self.resident_bytes, 0)
+
+    def fits(self, estimate):
+        return self.limit_bytes is None or estimate <= self.available_bytes
+
+    def require(self, stage, estimate, hint=''):
+        """Raise MemoryBudgetExceeded if estimate does not fit."""
+        if not self.fits(estimate):
+            raise MemoryBudgetExceeded(stage, estimate, self.limit_bytes, hint, self.resident_bytes)
+
+    def hold(self, name, size):
+        """Count data kept in memory for the rest of the job (replaces an earlier hold of the same name)."""
+        self.held[name] = size
+
+    def release(self, name):
+        """Stop counting data the job no longer keeps."""
+        self.held.pop(name, None)
+
+    def decide(self, message):
+        """Record a fallback taken to stay within the budget."""
+        logging.info(f"Memory budget: {message}")
+        self.decisions.append(message)
+
+def estimate_parse_bytes(file_size):
+    """DataFrame memory of a parsed upload of file_size bytes."""
+    return file_size * PARSE_BYTES_PER_FILE_BYTE
+
+def estimate_transaction_lists_bytes(baskets, line_items):
+    """Python lists of product names per transaction built before encoding."""
+    return baskets * 72 + line_items * 8
+
+def estimate_dense_encoding_bytes(baskets, products, line_items):
+    """One-hot boolean matrix and its DataFrame copy."""
+    return estimate_transaction_lists_bytes(baskets, line_items) + baskets * products * 2
+
+def estimate_sparse_encoding_bytes(baskets, line_items):
+    """Sparse one-hot matrix (CSR data and indices, then sparse DataFrame columns)."""
+    return estimate_transaction_lists_bytes(baskets, line_items) + line_items * 24 + baskets * 8
+
+def estimate_mining_bytes(baskets, frequent_items, low_memory=False):
+    """
+    Apriori working memory at the pair level, usually the largest.
+
+    The default mlxtend path tests all candidate pairs at once with a
+    baskets x candidates x 2 boolean array; the low-memory path tests one
+    candidate at a time.
+    """
+    candidates = frequent_items * (frequent_items - 1) // 2
+    if low_memory:
+        return baskets * 8 + candidates * 64
+    return baskets * candidates * 3 + candidates * 64
+
+def estimate_rules_bytes(itemset_sizes):
+    """Upper bound on the rule frame: every non-empty split of every frequent itemset."""
+    return sum(2 ** size - 2 for size in itemset_sizes if size > 1) * RULE_BYTES
+
+def estimate_training_bytes(daily_rows):
+    """Training memory for a daily rollup of daily_rows (product, day) rows."""
+    return daily_rows * TRAIN_BYTES_PER_ROW
@@ -0,0 +1,220 @@
+"""
+Prometheus-format metrics without an external client library.
+
+A MetricsRegistry holds histograms and counters with labels and renders them
+in the Prometheus text exposition format. Web and job workers are separate
+processes, so each process periodically writes a snapshot of its metrics to a
+shared directory and the /metrics endpoint merges the snapshots of every
+process on the host. A process deletes its snapshot when it exits, and the
+snapshots of processes that are no longer running are deleted when merging
+(e.g. of a worker killed by a timeout).
+"""
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+
+# Seconds, from a fast request to a long training run
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+# Input sizes (rows, baskets, products, rules...)
+SIZE_BUCKETS = (10, 100, 1000, 10000, 100000, 1000000, 10000000)
+# Bytes, 1 MB to 16 GB
+MEMORY_BUCKETS = tuple(2 ** power for power in range(20, 35, 2))
+
+# Stage record fields that are not input or output sizes
+_STAGE_RECORD_FIELDS = {'stage', 'status', 'started_at', 'seconds', 'estimated_bytes', 'peak_memory_bytes'}
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+def _format_value(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Running, as another user
+        return True
+    return True
+
+class MetricsRegistry:
+    """Labelled histograms and counters, merged across processes through snapshot files."""
+
+    def __init__(self, snapshot_dir=None, flush_interval=5.0):
+        """
+        Args:
+            snapshot_dir (str): Directory shared by all processes, None for a single process
+            flush_interval (float): Minimum seconds between snapshot writes
+        """
+        self.snapshot_dir = snapshot_dir
+        self.flush_interval = flush_interval
+        self._families = {}  # name -> {'type', 'help', 'buckets'}
+        self._series = {}  # name -> {label key: bucket counts + [sum, count], or [value]}
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+        if snapshot_dir:
+            os.makedirs(snapshot_dir, exist_ok=True)
+            atexit.register(self.remove_snapshot)
+
+    def histogram(self, name, help_text, buckets=DURATION_BUCKETS):
+        """Declare a histogram."""
+        self._families[name] = {'type': 'histogram', 'help': help_text, 'buckets': list(buckets)}
+        self._series.setdefault(name, {})
+
+    def counter(self, name, help_text):
+        """Declare a counter."""
+        self._families[name] = {'type': 'counter', 'help': help_text, 'buckets': None}
+        self._series.setdefault(name, {})
+
+    def observe(self, name, value, **labels):
+        """Record a value in a declared histogram."""
+        buckets = self._families[name]['buckets']
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series[name].setdefault(key, [0] * (len(buckets) + 1) + [0.0, 0])
+            # Per-bucket (not cumulative) counts; the extra slot is +Inf
+            index = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+        self._maybe_flush()
+
+    def inc(self, name, amount=1, **labels):
+        """Increase a declared counter."""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series[name].setdefault(key, [0])
+            series[0] += amount
+        self._maybe_flush()
+
+    def _snapshot_path(self, pid):
+        return os.path.join(self.snapshot_dir, f'metrics-{pid}.json')
+
+    def _maybe_flush(self):
+        if self.snapshot_dir and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Write this process's snapshot for the other processes to merge."""
+        if not self.snapshot_dir:
+            return
+        with self._lock:
+            snapshot = {name: [[list(map(list, key)), values] for key, values in series.items()]
+                        for name, series in self._series.items()}
+            self._last_flush = time.monotonic()
+
+        path = self._snapshot_path(os.getpid())
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"Could not write metrics snapshot: {str(e)}")
+
+    def remove_snapshot(self, pid=None):
+        """Delete the snapshot of a process that exited (by default the current one)."""
+        if not self.snapshot_dir:
+            return
+        try:
+            os.remove(self._snapshot_path(pid or os.getpid()))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.warning(f"Could not remove metrics snapshot: {str(e)}")
+
+    def _merged_series(self):
+        with self._lock:
+            merged = {name: {key: list(values) for key, values in series.items()}
+                      for name, series in self._series.items()}
+        if not self.snapshot_dir:
+            return merged
+
+        own_snapshot = os.path.basename(self._snapshot_path(os.getpid()))
+        for entry in os.scandir(self.snapshot_dir):
+            if not entry.name.endswith('.json') or entry.name == own_snapshot:
+                continue
+            pid = entry.name[len('metrics-'):-len('.json')]
+            if pid.isdigit() and not _process_alive(int(pid)):
+                self.remove_snapshot(int(pid))
+                continue
+            try:
+                with open(entry.path, 'r', encoding='utf-8') as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for name, series in snapshot.items():
+                if name not in merged:
+                    continue
+                for key, values in series:
+                    key = tuple(tuple(pair) for pair in key)
+                    current = merged[name].get(key)
+                    if current is None or len(current) != len(values):
+                        merged[name][key] = list(values)
+                    else:
+                        merged[name][key] = [a + b for a, b in zip(current, values)]
+        return merged
+
+    def render(self):
+        """
+        Render all metrics of every process in the Prometheus text format.
+
+        Returns:
+            str: Exposition text (content type text/plain; version=0.0.4)
+        """
+        merged = self._merged_series()
+        lines = []
+        for name, family in sorted(self._families.items()):
+            lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} {family['type']}")
+            for key, values in sorted(merged.get(name, {}).items()):
+                if family['type'] == 'counter':
+                    lines.append(f"{name}{_format_labels(key)} {_format_value(values[0])}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(family['buckets'] + ['+Inf'], values[:-2]):
+                    cumulative += count
+                    le = bound if bound == '+Inf' else _format_value(bound)
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', le)])} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(key)} {_format_value(values[-2])}")
+                lines.append(f"{name}_count{_format_labels(key)} {_format_value(values[-1])}")
+        return '\n'.join(lines) + '\n'
+
+def record_stage(registry, record):
+    """
+    Record a finished StageTracker stage: its duration and its sizes.
+
+    Args:
+        registry (MetricsRegistry): Registry with the pipeline_stage_* histograms
+        record (dict): StageTracker stage record; running stages are ignored
+    """
+    if record['status'] == 'running':
+        return
+    registry.observe('pipeline_stage_duration_seconds', record['seconds'],
+                     stage=record['stage'], status=record['status'])
+    if 'peak_memory_bytes' in record:
+        registry.observe('pipeline_stage_peak_memory_bytes', record['peak_memory_bytes'], stage=record['stage'])
+    for kind, value in record.items():
+        if kind not in _STAGE_RECORD_FIELDS and isinstance(value, (int, float)):
+            registry.observe('pipeline_stage_size', value, stage=record['stage'], kind=kind)
+
+def stage_metrics_callback(registry):
+    """Create a StageTracker on_update callback that records finished stages."""
+    def on_update(tracker):
+        record_stage(registry, tracker.stages[-1])
+    return on_update
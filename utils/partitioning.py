@@ -0,0 +1,181 @@
+"""
+Partitioned processing of multi-store datasets.
+
+A dataset is split by a partition column (store, region, category...) and
+association mining and forecasting run for every partition in parallel in a
+process pool. The partition results are combined into a roll-up for the whole
+dataset: forecasts are summed per product and day, and each rule is listed
+once, with the metrics of the partition where its lift is highest. Every
+partition forecasts from the last date of the whole dataset, so the summed
+forecasts cover the same days in every partition.
+"""
+import logging
+import multiprocessing
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from utils.association_miner import run_apriori, build_association_matrix
+from utils.demand_forecaster import forecast_demand
+from utils.memory_budget import MemoryBudget, MemoryBudgetExceeded, estimate_training_bytes
+from utils.progress import StageTracker
+from utils.sales_series import build_daily_sales
+
+# Partition value of rows without one
+MISSING_PARTITION = 'Unknown'
+
+def split_partitions(df, key):
+    """
+    Split a dataset by the values of a column.
+
+    Args:
+        df (DataFrame): The processed dataframe
+        key (str): Partition column
+
+    Returns:
+        dict: Partition value (str) -> rows of that partition, in value order
+    """
+    values = df[key].astype('string').fillna(MISSING_PARTITION)
+    return {str(value): part for value, part in df.groupby(values, sort=True)}
+
+def process_partition(df, options, memory_budget_bytes=None, trace_memory=False, history_end=None):
+    """
+    Mine association rules and forecast demand for one partition.
+
+    Args:
+        df (DataFrame): Rows of the partition
+        options (dict): Processing options (min_support, min_confidence, use_associations)
+        memory_budget_bytes (int): Memory budget of the partition, None for no limit
+        trace_memory (bool): Record the peak allocation of every stage
+        history_end (Timestamp): Day the forecasts start after (the last day of the whole dataset)
+
+    Returns:
+        dict: 'daily_sales', 'rules', 'forecasts', the 'stages' records, the budget
+            'decisions', and 'error' if the partition could not be processed
+    """
+    tracker = StageTracker(trace_memory=trace_memory)
+    budget = MemoryBudget(memory_budget_bytes)
+    result = {'stages': tracker.stages, 'decisions': budget.decisions}
+    try:
+        result['daily_sales'] = build_daily_sales(df)
+        rules = run_apriori(df, options['min_support'], options['min_confidence'], tracker, budget)
+
+        association_matrix = None
+        if options.get('use_associations') and not rules.empty:
+            association_matrix = build_association_matrix(rules, sorted(df['Product_Name'].unique()))
+
+        budget.require('train', estimate_training_bytes(len(result['daily_sales']['products'])))
+        result['forecasts'] = forecast_demand(result['daily_sales']['products'],
+                                              association_matrix=association_matrix, tracker=tracker,
+                                              history_end=history_end)
+        result['rules'] = rules
+    except MemoryBudgetExceeded as e:
+        # Returned rather than raised: the exception does not survive pickling between processes
+        result['error'] = str(e)
+    except Exception as e:
+        # Likewise for any other failure, which then costs only this partition
+        logging.exception("Error processing partition")
+        result['error'] = f"{type(e).__name__}: {e}"
+    return result
+
+def process_partitions(partitions, options, max_workers=None, memory_budget_bytes=None, trace_memory=False,
+                       on_result=None):
+    """
+    Process partitions in parallel in a process pool.
+
+    The memory budget is shared by the partitions running at the same time, so
+    each gets memory_budget_bytes divided by the number of workers.
+
+    Args:
+        partitions (dict): Output of split_partitions
+        options (dict): Processing options (min_support, min_confidence, use_associations)
+        max_workers (int): Size of the process pool (defaults to the CPU count); 1 runs inline
+        memory_budget_bytes (int): Memory budget of the whole job, None for no limit
+        trace_memory (bool): Record the peak allocation of every stage
+        on_result (callable): Called with (value, result) as each partition finishes
+
+    Returns:
+        dict: Partition value -> output of process_partition
+    """
+    workers = min(max_workers or multiprocessing.cpu_count(), len(partitions)) or 1
+    partition_budget = memory_budget_bytes // workers if memory_budget_bytes else None
+    history_end = max(part['Date'].max() for part in partitions.values()).normalize() if partitions else None
+    logging.info(f"Processing {len(partitions)} partitions with {workers} workers")
+
+    results = {}
+    def finish(value, result):
+        results[value] = result
+        if on_result:
+            on_result(value, result)
+
+    if workers == 1:
+        for value, part in partitions.items():
+            finish(value, process_partition(part, options, partition_budget, trace_memory, history_end))
+        return results
+
+    # Fresh interpreters: the job may run in a threaded web process, which must not be forked
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures = {
+            executor.submit(process_partition, part, options, partition_budget, trace_memory, history_end): value
+            for value, part in partitions.items()
+        }
+        for future in as_completed(futures):
+            finish(futures[future], future.result())
+    return results
+
+def rollup_rules(partition_rules):
+    """
+    Combine the rules of all partitions.
+
+    Args:
+        partition_rules (dict): Partition value -> output of run_apriori
+
+    Returns:
+        DataFrame: Each rule once, with the metrics (and Partition) of its highest lift
+    """
+    frames = [rules.assign(Partition=value) for value, rules in partition_rules.items() if not rules.empty]
+    if not frames:
+        return pd.DataFrame()
+
+    rules = pd.concat(frames, ignore_index=True).sort_values('lift', ascending=False)
+    rule_keys = pd.Series([(tuple(sorted(antecedents)), tuple(sorted(consequents)))
+                           for antecedents, consequents in zip(rules['antecedents'], rules['consequents'])],
+                          index=rules.index)
+    return rules[~rule_keys.duplicated()]
+
+def rollup_forecasts(partition_forecasts):
+    """
+    Sum the forecasts of all partitions per product and day.
+
+    Each product's series covers every day from its first to its last forecast
+    date; a day no partition forecasts is 0, so the series can be stored as a
+    start date and a packed array (see persistence.save_forecast_series).
+
+    Args:
+        partition_forecasts (dict): Partition value -> output of forecast_demand
+
+    Returns:
+        dict: Forecasted demand by product and date, in the forecast_demand format
+    """
+    totals = {}
+    for forecasts in partition_forecasts.values():
+        for product, points in forecasts.items():
+            by_date = totals.setdefault(product, {})
+            for point in points:
+                by_date[point['date']] = by_date.get(point['date'], 0.0) + float(point['quantity'])
+
+    rollup = {}
+    for product, by_date in totals.items():
+        if not by_date:
+            continue
+        day = datetime.strptime(min(by_date), '%Y-%m-%d')
+        last = datetime.strptime(max(by_date), '%Y-%m-%d')
+        points = []
+        while day <= last:
+            date = day.strftime('%Y-%m-%d')
+            points.append({'date': date, 'quantity': by_date.get(date, 0.0)})
+            day += timedelta(days=1)
+        rollup[product] = points
+    return rollup
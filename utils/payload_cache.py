@@ -0,0 +1,137 @@
+"""
+Size-bounded cache for serialized visualization payloads.
+
+Payloads are JSON strings (or bytes, such as rendered images, in a binary
+cache) keyed by dataset id and parameters. The in-process tier is an LRU
+bounded by total payload size; the optional on-disk tier is a directory shared
+by every process on the host (gunicorn workers and the job workers), evicting
+the least recently used files beyond its own size bound.
+"""
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+class PayloadCache:
+    """Two-tier (memory + disk) LRU cache of text or binary payloads."""
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, disk_dir=None, disk_max_bytes=256 * 1024 * 1024,
+                 binary=False):
+        """
+        Args:
+            max_bytes (int): Size bound of the in-process tier
+            disk_dir (str): Directory of the on-disk tier, None to disable it
+            disk_max_bytes (int): Size bound of the on-disk tier
+            binary (bool): Store bytes instead of str payloads
+        """
+        self.binary = binary
+        self._extension = '.bin' if binary else '.json'
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(namespace, dataset_id, **params):
+        """Build a cache key from a payload type, dataset id and parameters."""
+        key = f"{namespace}:{dataset_id}"
+        if params:
+            key += ':' + '&'.join(f"{name}={params[name]}" for name in sorted(params))
+        return key
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + self._extension)
+
+    def _remember(self, key, value):
+        with self._lock:
+            if key in self._entries:
+                self._size -= len(self._entries.pop(key))
+            if len(value) > self.max_bytes:
+                return
+            self._entries[key] = value
+            self._size += len(value)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def get(self, key):
+        """
+        Get a payload, promoting disk hits to the in-process tier.
+
+        Returns:
+            str or bytes: The payload, or None on a miss
+        """
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                return value
+
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb' if self.binary else 'r', encoding=None if self.binary else 'utf-8') as f:
+                value = f.read()
+            os.utime(path)  # Refresh recency for disk eviction
+        except OSError:
+            return None
+
+        self._remember(key, value)
+        return value
+
+    def set(self, key, value):
+        """Store a payload in both tiers."""
+        self._remember(key, value)
+
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb' if self.binary else 'w', encoding=None if self.binary else 'utf-8') as f:
+                f.write(value)
+            os.replace(tmp_path, path)  # Atomic, so other processes never read partial files
+            self._evict_disk()
+        except OSError as e:
+            logging.warning(f"Could not write payload cache file: {str(e)}")
+
+    def get_or_create(self, key, create):
+        """
+        Get a payload, building and storing it with create() on a miss.
+
+        Args:
+            key (str): Cache key
+            create (callable): Returns the payload
+
+        Returns:
+            str or bytes: The payload
+        """
+        value = self.get(key)
+        if value is None:
+            value = create()
+            self.set(key, value)
+        return value
+
+    def _evict_disk(self):
+        entries = []
+        total = 0
+        for entry in os.scandir(self.disk_dir):
+            if entry.name.endswith(self._extension):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        for _, size, path in sorted(entries):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
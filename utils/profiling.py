@@ -0,0 +1,103 @@
+"""
+Opt-in profiling of individual requests.
+
+A RequestProfiler samples the stack of the thread serving a request at a fixed
+interval and writes the samples in the folded format read by flamegraph.pl,
+speedscope and similar tools ("outer;inner;leaf count" per line). In
+deterministic mode the request also runs under cProfile and a .prof file
+(readable with pstats or snakeviz) is written next to the folded stacks.
+"""
+import os
+import sys
+import time
+import cProfile
+import threading
+from collections import Counter
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class StackSampler:
+    """Samples the call stack of one thread from a background thread."""
+
+    def __init__(self, thread_id, interval=0.005):
+        """
+        Args:
+            thread_id (int): threading.get_ident() of the sampled thread
+            interval (float): Seconds between samples
+        """
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling and return the collected stacks (folded stack -> sample count)."""
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+class RequestProfiler:
+    """Profiles the current thread between start() and stop()."""
+
+    def __init__(self, deterministic=False, interval=0.005):
+        """
+        Args:
+            deterministic (bool): Also run cProfile (slower, but counts every call)
+            interval (float): Seconds between stack samples
+        """
+        self.sampler = StackSampler(threading.get_ident(), interval)
+        self.profile = cProfile.Profile() if deterministic else None
+        self.started = None
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.sampler.start()
+        if self.profile:
+            self.profile.enable()
+
+    def stop(self, profile_dir, route, dataset_id=None):
+        """
+        Stop profiling and write the results.
+
+        Files are written to <profile_dir>/<route>/<dataset_id or "none">/ and
+        named by time, duration and process id.
+
+        Args:
+            profile_dir (str): Root directory of the profiles
+            route (str): Endpoint name of the request
+            dataset_id (int): Dataset the request worked on, if any
+
+        Returns:
+            str: Path of the folded stacks file
+        """
+        if self.profile:
+            self.profile.disable()
+        samples = self.sampler.stop()
+        elapsed_ms = (time.perf_counter() - self.started) * 1000
+
+        directory = os.path.join(profile_dir, route, str(dataset_id) if dataset_id is not None else 'none')
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{elapsed_ms:.0f}ms-{os.getpid()}")
+
+        with open(f'{base}.folded', 'w', encoding='utf-8') as f:
+            for stack, count in samples.most_common():
+                f.write(f'{stack} {count}\n')
+        if self.profile:
+            self.profile.dump_stats(f'{base}.prof')
+        return f'{base}.folded'
@@ -0,0 +1,112 @@
+"""
+Stage tracking for the processing pipeline.
+
+A StageTracker records the start, duration, outcome and input/output sizes of
+each pipeline stage, and notifies a callback whenever a record changes.
+Pipeline functions accept an optional tracker and use `track_stage`, which is
+a no-op when no tracker is given.
+
+With trace_memory, each stage record also gets the peak memory allocated
+during the stage (tracemalloc). Tracing runs only while a traced stage is
+active; it is process-wide, so while stages run concurrently in other threads
+the peak is not reset and each of them reports an upper bound that includes
+the others' allocations.
+"""
+import time
+import threading
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+_trace_lock = threading.Lock()
+_trace_users = 0
+_trace_owned = False
+
+def _begin_trace():
+    global _trace_users, _trace_owned
+    with _trace_lock:
+        if _trace_users == 0:
+            # Leave tracing alone if someone else (e.g. a benchmark) started it
+            _trace_owned = not tracemalloc.is_tracing()
+            if _trace_owned:
+                tracemalloc.start()
+            # Resetting while other stages are traced would hide their peaks
+            tracemalloc.reset_peak()
+        _trace_users += 1
+        return tracemalloc.get_traced_memory()[0]
+
+def _end_trace(start_bytes):
+    global _trace_users
+    with _trace_lock:
+        peak = tracemalloc.get_traced_memory()[1]
+        _trace_users -= 1
+        if _trace_users == 0 and _trace_owned:
+            tracemalloc.stop()
+    return max(peak - start_bytes, 0)
+
+class StageTracker:
+    """Collects per-stage progress records for one pipeline run."""
+
+    def __init__(self, on_update=None, trace_memory=False):
+        """
+        Args:
+            on_update (callable): Called with the tracker after every change
+            trace_memory (bool): Record the peak allocation of each stage as peak_memory_bytes
+        """
+        self.stages = []
+        self.on_update = on_update
+        self.trace_memory = trace_memory
+
+    @property
+    def current_stage(self):
+        return self.stages[-1]['stage'] if self.stages else None
+
+    def _notify(self):
+        if self.on_update:
+            self.on_update(self)
+
+    def add(self, record):
+        """Add a finished stage record collected elsewhere (e.g. by a tracker in another process)."""
+        self.stages.append(record)
+        self._notify()
+
+    @contextmanager
+    def stage(self, name, **counts):
+        """
+        Time a pipeline stage.
+
+        Args:
+            name (str): Stage name
+            **counts: Sizes known when the stage starts (rows, products...)
+
+        Yields:
+            dict: The stage record; add counts to it as they become known
+        """
+        record = {'stage': name, 'status': 'running', 'started_at': time.time(), 'seconds': None}
+        record.update(counts)
+        self.stages.append(record)
+        self._notify()
+
+        start_bytes = _begin_trace() if self.trace_memory else None
+        start = time.perf_counter()
+        try:
+            yield record
+            record['status'] = 'done'
+        except BaseException:
+            record['status'] = 'failed'
+            raise
+        finally:
+            record['seconds'] = round(time.perf_counter() - start, 4)
+            if start_bytes is not None:
+                record['peak_memory_bytes'] = _end_trace(start_bytes)
+            self._notify()
+
+def track_stage(tracker, name, **counts):
+    """
+    Time a stage on tracker, or do nothing if tracker is None.
+
+    Returns:
+        context manager: Yields the stage record (a plain dict without a tracker)
+    """
+    if tracker is None:
+        return nullcontext(dict(counts))
+    return tracker.stage(name, **counts)
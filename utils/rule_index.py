@@ -0,0 +1,178 @@
+"""
+In-memory index of association rules for basket recommendations.
+
+A RuleIndex answers "given these items in the basket, what should we
+suggest?": it finds every rule whose antecedent itemset is contained in the
+basket and returns the best consequent products by lift or confidence.
+
+Products are mapped to integer ids and each rule is listed under every item
+of its antecedent (an inverted index). A lookup walks the postings of the
+basket items and counts the hits per rule; a rule matches when all of its
+antecedent items were hit, which covers every subset of the basket without
+enumerating the subsets. The cost is proportional to the postings of the
+basket items, not to the number of rules.
+
+A RuleIndexCache keeps the indexes of recently used datasets, keyed by
+dataset version, so an index is rebuilt when its dataset is reprocessed.
+"""
+import heapq
+import threading
+from collections import OrderedDict
+
+# Rule metrics recommendations can be ranked by
+METRICS = ('lift', 'confidence', 'support')
+
+class RuleIndex:
+    """Inverted index from antecedent items to the association rules of one dataset."""
+
+    def __init__(self, rules):
+        """
+        Args:
+            rules (list): Rule dicts with 'antecedents', 'consequents' (lists of products),
+                'support', 'confidence' and 'lift', as loaded for the analysis page
+        """
+        self.products = []
+        self._product_ids = {}
+        self._sizes = []  # Antecedent size per rule
+        self._antecedents = []  # Antecedent product ids per rule
+        self._consequents = []  # Consequent product ids per rule
+        self._scores = {metric: [] for metric in METRICS}
+        self._postings = {}  # Product id -> ids of the rules with the product in their antecedent
+
+        for rule in rules:
+            antecedents = {self._product_id(product) for product in rule['antecedents']}
+            consequents = {self._product_id(product) for product in rule['consequents']} - antecedents
+            if not antecedents or not consequents:
+                continue
+
+            rule_id = len(self._sizes)
+            self._sizes.append(len(antecedents))
+            self._antecedents.append(tuple(sorted(antecedents)))
+            self._consequents.append(tuple(sorted(consequents)))
+            for metric in METRICS:
+                self._scores[metric].append(float(rule[metric]))
+            for product_id in antecedents:
+                self._postings.setdefault(product_id, []).append(rule_id)
+
+    def __len__(self):
+        return len(self._sizes)
+
+    def _product_id(self, product):
+        product_id = self._product_ids.get(product)
+        if product_id is None:
+            product_id = self._product_ids[product] = len(self.products)
+            self.products.append(product)
+        return product_id
+
+    def matching_rules(self, basket):
+        """
+        Find the rules whose antecedent is contained in the basket.
+
+        Args:
+            basket (iterable): Products in the basket (unknown products are ignored)
+
+        Returns:
+            list: Ids of the matching rules
+        """
+        basket_ids = {self._product_ids[product] for product in basket if product in self._product_ids}
+        hits = {}
+        for product_id in basket_ids:
+            for rule_id in self._postings.get(product_id, ()):
+                hits[rule_id] = hits.get(rule_id, 0) + 1
+        return [rule_id for rule_id, count in hits.items() if count == self._sizes[rule_id]]
+
+    def recommend(self, basket, k=5, metric='lift'):
+        """
+        Recommend products for a basket.
+
+        Each product that is the consequent of a matching rule and not already in
+        the basket is scored by its best matching rule.
+
+        Args:
+            basket (iterable): Products in the basket
+            k (int): Number of recommendations
+            metric (str): Ranking metric, one of METRICS
+
+        Returns:
+            list: Up to k dicts with the 'product', the rule's 'support', 'confidence'
+                and 'lift', and the 'because' antecedent products, best first
+        """
+        if metric not in METRICS:
+            raise ValueError(f"metric must be one of {', '.join(METRICS)}")
+        basket = set(basket)
+        basket_ids = {self._product_ids[product] for product in basket if product in self._product_ids}
+        scores = self._scores[metric]
+
+        best = {}  # Product id -> best matching rule id
+        for rule_id in self.matching_rules(basket):
+            for product_id in self._consequents[rule_id]:
+                if product_id in basket_ids:
+                    continue
+                current = best.get(product_id)
+                if current is None or scores[rule_id] > scores[current]:
+                    best[product_id] = rule_id
+
+        top = heapq.nlargest(k, best.items(), key=lambda item: (scores[item[1]], -item[0]))
+        return [
+            {
+                'product': self.products[product_id],
+                'support': self._scores['support'][rule_id],
+                'confidence': self._scores['confidence'][rule_id],
+                'lift': self._scores['lift'][rule_id],
+                'because': [self.products[i] for i in self._antecedents[rule_id]]
+            }
+            for product_id, rule_id in top
+        ]
+
+class RuleIndexCache:
+    """LRU cache of the rule indexes of recently used datasets."""
+
+    def __init__(self, max_datasets=32):
+        """
+        Args:
+            max_datasets (int): Number of dataset indexes kept in memory
+        """
+        self.max_datasets = max_datasets
+        self._entries = OrderedDict()  # Dataset id -> (version, RuleIndex)
+        self._lock = threading.Lock()
+        self._build_locks = {}
+
+    def get(self, dataset_id, version, load_rules):
+        """
+        Get the index of a dataset version, building it on a miss.
+
+        Args:
+            dataset_id (int): Dataset id
+            version (int): Current dataset version; an index of another version is rebuilt
+            load_rules (callable): Returns the dataset's rules for RuleIndex
+
+        Returns:
+            RuleIndex: The index
+        """
+        with self._lock:
+            entry = self._entries.get(dataset_id)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(dataset_id)
+                return entry[1]
+            build_lock = self._build_locks.setdefault(dataset_id, threading.Lock())
+
+        # Concurrent misses on one dataset build the index once
+        with build_lock:
+            with self._lock:
+                entry = self._entries.get(dataset_id)
+                if entry is not None and entry[0] == version:
+                    return entry[1]
+
+            index = RuleIndex(load_rules())
+            with self._lock:
+                self._entries[dataset_id] = (version, index)
+                self._entries.move_to_end(dataset_id)
+                while len(self._entries) > self.max_datasets:
+                    evicted, _ = self._entries.popitem(last=False)
+                    self._build_locks.pop(evicted, None)
+            return index
+
+    def invalidate(self, dataset_id):
+        """Drop the index of a dataset."""
+        with self._lock:
+            self._entries.pop(dataset_id, None)
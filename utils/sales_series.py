@@ -0,0 +1,200 @@
+"""
+Daily sales rollup and the dashboard series derived from it.
+
+Line items are reduced once, at ingest, to daily aggregates (per product and
+in total), which are persisted next to the dataset. The sales overview and
+series at day, week or month granularity, optionally filtered by product or
+category, are built from those aggregates. Long series are downsampled with
+Largest-Triangle-Three-Buckets (LTTB), which keeps the peaks and troughs a
+plain stride would skip.
+"""
+import numpy as np
+import pandas as pd
+
+# Granularity -> pandas resample rule (weeks run Monday to Sunday)
+GRANULARITIES = {'day': 'D', 'week': 'W-SUN', 'month': 'MS'}
+
+def build_daily_sales(df):
+    """
+    Aggregate line items to daily sales.
+
+    Args:
+        df (DataFrame): The processed dataframe
+
+    Returns:
+        dict: 'products' (Date, Product_Name, Category, Quantity, Transaction_Count per
+            product and day) and 'totals' (Date, Quantity, Transaction_Count per day)
+    """
+    day = df['Date'].dt.normalize()
+    category = df['Category'] if 'Category' in df.columns else pd.Series('', index=df.index)
+
+    products = df.assign(Date=day, Category=category.fillna('').astype(str)).groupby(
+        ['Date', 'Product_Name', 'Category'], sort=True).agg(
+        Quantity=('Quantity', 'sum'), Transaction_Count=('Transaction_ID', 'nunique')).reset_index()
+
+    # Distinct transactions per day; summing the per-product counts would count baskets repeatedly
+    totals = df.assign(Date=day).groupby('Date', sort=True).agg(
+        Quantity=('Quantity', 'sum'), Transaction_Count=('Transaction_ID', 'nunique')).reset_index()
+
+    return {'products': products, 'totals': totals}
+
+def sales_overview(daily, top_n=10):
+    """
+    Build the sales overview payload of the analysis page from daily aggregates.
+    
+    Args:
+        daily (dict): Output of build_daily_sales
+        top_n (int): Number of best-selling products listed
+        
+    Returns:
+        dict: 'top_products' (product -> quantity) and 'sales_over_time' records
+    """
+    product_sales = daily['products'].groupby('Product_Name')['Quantity'].sum().sort_values(ascending=False)
+    totals = daily['totals']
+    return {
+        'top_products': product_sales.head(top_n).to_dict(),
+        'sales_over_time': [
+            {'Date': date, 'Total_Quantity': quantity, 'Transaction_Count': int(count)}
+            for date, quantity, count in zip(totals['Date'].dt.strftime('%Y-%m-%d'), totals['Quantity'].tolist(),
+                                             totals['Transaction_Count'])
+        ]
+    }
+
+def daily_sales_to_arrays(daily):
+    """
+    Convert build_daily_sales output to flat numeric arrays for the shared array store.
+    
+    Product and category names are stored once as fixed-width string arrays and
+    referenced by integer codes, so every array can be memory-mapped.
+    """
+    products = daily['products']
+    totals = daily['totals']
+    product_codes, product_names = pd.factorize(products['Product_Name'], sort=True)
+    category_codes, category_names = pd.factorize(products['Category'], sort=True)
+    return {
+        'product_date': products['Date'].to_numpy(dtype='datetime64[ns]'),
+        'product_code': product_codes.astype(np.int32),
+        'product_names': np.asarray(product_names, dtype=str),
+        'category_code': category_codes.astype(np.int32),
+        'category_names': np.asarray(category_names, dtype=str),
+        'product_quantity': products['Quantity'].to_numpy(dtype=float),
+        'product_transactions': products['Transaction_Count'].to_numpy(dtype=np.int64),
+        'total_date': totals['Date'].to_numpy(dtype='datetime64[ns]'),
+        'total_quantity': totals['Quantity'].to_numpy(dtype=float),
+        'total_transactions': totals['Transaction_Count'].to_numpy(dtype=np.int64)
+    }
+
+def daily_sales_from_arrays(arrays):
+    """Inverse of daily_sales_to_arrays; numeric columns reference the given arrays."""
+    products = pd.DataFrame({
+        'Date': arrays['product_date'],
+        'Product_Name': arrays['product_names'][arrays['product_code']].astype(object),
+        'Category': arrays['category_names'][arrays['category_code']].astype(object),
+        'Quantity': arrays['product_quantity'],
+        'Transaction_Count': arrays['product_transactions']
+    }, copy=False)
+    totals = pd.DataFrame({
+        'Date': arrays['total_date'],
+        'Quantity': arrays['total_quantity'],
+        'Transaction_Count': arrays['total_transactions']
+    }, copy=False)
+    return {'products': products, 'totals': totals}
+
+# LTTB keeps the first and last point and at least one in between
+LTTB_MIN_POINTS = 3
+
+def lttb_indices(x, y, threshold):
+    """
+    Select points with the Largest-Triangle-Three-Buckets algorithm.
+
+    Args:
+        x (ndarray): Increasing x values
+        y (ndarray): y values
+        threshold (int): Number of points to keep
+
+    Returns:
+        ndarray: Indices of the kept points, first and last included
+    """
+    n = len(x)
+    if threshold >= n or threshold < LTTB_MIN_POINTS:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    # Interior points split into threshold - 2 buckets; the end points are always kept
+    edges = np.floor(np.linspace(1, n - 1, threshold - 1)).astype(int)
+
+    selected = np.empty(threshold, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # The third vertex is the average of the next bucket (or the last point)
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_start = end if bucket + 2 < len(edges) else n - 1
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        areas = np.abs((x[previous] - avg_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (avg_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+
+    return selected
+
+def sales_series(daily, granularity='day', products=None, categories=None, max_points=None):
+    """
+    Build a sales-over-time series from daily aggregates.
+
+    Args:
+        daily (dict): Output of build_daily_sales
+        granularity (str): 'day', 'week' or 'month'
+        products (list): Only count these products
+        categories (list): Only count products of these categories
+        max_points (int): Downsample longer series to this many points with LTTB
+            (at least LTTB_MIN_POINTS; smaller values leave the series as is)
+
+    Returns:
+        dict: 'sales_over_time' (Date, Total_Quantity, Transaction_Count records),
+            'granularity', 'total_points' and 'downsampled'
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity '{granularity}', expected one of {list(GRANULARITIES)}")
+
+    if products or categories:
+        frame = daily['products']
+        if products:
+            frame = frame[frame['Product_Name'].isin(products)]
+        if categories:
+            frame = frame[frame['Category'].isin(categories)]
+        # With a filter, Transaction_Count counts transactions per matching product
+        frame = frame.groupby('Date')[['Quantity', 'Transaction_Count']].sum()
+    else:
+        frame = daily['totals'].set_index('Date')[['Quantity', 'Transaction_Count']]
+
+    if frame.empty:
+        return {'granularity': granularity, 'sales_over_time': [], 'total_points': 0, 'downsampled': False}
+
+    # Calendar-filled buckets, so days without sales show as zero
+    series = frame.resample(GRANULARITIES[granularity]).sum()
+    if granularity == 'week':
+        series.index = series.index - pd.Timedelta(days=6)  # Label weeks by their Monday
+    total_points = len(series)
+
+    downsampled = bool(max_points and max_points >= LTTB_MIN_POINTS and total_points > max_points)
+    if downsampled:
+        x = series.index.values.astype('datetime64[D]').astype(float)
+        series = series.iloc[lttb_indices(x, series['Quantity'].to_numpy(), max_points)]
+
+    records = [
+        {'Date': date, 'Total_Quantity': float(quantity), 'Transaction_Count': int(count)}
+        for date, quantity, count in zip(series.index.strftime('%Y-%m-%d'), series['Quantity'],
+                                         series['Transaction_Count'])
+    ]
+    return {
+        'granularity': granularity,
+        'sales_over_time': records,
+        'total_points': total_points,
+        'downsampled': downsampled
+    }
@@ -0,0 +1,130 @@
+"""
+Read-only numpy arrays shared by every process on the host.
+
+Arrays are published per dataset as versioned directories of .npy files and
+opened with np.load(mmap_mode='r'), so all gunicorn and job workers map the
+same page-cache pages instead of each holding a private copy; memory grows
+with the data, not with the number of workers. Point the store at a tmpfs
+such as /dev/shm to keep the files in shared memory.
+
+Publishing writes a new version next to the old one and then switches the
+dataset's CURRENT pointer atomically; older versions are retired (deleted).
+Processes that still map a retired version keep its pages until they pick up
+the new one on their next lookup.
+
+Only dataset arrays are published. Trained forecasting models are not: a model
+lives only in the job that trains it, and web processes serve the stored
+forecasts, so no process loads a model that could be shared.
+"""
+import os
+import shutil
+import logging
+import threading
+import numpy as np
+
+class SharedArrayStore:
+    """Versioned, memory-mapped array store keyed by dataset id."""
+
+    def __init__(self, root_dir):
+        """
+        Args:
+            root_dir (str): Directory holding one subdirectory per dataset
+        """
+        self.root_dir = root_dir
+        self._mapped = {}  # dataset_id -> (version, arrays) mapped by this process
+        self._lock = threading.Lock()
+        os.makedirs(root_dir, exist_ok=True)
+
+    def _dataset_dir(self, dataset_id):
+        return os.path.join(self.root_dir, str(dataset_id))
+
+    def _pointer_path(self, dataset_id):
+        return os.path.join(self._dataset_dir(dataset_id), 'CURRENT')
+
+    def current_version(self, dataset_id):
+        """Return the published version of a dataset, or None."""
+        try:
+            with open(self._pointer_path(dataset_id), 'r', encoding='utf-8') as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def publish(self, dataset_id, version, arrays):
+        """
+        Publish a new version of a dataset's arrays and retire older versions.
+
+        Args:
+            dataset_id (int): Dataset id
+            version (int): Increasing version number (e.g. the processing job id)
+            arrays (dict): Name -> numpy array; object arrays are not supported
+        """
+        dataset_dir = self._dataset_dir(dataset_id)
+        version_dir = os.path.join(dataset_dir, str(version))
+        tmp_dir = f"{version_dir}.{os.getpid()}.{threading.get_ident()}.tmp"
+        os.makedirs(tmp_dir)
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_dir, f'{name}.npy'), np.ascontiguousarray(array), allow_pickle=False)
+
+        try:
+            os.rename(tmp_dir, version_dir)
+        except OSError:
+            # Another process already published this version
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        current = self.current_version(dataset_id)
+        if current is not None and current > version:
+            return
+        pointer_path = self._pointer_path(dataset_id)
+        pointer_tmp = f"{pointer_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(pointer_tmp, 'w', encoding='utf-8') as f:
+            f.write(str(version))
+        os.replace(pointer_tmp, pointer_path)  # Atomic switch for every reader
+
+        self.retire(dataset_id, keep=version)
+        logging.info(f"Published shared arrays for dataset {dataset_id} (version {version})")
+
+    def retire(self, dataset_id, keep=None):
+        """Delete the published versions of a dataset other than keep."""
+        try:
+            entries = list(os.scandir(self._dataset_dir(dataset_id)))
+        except OSError:
+            return
+        for entry in entries:
+            if entry.is_dir() and entry.name.isdigit() and int(entry.name) != keep:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    @staticmethod
+    def _load(path):
+        try:
+            return np.load(path, mmap_mode='r', allow_pickle=False)
+        except ValueError:
+            # Empty arrays cannot be memory-mapped
+            return np.load(path, allow_pickle=False)
+
+    def get(self, dataset_id):
+        """
+        Get the current arrays of a dataset, mapping them on first use.
+
+        Returns:
+            dict: Name -> read-only array, or None if nothing is published
+        """
+        version = self.current_version(dataset_id)
+        if version is None:
+            return None
+
+        with self._lock:
+            mapped = self._mapped.get(dataset_id)
+            if mapped and mapped[0] == version:
+                return mapped[1]
+
+        version_dir = os.path.join(self._dataset_dir(dataset_id), str(version))
+        try:
+            arrays = {entry.name[:-len('.npy')]: self._load(entry.path)
+                      for entry in os.scandir(version_dir) if entry.name.endswith('.npy')}
+        except OSError:
+            return None  # Retired by a newer publish in the meantime
+
+        with self._lock:
+            # Replacing an older mapping releases it once no request still uses it
+            self._mapped[dataset_id] = (version, arrays)
+        return arrays
@@ -0,0 +1,152 @@
+"""
+Deterministic synthetic sales data at any scale.
+
+Generates line items in the upload format (Transaction_ID, Product_ID,
+Product_Name, Category, Date, Quantity, Unit_Price, Promo_Flag) with a
+realistic structure: a long-tailed product popularity, variable basket sizes,
+weekly and yearly seasonality per category, and planted product associations
+(baskets with the antecedent also hold the consequent with a given
+probability) that the miner should find. The same arguments always produce the
+same data.
+
+Usage:
+    python -m utils.synthetic_data uploads/synthetic.csv --baskets 100000 --products 200 --days 730
+"""
+import argparse
+import logging
+
+import numpy as np
+import pandas as pd
+
+CATEGORIES = ['Dairy', 'Bakery', 'Produce', 'Meat', 'Beverages', 'Snacks', 'Frozen', 'Household']
+
+def planted_associations(n_products, n_associations=None, seed=42):
+    """
+    Pick the (antecedent, consequent, probability) rules planted in the data.
+
+    Args:
+        n_products (int): Number of products
+        n_associations (int): Number of rules (defaults to one per 10 products)
+        seed (int): Random seed
+
+    Returns:
+        list: (antecedent index, consequent index, probability) tuples
+    """
+    rng = np.random.default_rng(seed + 1)
+    if n_associations is None:
+        n_associations = max(1, n_products // 10)
+    n_associations = min(n_associations, n_products // 2)
+
+    # Disjoint pairs among the more popular half, so that their support is measurable
+    candidates = rng.permutation(max(2, n_products // 2))[:2 * n_associations]
+    return [
+        (int(candidates[2 * i]), int(candidates[2 * i + 1]), float(rng.uniform(0.4, 0.8)))
+        for i in range(len(candidates) // 2)
+    ]
+
+def generate_sales_data(n_baskets=1000, n_products=50, n_days=365, mean_basket_size=3.0,
+                        n_associations=None, start_date='2023-01-01', seed=42):
+    """
+    Generate synthetic line items.
+
+    Args:
+        n_baskets (int): Number of transactions
+        n_products (int): Number of distinct products
+        n_days (int): Length of the sales history in days
+        mean_basket_size (float): Average number of products per transaction, before associations
+        n_associations (int): Number of planted rules (see planted_associations)
+        start_date (str): First day of the history
+        seed (int): Random seed
+
+    Returns:
+        DataFrame: Line items in the upload format; the planted rules, by product
+            name, are in df.attrs['planted_associations']
+    """
+    rng = np.random.default_rng(seed)
+
+    # Products: Zipf-like popularity, a category, a typical quantity and a price
+    popularity = 1.0 / np.arange(1, n_products + 1) ** 1.1
+    popularity /= popularity.sum()
+    product_category = rng.integers(0, len(CATEGORIES), n_products)
+    product_quantity = rng.uniform(0.5, 3.0, n_products)
+    product_price = np.round(rng.uniform(0.5, 20.0, n_products), 2)
+    product_names = np.array([f'{CATEGORIES[c]} Item {i + 1:05d}' for i, c in enumerate(product_category)])
+    product_ids = np.array([f'P{100000 + i}' for i in range(n_products)])
+
+    # Days: more baskets at weekends and around a yearly peak
+    days = np.arange(n_days)
+    start = pd.Timestamp(start_date)
+    weekday = (start.dayofweek + days) % 7
+    day_weight = (1.0 + 0.3 * (weekday >= 5)) * (1.0 + 0.25 * np.sin(2 * np.pi * days / 365.25))
+    day_weight /= day_weight.sum()
+    basket_day = rng.choice(n_days, size=n_baskets, p=day_weight)
+
+    # Each category peaks at a different time of the year
+    phase = rng.uniform(0, 2 * np.pi, len(CATEGORIES))
+    season = 1.0 + 0.4 * np.sin(2 * np.pi * days[:, None] / 365.25 + phase[None, :])
+
+    # Baskets: 1 + Poisson products, drawn by popularity
+    sizes = 1 + rng.poisson(max(mean_basket_size - 1.0, 0.0), n_baskets)
+    basket = np.repeat(np.arange(n_baskets), sizes)
+    product = rng.choice(n_products, size=len(basket), p=popularity)
+
+    # Planted associations: add the consequent to a share of the antecedent's baskets
+    rules = planted_associations(n_products, n_associations, seed)
+    added_baskets, added_products = [basket], [product]
+    for antecedent, consequent, probability in rules:
+        with_antecedent = np.unique(basket[product == antecedent])
+        chosen = with_antecedent[rng.random(len(with_antecedent)) < probability]
+        added_baskets.append(chosen)
+        added_products.append(np.full(len(chosen), consequent))
+    items = pd.DataFrame({'basket': np.concatenate(added_baskets), 'product': np.concatenate(added_products)})
+    items = items.drop_duplicates().sort_values(['basket', 'product'], kind='stable')
+    basket = items['basket'].to_numpy()
+    product = items['product'].to_numpy()
+
+    day = basket_day[basket]
+    promo = rng.random(len(basket)) < 0.1
+    quantity = 1 + rng.poisson(product_quantity[product] * season[day, product_category[product]] * (1 + 0.5 * promo))
+    width = len(str(max(n_baskets, 1)))
+
+    df = pd.DataFrame({
+        'Transaction_ID': 'T' + pd.Series(basket).astype(str).str.zfill(width),
+        'Product_ID': product_ids[product],
+        'Product_Name': product_names[product],
+        'Category': np.array(CATEGORIES)[product_category[product]],
+        'Date': start + pd.to_timedelta(day, unit='D'),
+        'Quantity': quantity,
+        'Unit_Price': np.round(product_price[product] * np.where(promo, 0.8, 1.0), 2),
+        'Promo_Flag': promo.astype(int)
+    })
+    df.attrs['planted_associations'] = [
+        (product_names[antecedent], product_names[consequent], probability)
+        for antecedent, consequent, probability in rules
+    ]
+    return df
+
+def write_sales_csv(df, path):
+    """Write generated line items as an upload CSV (dates as YYYY-MM-DD)."""
+    df.to_csv(path, index=False, date_format='%Y-%m-%d')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate a deterministic synthetic sales dataset.')
+    parser.add_argument('output', help='CSV file to write')
+    parser.add_argument('--baskets', type=int, default=10000, help='Number of transactions')
+    parser.add_argument('--products', type=int, default=50, help='Number of distinct products')
+    parser.add_argument('--days', type=int, default=365, help='Days of sales history')
+    parser.add_argument('--basket-size', type=float, default=3.0, help='Mean products per transaction')
+    parser.add_argument('--associations', type=int, help='Number of planted association rules')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    df = generate_sales_data(args.baskets, args.products, args.days, args.basket_size,
+                             args.associations, seed=args.seed)
+    write_sales_csv(df, args.output)
+    logging.info(f"Wrote {len(df)} rows ({args.baskets} transactions) to {args.output}")
+    for antecedent, consequent, probability in df.attrs['planted_associations']:
+        logging.info(f"Planted rule: {antecedent} -> {consequent} (p={probability:.2f})")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Background worker for the Demand Forecasting System
+
+Runs a pool of processes that pick queued upload jobs from the database.
+Run it with JOB_WORKERS=0 for the web processes, so this pool does all processing.
+"""
+import os
+import sys
+import logging
+import argparse
+import multiprocessing
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def run_worker(poll_interval):
+    """Process jobs in a single worker process."""
+    from jobs import work
+    work(poll_interval)
+
+def main():
+    parser = argparse.ArgumentParser(description='Process queued dataset uploads.')
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(),
+                        help='Number of worker processes')
+    parser.add_argument('--poll-interval', type=float, default=2.0,
+                        help='Seconds between queue polls when idle')
+    args = parser.parse_args()
+
+    print(f"\n===== Demand Forecasting Worker ({args.workers} processes) =====\n")
+
+    # The worker processes run nothing but jobs, so tracing their stages slows down no requests
+    os.environ.setdefault('JOB_TRACE_MEMORY', '1')
+    # Every worker runs the partitions of its job in a pool of its own; share the CPUs between them
+    partition_workers = max(1, multiprocessing.cpu_count() // max(1, args.workers))
+    os.environ['PARTITION_WORKERS'] = str(min(int(os.environ.get('PARTITION_WORKERS', partition_workers)),
+                                              partition_workers))
+
+    from app import init_db
+    init_db()
+
+    # Spawn fresh interpreters so no database connections are shared across processes
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=run_worker, args=(args.poll_interval,), name=f'job-worker-{i}')
+                 for i in range(args.workers)]
+    for process in processes:
+        process.start()
+
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        logging.info("Stopping workers...")
+        for process in processes:
+            process.terminate()
+        sys.exit(0)
+
+if __name__ == "__main__":
+    main()